@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Application, Paper, Coauthor
+
+from core.admin import LargeTableAdmin
+
+from .models import Application, ApplicationTransition, ArchivedApplication, Paper, Coauthor, FileBlob
 
 
 class PaperInline(admin.TabularInline):
@@ -18,14 +21,27 @@ class PaperInline(admin.TabularInline):
         "pages",
         "has_university_affiliation",
         "doi",
-        "site_source",
         "source_url",
         "file_upload",
     )
 
 
+class ApplicationTransitionInline(admin.TabularInline):
+    model = ApplicationTransition
+    extra = 0
+    can_delete = False
+    fields = ("created_at", "from_status", "to_status", "actor", "comment")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("actor")
+
+
 @admin.register(Application)
-class ApplicationAdmin(admin.ModelAdmin):
+class ApplicationAdmin(LargeTableAdmin):
     list_display = (
         "id",
         "owner",
@@ -38,18 +54,20 @@ class ApplicationAdmin(admin.ModelAdmin):
     search_fields = ("owner__full_name", "owner__email")
     readonly_fields = ("id", "owner", "created_at", "updated_at")
     date_hierarchy = "created_at"
-    inlines = [PaperInline]
+    inlines = [PaperInline, ApplicationTransitionInline]
+    list_select_related = ("owner",)
 
 
 @admin.register(Coauthor)
-class CoauthorAdmin(admin.ModelAdmin):
+class CoauthorAdmin(LargeTableAdmin):
     list_display = ("full_name", "email", "position", "subdivision", "telephone")
+    # trigram indexes (migrations 0017 and 0019); also used by the coauthor autocomplete of PaperAdmin
     search_fields = ("full_name", "email", "position", "subdivision", "telephone")
     ordering = ("full_name",)
 
 
 @admin.register(Paper)
-class PaperAdmin(admin.ModelAdmin):
+class PaperAdmin(LargeTableAdmin):
     list_display = (
         "id",
         "application",
@@ -63,6 +81,49 @@ class PaperAdmin(admin.ModelAdmin):
         "created_at",
     )
     list_filter = ("indexation", "quartile", "year", "created_at")
-    search_fields = ("title", "doi", "application__owner__email", "journal_or_source")
-    filter_horizontal = ("coauthors",)
-    autocomplete_fields = ("application",)
+    # trigram indexes (migration 0017); the owner's email is searched in get_search_results
+    search_fields = ("title", "doi", "journal_or_source")
+    autocomplete_fields = ("application", "coauthors")
+    # Application.__str__ shows the owner
+    list_select_related = ("application__owner",)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        search_term = search_term.strip()
+        if not search_term:
+            return results, may_have_duplicates
+        # A joined field in the OR of search_fields turns the whole search into a
+        # full scan; as its own branch of a UNION it is served by user_email_trgm.
+        by_owner = queryset.filter(application__owner__email__icontains=search_term)
+        matched = results.order_by().values("pk").union(by_owner.order_by().values("pk"))
+        return queryset.filter(pk__in=matched), may_have_duplicates
+
+
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "size", "ref_count", "created_at")
+    list_filter = ("ref_count",)
+    search_fields = ("name", "sha256")
+    readonly_fields = ("name", "sha256", "size", "ref_count", "created_at", "updated_at")
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedApplication)
+class ArchivedApplicationAdmin(LargeTableAdmin):
+    list_display = ("id", "owner", "faculty", "status", "report_year", "created_at", "archived_at")
+    list_filter = ("report_year", "faculty", "status")
+    search_fields = ("owner__full_name", "owner__email")
+    exclude = ("data",)
+    list_select_related = ("owner",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,140 @@
+"""
+Archive of closed report years.
+
+``archive_year`` freezes every application of a closed year into one
+ArchivedApplication row: its API representation, its XLSX export rows and
+its status history, as zlib-compressed JSON. The live application, its
+papers and the coauthors only they used are then deleted, so the tables
+the current cycle reads, writes and vacuums hold only open years.
+
+Archived applications never change. ``GET /api/applications/<id>/`` falls
+back to them, ``GET /api/applications/archive/`` lists them and the XLSX
+export appends them. Their files stay downloadable through
+``/api/papers/<id>/file/`` and are kept by sweep_media (ArchivedFile).
+"""
+import zlib
+
+from django.db import transaction
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.renderers import JSONRenderer
+
+from .exporters import application_rows
+from .models import Application, ArchivedApplication, ArchivedFile, Coauthor, FileBlob, Paper, Tombstone
+from .serializers import ApplicationDetailSerializer
+from .signals import tombstone_reason
+
+# a year with applications waiting for review is not closed
+OPEN_STATUSES = {"submitted"}
+
+
+class YearNotClosed(Exception):
+    pass
+
+
+class ArchivePagination(LimitOffsetPagination):
+    """Pages of ``GET /api/applications/archive/``: only the snapshots of one page are decompressed."""
+
+    default_limit = 100
+    max_limit = 500
+
+
+def visible_to(user):
+    archived = ArchivedApplication.objects.all()
+    if user.is_staff:
+        return archived.exclude(status="draft")
+    return archived.filter(owner=user)
+
+
+def files_visible_to(user):
+    return ArchivedFile.objects.filter(application__in=visible_to(user), paper_id__isnull=False)
+
+
+def freeze(application):
+    """The compressed snapshot of ``application`` (owner, papers, coauthors and transitions loaded)."""
+    detail = ApplicationDetailSerializer(application).data
+    # file names, not links: links are built per request (and presigned ones expire)
+    detail["generated_docx"] = application.generated_docx.name or None
+    for data, paper in zip(detail["papers"], application.papers.all()):
+        data["file_upload"] = paper.file_upload.name or None
+    snapshot = {
+        "detail": detail,
+        "export": application_rows(application),
+        "history": [
+            {
+                "from_status": item.from_status,
+                "to_status": item.to_status,
+                "actor": item.actor_id,
+                "comment": item.comment,
+                "at": item.created_at,
+            }
+            for item in application.transitions.all()
+        ],
+    }
+    return zlib.compress(JSONRenderer().render(snapshot), 9)
+
+
+def detail(archived, request):
+    """The frozen API representation of ``archived``, with file links as the live serializers make them."""
+    data = archived.snapshot["detail"]
+    data["generated_docx"] = _file_url(Application(generated_docx=data["generated_docx"]).generated_docx, request)
+    for paper in data["papers"]:
+        paper["file_upload"] = _file_url(Paper(file_upload=paper["file_upload"]).file_upload, request)
+    return data
+
+
+def _file_url(file, request):
+    return request.build_absolute_uri(file.url) if file else None
+
+
+def archive_year(year, batch_size=200):
+    """Move the applications of ``year`` to the archive; returns how many were moved."""
+    if Application.objects.filter(report_year=year, status__in=OPEN_STATUSES).exists():
+        raise YearNotClosed(f"В {year} году есть заявки, ожидающие проверки.")
+
+    applications = (
+        Application.objects.filter(report_year=year)
+        .select_related("owner")
+        .prefetch_related("papers__coauthors", "transitions")
+        .order_by("pk")
+    )
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(applications.select_for_update(of=("self",))[:batch_size])
+            if not batch:
+                return moved
+            _archive(batch)
+        moved += len(batch)
+
+
+def _archive(applications):
+    archived, files, coauthor_ids = [], [], set()
+    for app in applications:
+        archived.append(ArchivedApplication(
+            id=app.pk,
+            owner_id=app.owner_id,
+            report_year=app.report_year,
+            faculty=app.faculty,
+            status=app.status,
+            created_at=app.created_at,
+            data=freeze(app),
+        ))
+        if app.generated_docx:
+            files.append(ArchivedFile(application_id=app.pk, name=app.generated_docx.name))
+        for paper in app.papers.all():
+            if paper.file_upload:
+                files.append(ArchivedFile(application_id=app.pk, paper_id=paper.pk, name=paper.file_upload.name))
+            coauthor_ids.update(coauthor.pk for coauthor in paper.coauthors.all())
+
+    ArchivedApplication.objects.bulk_create(archived)
+    ArchivedFile.objects.bulk_create(files)
+    # papers, links and history go with the applications; the signals record
+    # "archived" tombstones, so feed consumers can tell them from deletions
+    with tombstone_reason(Tombstone.ARCHIVED):
+        Application.objects.filter(pk__in=[app.pk for app in applications]).delete()
+        # coauthors are created per paper: drop the ones no live paper uses any more
+        Coauthor.objects.filter(pk__in=coauthor_ids, papers__isnull=True).delete()
+    # deleting the papers released their blobs, but the archive still refers to them
+    for file in files:
+        if file.paper_id:
+            FileBlob.add_reference(file.name)
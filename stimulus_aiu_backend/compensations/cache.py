@@ -0,0 +1,115 @@
+"""
+Versioned cache of application and paper list/detail responses.
+
+Responses are cached per user, path and query string under the current
+version of the data they show: ``owner:<id>`` for a researcher (their own
+applications), ``all`` for administrators. Saving or deleting an
+application, paper, coauthor or user replaces the affected versions (see
+compensations/signals.py), so stale entries are never read again and
+simply expire.
+
+A version also records when it was set. Responses read from the replica
+within DB_PRIMARY_PIN_SECONDS of that moment are not cached: the replica
+may not have the write yet, and the old rows would be kept under the new
+version.
+"""
+import hashlib
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from core.db import reading_from_replica
+
+ALL = "all"
+
+
+def owner_version_key(owner_id):
+    return f"owner:{owner_id}"
+
+
+def _cache_key(name):
+    return f"resp:v:{name}"
+
+
+def _new_version():
+    return f"{uuid.uuid4().hex}-{time.time():.3f}"
+
+
+def _set_at(version):
+    try:
+        return float(version.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+def get_version(name):
+    key = _cache_key(name)
+    version = cache.get(key)
+    if version is None:
+        # a missing (evicted) version must not fall back to a value used before
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(names):
+    if not names or not settings.RESPONSE_CACHE_TIMEOUT:
+        return
+
+    def bump():
+        cache.set_many({_cache_key(name): _new_version() for name in names}, None)
+
+    bump()
+    # once more after commit: a request running meanwhile may have cached the old rows under the new version
+    transaction.on_commit(bump)
+
+
+def bump_owners(owner_ids):
+    owner_ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+    if owner_ids:
+        bump_versions([ALL, *(owner_version_key(owner_id) for owner_id in owner_ids)])
+
+
+def response_cache_key(request, version):
+    user = request.user
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(f"{request.path}?{query}".encode(), usedforsecurity=False).hexdigest()
+    return f"resp:{user.pk}:{int(user.is_staff)}:{version}:{digest}"
+
+
+class CachedReadMixin:
+    """Serve ``list`` and ``retrieve`` of a viewset from the response cache."""
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, handler, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_TIMEOUT:
+            return handler(request, *args, **kwargs)
+
+        user = request.user
+        version = get_version(ALL if user.is_staff else owner_version_key(user.pk))
+        key = response_cache_key(request, version)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "hit"})
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            if self._settled(version):
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+            response["X-Cache"] = "miss"
+        return response
+
+    @staticmethod
+    def _settled(version):
+        """Whether the rows just read may be cached under ``version``."""
+        return not reading_from_replica() or time.time() - _set_at(version) >= settings.DB_PRIMARY_PIN_SECONDS
@@ -0,0 +1,126 @@
+"""
+Changes feed of applications, papers and coauthors.
+
+``GET /api/<resource>/changes/?since=<token>`` returns the records created
+or updated after the cursor (ordered by ``updated_at, id``) and the ids of
+records deleted after it (Tombstone rows written by compensations/signals.py;
+``reason`` is "archived" for records moved to the archive, "deleted" otherwise),
+plus the token to pass next time. Without a token the feed starts at
+``?updated_since=<ISO datetime>``, or at the beginning.
+
+Rows newer than CHANGES_SETTLE_SECONDS are left for the next call:
+``updated_at`` is stamped when a transaction writes, not when it commits,
+so a row stamped just before the cursor could otherwise become visible
+after the cursor has moved past it.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import Tombstone
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+
+
+def encode_token(rows_after, deleted_after):
+    cursors = [[stamp.isoformat(), None if pk is None else str(pk)] for stamp, pk in (rows_after, deleted_after)]
+    return base64.urlsafe_b64encode(json.dumps(cursors).encode()).decode()
+
+
+def decode_token(token):
+    """The (rows, tombstones) cursors of a client-supplied token; row pks are UUIDs, tombstone pks integers."""
+    try:
+        cursors = json.loads(base64.urlsafe_b64decode(token.encode()))
+        (stamp, pk), (deleted_stamp, deleted_pk) = cursors
+        rows_after = (_parse_stamp(stamp), _parse_pk(pk, uuid.UUID))
+        deleted_after = (_parse_stamp(deleted_stamp), _parse_pk(deleted_pk, int))
+        return rows_after, deleted_after
+    except (ValueError, TypeError, binascii.Error):
+        raise ValidationError({"since": "Недействительный токен изменений."})
+
+
+def _parse_stamp(value):
+    stamp = parse_datetime(value)
+    if stamp is None:
+        raise ValueError(value)
+    return stamp
+
+
+def _parse_pk(value, parse):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return parse(value)
+
+
+def keyset_page(queryset, field, after, horizon, limit):
+    """Rows of ``queryset`` after ``after`` = (``field`` value, pk) and not newer than ``horizon``."""
+    stamp, pk = after
+    queryset = queryset.filter(**{f"{field}__lte": horizon})
+    if stamp is not None and pk is not None:
+        queryset = queryset.filter(Q(**{f"{field}__gt": stamp}) | Q(**{field: stamp, "pk__gt": pk}))
+    elif stamp is not None:
+        queryset = queryset.filter(**{f"{field}__gte": stamp})
+    rows = list(queryset.order_by(field, "pk")[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+class ChangesFeedMixin:
+    """Adds the ``changes`` action to a viewset; its queryset decides what the user sees."""
+
+    def changes_tombstones(self):
+        tombstones = Tombstone.objects.filter(model=self.get_queryset().model._meta.model_name)
+        if not self.request.user.is_staff:
+            tombstones = tombstones.filter(Q(owner_id=self.request.user.pk) | Q(owner_id__isnull=True))
+        return tombstones
+
+    @action(detail=False, methods=["get"])
+    def changes(self, request, *args, **kwargs):
+        token = request.query_params.get("since")
+        if token:
+            rows_after, deleted_after = decode_token(token)
+        else:
+            since = request.query_params.get("updated_since")
+            start = parse_datetime(since) if since else None
+            if since and start is None:
+                raise ValidationError({"updated_since": "Ожидается дата и время в формате ISO 8601."})
+            rows_after = deleted_after = (start, None)
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Ожидается целое число."})
+
+        horizon = timezone.now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+        rows, more_rows = keyset_page(self.get_queryset(), "updated_at", rows_after, horizon, limit)
+        deleted, more_deleted = keyset_page(self.changes_tombstones(), "deleted_at", deleted_after, horizon, limit)
+
+        if rows:
+            rows_after = (rows[-1].updated_at, rows[-1].pk)
+        if deleted:
+            deleted_after = (deleted[-1].deleted_at, deleted[-1].pk)
+        if rows_after[0] is None:
+            rows_after = (horizon, None)
+        if deleted_after[0] is None:
+            deleted_after = (horizon, None)
+
+        return Response({
+            "results": self.get_serializer(rows, many=True).data,
+            "deleted": [
+                {"id": tombstone.object_id, "deleted_at": tombstone.deleted_at, "reason": tombstone.reason}
+                for tombstone in deleted
+            ],
+            "next": encode_token(rows_after, deleted_after),
+            "has_more": more_rows or more_deleted,
+        })
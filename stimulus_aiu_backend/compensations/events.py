@@ -0,0 +1,243 @@
+"""
+Server-sent events of application status changes (ASGI mode only).
+
+``GET /api/events/`` keeps a connection open and pushes one ``application``
+event per status transition: to the owner for their own applications, and
+to administrators for every new submission. EventSource cannot send
+headers, so a browser first gets a stream ticket from
+``POST /api/events/ticket/`` and opens ``/api/events/?ticket=…``: the
+ticket is signed, lives EVENTS_TICKET_SECONDS and is accepted once, so the
+copy left in access logs is useless. Other clients send the access token
+in the Authorization header.
+
+Every transition statement (compensations/transitions.py) ends with
+``pg_notify``; each process runs one LISTEN connection that hands the
+events to the open streams of that process (EVENTS_BACKEND=postgres). With
+EVENTS_BACKEND=local events are published in-process on commit, which is
+enough for a single worker. The event id is the ApplicationTransition id:
+a reconnecting client sends ``Last-Event-ID`` and gets what it missed from
+the history table.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+from collections import deque
+
+import psycopg
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from core.authentication import TracedJWTAuthentication
+
+from .models import ApplicationTransition
+
+logger = logging.getLogger("stimulus_aiu.events")
+
+CHANNEL = "stimulus_application_events"
+# NOTIFY payloads are limited to 8000 bytes
+COMMENT_LENGTH = 1000
+RECONNECT_SECONDS = 2
+# how often the listener wakes up to check whether it should stop
+POLL_SECONDS = 1
+# published after the listener reconnects: streams reload what they may have missed
+RESYNC = object()
+# ids a stream remembers; transitions may commit out of id order, so the replay after RESYNC
+# starts at the oldest of them rather than at the last one sent
+RECENT_IDS = 20
+TICKET_SALT = "compensations.events.ticket"
+
+
+class EventBus:
+    """Hands events to the asyncio queues of the open streams of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._listener = None
+        self._stopping = threading.Event()
+        self.listening = threading.Event()
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+            if settings.EVENTS_BACKEND == "postgres" and self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+                self._listener.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {item for item in self._subscribers if item[1] is not queue}
+
+    def stop(self):
+        """Close the LISTEN connection (tests, shutdown); the next subscriber starts a new one."""
+        with self._lock:
+            listener, self._listener = self._listener, None
+        if listener is not None:
+            self._stopping.set()
+            listener.join()
+            self._stopping.clear()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # the loop of a stream that was not closed properly
+                self.unsubscribe(queue)
+
+    def _listen(self):
+        params = connections["default"].get_connection_params()
+        params = {key: value for key, value in params.items() if key not in ("cursor_factory", "context")}
+        reconnected = False
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(autocommit=True, **params) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    self.listening.set()
+                    if reconnected:
+                        self.publish(RESYNC)
+                    while not self._stopping.is_set():
+                        for notify in conn.notifies(timeout=POLL_SECONDS):
+                            self.publish(json.loads(notify.payload))
+            except psycopg.Error:
+                logger.warning("Event listener lost its connection, reconnecting", exc_info=True)
+            self.listening.clear()
+            reconnected = True
+            self._stopping.wait(RECONNECT_SECONDS)
+
+
+bus = EventBus()
+
+
+def transition_event(transition):
+    """The payload the transition statement sends, rebuilt from a history row."""
+    return {
+        "id": transition.id,
+        "application": str(transition.application_id),
+        "owner": str(transition.application.owner_id),
+        "status": transition.to_status,
+        "from_status": transition.from_status,
+        "comment": transition.comment[:COMMENT_LENGTH],
+        "at": transition.created_at.isoformat(),
+    }
+
+
+def visible_to(user, event):
+    return event["owner"] == str(user.pk) or (user.is_staff and event["status"] == "submitted")
+
+
+def missed_events(user, after_id):
+    transitions = ApplicationTransition.objects.filter(id__gt=after_id).select_related("application")
+    scope = Q(application__owner=user)
+    if user.is_staff:
+        scope |= Q(to_status="submitted")
+    return [
+        transition_event(transition)
+        for transition in transitions.filter(scope).order_by("id")[:settings.EVENTS_REPLAY_LIMIT]
+    ]
+
+
+def latest_event_id():
+    return ApplicationTransition.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: application\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def issue_ticket(user):
+    return signing.dumps({"user": str(user.pk), "nonce": secrets.token_urlsafe(16)}, salt=TICKET_SALT)
+
+
+def user_from_ticket(ticket):
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_SECONDS)
+    except signing.BadSignature:
+        return None
+    # one use per ticket; across workers only with a shared CACHE_BACKEND
+    if not cache.add(f"events:ticket:{data['nonce']}", 1, settings.EVENTS_TICKET_SECONDS):
+        return None
+    return get_user_model().objects.filter(pk=data["user"], is_active=True).first()
+
+
+@api_view(["POST"])
+def stream_ticket(request):
+    """A short-lived, single-use ticket for ``GET /api/events/?ticket=``."""
+    return Response({"ticket": issue_ticket(request.user), "expires_in": settings.EVENTS_TICKET_SECONDS})
+
+
+def authenticate(request):
+    ticket = request.GET.get("ticket")
+    if ticket:
+        return user_from_ticket(ticket)
+    authentication = TracedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw = header and authentication.get_raw_token(header)
+    if not raw:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+async def application_events(request):
+    if not settings.ASGI_MODE:
+        return JsonResponse({"detail": "Поток событий доступен только в режиме ASGI."}, status=503)
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse({"detail": "Учетные данные не были предоставлены."}, status=401)
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.GET.get("last_event_id") or 0)
+    except ValueError:
+        last_id = 0
+
+    async def stream():
+        # subscribe before the replay, so that nothing falls in between
+        queue = bus.subscribe()
+        # the latest ids sent: transitions may commit out of id order, so a smaller id can still arrive
+        recent = deque(maxlen=RECENT_IDS)
+        try:
+            # a new stream has nothing to catch up on; a resync replays from where it subscribed
+            floor = last_id or await sync_to_async(latest_event_id)()
+            yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+            pending = await sync_to_async(missed_events)(user, last_id) if last_id else []
+            while True:
+                for event in pending:
+                    if event["id"] not in recent and visible_to(user, event):
+                        recent.append(event["id"])
+                        yield format_event(event)
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    pending = []
+                    yield ": keepalive\n\n"
+                    continue
+                if event is RESYNC:
+                    pending = await sync_to_async(missed_events)(user, min(recent, default=floor))
+                else:
+                    pending = [event]
+        finally:
+            bus.unsubscribe(queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx: pass events through instead of buffering the response
+    response["X-Accel-Buffering"] = "no"
+    return response
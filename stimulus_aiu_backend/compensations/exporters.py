@@ -4,6 +4,8 @@ from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, Alignment, PatternFill
 from django.utils.timezone import localtime
+from core.tracing import span
+
 from .models import Application, Paper
 
 def _coauthors_human(paper: Paper) -> str:
@@ -24,7 +26,65 @@ def _coauthors_human(paper: Paper) -> str:
     
     return "\n".join(items)
 
-def build_applications_xlsx(applications_qs: Iterable[Application]) -> bytes:
+def application_rows(app: Application) -> list:
+    """The rows of ``app`` in the export: one per paper, or one without paper columns."""
+    created_str = localtime(app.created_at).strftime("%Y-%m-%d %H:%M")
+
+    faculty_disp = app.get_faculty_display() if hasattr(app, 'get_faculty_display') else app.faculty
+    status_disp = app.get_status_display() if hasattr(app, 'get_status_display') else app.status
+
+    base_data = [
+        str(app.id).split('-')[0], 
+        app.report_year,
+        status_disp,
+        faculty_disp or "",
+        app.owner.full_name or "",
+        app.owner.email or "",
+        app.owner.position or "",
+        app.owner.subdivision or "",
+        app.owner.telephone or "",
+        created_str,
+        app.admin_comment or ""
+    ]
+
+    papers = list(app.papers.all())
+
+    if not papers:
+        return [base_data + [""] * 15]
+
+    rows = []
+    for p in papers:
+        details_parts = []
+        if p.volume: details_parts.append(f"Vol:{p.volume}")
+        if p.number: details_parts.append(f"No:{p.number}")
+        if p.pages: details_parts.append(f"pp.{p.pages}")
+        details_str = ", ".join(details_parts)
+
+        indexation_disp = p.get_indexation_display() if hasattr(p, 'get_indexation_display') else p.indexation
+    
+        paper_data = [
+            str(p.id),
+            p.title or "",
+            p.journal_or_source or "",
+            indexation_disp or "",
+            p.quartile or "",
+            p.percentile if p.percentile is not None else "",
+            p.doi or "",
+            p.publication_date.strftime("%d.%m.%Y") if p.publication_date else "",
+            p.year if p.year else "",
+            details_str,
+            "Yes" if p.has_university_affiliation else "No",
+            "Yes" if p.registered_in_platonus else "No",
+            p.source_url or "",
+            _coauthors_human(p),
+            (p.file_upload.name.split("/")[-1] if p.file_upload else ""),
+        ]
+
+        rows.append(base_data + paper_data)
+    return rows
+
+
+def build_applications_xlsx(applications_qs: Iterable[Application], archived: Iterable = ()) -> bytes:
     wb = Workbook()
     ws = wb.active
     ws.title = "Applications"
@@ -77,81 +137,33 @@ def build_applications_xlsx(applications_qs: Iterable[Application]) -> bytes:
     ws.freeze_panes = "A2"
 
     row_idx = 2
-    for app in applications_qs:
-        created_str = localtime(app.created_at).strftime("%Y-%m-%d %H:%M")
-        
-        faculty_disp = app.get_faculty_display() if hasattr(app, 'get_faculty_display') else app.faculty
-        status_disp = app.get_status_display() if hasattr(app, 'get_status_display') else app.status
-
-        base_data = [
-            str(app.id).split('-')[0], 
-            app.report_year,
-            status_disp,
-            faculty_disp or "",
-            app.owner.full_name or "",
-            app.owner.email or "",
-            app.owner.position or "",
-            app.owner.subdivision or "",
-            app.owner.telephone or "",
-            created_str,
-            app.admin_comment or ""
-        ]
-
-        papers = list(app.papers.all())
-
-        if not papers:
-            full_row = base_data + [""] * 15 
-            for c_i, val in enumerate(full_row, 1):
-                cell = ws.cell(row=row_idx, column=c_i, value=val)
-                should_wrap = columns_config[c_i-1][2]
-                cell.alignment = align_top_wrap if should_wrap else align_top_nowrap
-            row_idx += 1
-            continue
-
-        for p in papers:
-            details_parts = []
-            if p.volume: details_parts.append(f"Vol:{p.volume}")
-            if p.number: details_parts.append(f"No:{p.number}")
-            if p.pages: details_parts.append(f"pp.{p.pages}")
-            details_str = ", ".join(details_parts)
-
-            indexation_disp = p.get_indexation_display() if hasattr(p, 'get_indexation_display') else p.indexation
-            
-            paper_data = [
-                str(p.id),
-                p.title or "",
-                p.journal_or_source or "",
-                indexation_disp or "",
-                p.quartile or "",
-                p.percentile if p.percentile is not None else "",
-                p.doi or "",
-                p.publication_date.strftime("%d.%m.%Y") if p.publication_date else "",
-                p.year if p.year else "",
-                details_str,
-                "Yes" if p.has_university_affiliation else "No",
-                "Yes" if p.registered_in_platonus else "No",
-                p.source_url or "",
-                _coauthors_human(p),
-                (p.file_upload.name.split("/")[-1] if p.file_upload else ""),
-            ]
-
-            full_row = base_data + paper_data
-
+    status_fonts = {
+        "approved": Font(color="006100", bold=True),
+        "submitted": Font(color="806000", bold=True),
+        "rejected": Font(color="9C0006", bold=True),
+    }
+
+    def write(rows, status):
+        nonlocal row_idx
+        for full_row in rows:
             for c_i, val in enumerate(full_row, 1):
                 cell = ws.cell(row=row_idx, column=c_i, value=val)
                 should_wrap = columns_config[c_i-1][2]
                 cell.alignment = align_top_wrap if should_wrap else align_top_nowrap
-                if c_i == 3: 
-                    if app.status == 'approved':
-                        cell.font = Font(color="006100", bold=True) 
-                    elif app.status == 'submitted':
-                        cell.font = Font(color="806000", bold=True) 
-                    elif app.status == 'rejected':
-                        cell.font = Font(color="9C0006", bold=True) 
-
+                # rows without a paper keep the plain status
+                if c_i == 3 and full_row[11] and status in status_fonts:
+                    cell.font = status_fonts[status]
             row_idx += 1
 
-    io_buffer = BytesIO()
-    wb.save(io_buffer)
-    io_buffer.seek(0)
-    return io_buffer.read()
\ No newline at end of file
+    for app in applications_qs:
+        with span("xlsx.application", "document"):
+            write(application_rows(app), app.status)
+    # frozen rows of closed report years (compensations/archive.py)
+    for snapshot in archived:
+        write(snapshot.snapshot["export"], snapshot.status)
+
+    with span("xlsx.save", "document", rows=row_idx - 1):
+        io_buffer = BytesIO()
+        wb.save(io_buffer)
+        io_buffer.seek(0)
+        return io_buffer.read()
\ No newline at end of file
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from compensations.archive import YearNotClosed, archive_year
+from compensations.models import Application, ApplicationTransition, Coauthor, Paper, Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит заявки закрытого отчётного года в архив: неизменяемые сжатые снимки, из которых "
+        "отдаются карточка заявки и выгрузка XLSX. Заявки, публикации и их соавторы удаляются из рабочих таблиц."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int)
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--vacuum", action="store_true", help="VACUUM ANALYZE рабочих таблиц после переноса")
+
+    def handle(self, *args, **opts):
+        try:
+            moved = archive_year(opts["year"], opts["batch_size"])
+        except YearNotClosed as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} applications of {opts['year']}"))
+
+        if opts["vacuum"] and moved:
+            through = Paper.coauthors.through
+            models = (Application, Paper, Coauthor, through, ApplicationTransition, Tombstone)
+            with connection.cursor() as cursor:
+                for model in models:
+                    cursor.execute(f"VACUUM (ANALYZE) {connection.ops.quote_name(model._meta.db_table)}")
@@ -0,0 +1,105 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import User, uuid7
+from compensations.models import Application, Coauthor, Paper
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:8.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает случайные (UUIDv4) и упорядоченные по времени (UUIDv7) первичные ключи: "
+        "скорость вставки соавторов и рост индексов на копии текущих данных, а также размер "
+        "индексов рабочих таблиц."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000, help="Число вставляемых соавторов")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--empty", action="store_true",
+            help="Вставлять в пустые таблицы, а не в копию текущих соавторов (ключи v4)",
+        )
+
+    def handle(self, *args, **opts):
+        self._report_tables()
+        for name, generator in GENERATORS.items():
+            elapsed, growth = self._bench(generator, opts["rows"], opts["batch_size"], opts["empty"])
+            self.stdout.write(
+                f"{name}: {opts['rows'] / elapsed:8.0f} rows/s, index growth "
+                + ", ".join(f"{index} {_mb(size).strip()}" for index, size in growth.items())
+            )
+
+    def _report_tables(self):
+        through = Paper.coauthors.through._meta.db_table
+        tables = [model._meta.db_table for model in (User, Application, Paper, Coauthor)] + [through]
+        with connection.cursor() as cursor:
+            for table in tables:
+                cursor.execute(
+                    f"SELECT count(*), count(*) FILTER (WHERE substr(id::text, 15, 1) = '7') FROM {table}"
+                    if table != through else f"SELECT count(*), NULL FROM {table}"
+                )
+                rows, v7 = cursor.fetchone()
+                cursor.execute(
+                    "SELECT pg_relation_size(indexrelid) FROM pg_index WHERE indrelid = %s::regclass", [table]
+                )
+                index_size = sum(size for size, in cursor.fetchall())
+                share = f", v7 {v7 / rows:.0%}" if rows and v7 is not None else ""
+                self.stdout.write(f"{table:32} {rows:9} rows{share}, indexes {_mb(index_size)}")
+
+    def _bench(self, generator, rows, batch_size, empty=False):
+        """
+        Copies coauthor keys and paper links into temporary tables (unless
+        ``empty``), then inserts ``rows`` new coauthors keyed by ``generator``
+        and links them to existing papers. Returns the insert time and index
+        growth.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE bench_coauthor (id uuid NOT NULL, created_at timestamptz NOT NULL)")
+            cursor.execute(
+                "CREATE TEMP TABLE bench_link (id bigserial, paper_id uuid NOT NULL, coauthor_id uuid NOT NULL)"
+            )
+            if not empty:
+                cursor.execute(f"INSERT INTO bench_coauthor SELECT id, created_at FROM {Coauthor._meta.db_table}")
+                cursor.execute(
+                    f"INSERT INTO bench_link (paper_id, coauthor_id) "
+                    f"SELECT paper_id, coauthor_id FROM {Paper.coauthors.through._meta.db_table}"
+                )
+            # indexes built after the copy, as after a restore or REINDEX
+            cursor.execute("ALTER TABLE bench_coauthor ADD PRIMARY KEY (id)")
+            cursor.execute("ALTER TABLE bench_link ADD PRIMARY KEY (id)")
+            cursor.execute("CREATE INDEX ON bench_link (paper_id)")
+            cursor.execute("CREATE INDEX ON bench_link (coauthor_id)")
+            paper_ids = list(Paper.objects.values_list("id", flat=True)[:10000]) or [uuid.uuid4()]
+            before = self._index_sizes(cursor)
+
+            started = time.perf_counter()
+            for start in range(0, rows, batch_size):
+                keys = [generator() for _ in range(min(batch_size, rows - start))]
+                cursor.executemany("INSERT INTO bench_coauthor VALUES (%s, now())", [(key,) for key in keys])
+                cursor.executemany(
+                    "INSERT INTO bench_link (paper_id, coauthor_id) VALUES (%s, %s)",
+                    [(paper_ids[i % len(paper_ids)], key) for i, key in enumerate(keys, start)],
+                )
+            elapsed = time.perf_counter() - started
+
+            growth = {name: size - before.get(name, 0) for name, size in self._index_sizes(cursor).items()}
+            cursor.execute("DROP TABLE bench_link, bench_coauthor")
+        return elapsed, growth
+
+    @staticmethod
+    def _index_sizes(cursor):
+        cursor.execute(
+            "SELECT c.relname, pg_relation_size(i.indexrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid IN ('bench_coauthor'::regclass, 'bench_link'::regclass)"
+        )
+        return dict(cursor.fetchall())
@@ -0,0 +1,97 @@
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+from django.test import RequestFactory
+from rest_framework import renderers
+from rest_framework.request import Request
+
+from compensations.models import Paper
+from compensations.representations import represent
+from compensations.serializers import ApplicationSerializer, PaperSerializer
+from compensations.views import ApplicationViewSet, PaperViewSet
+from core.renderers import JSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает сериализаторы DRF и сборку ответа из строк .values() (compensations/representations.py) "
+        "на списках публикаций и заявок текущей БД: время выборки и сериализации, совпадение ответов; "
+        "рендер JSON модулем json (DRF), orjson и потоком: время, время до первого фрагмента, пик памяти."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Число публикаций в списке")
+        parser.add_argument("--repeat", type=int, default=9, help="Медиана N прогонов")
+
+    def handle(self, *args, **opts):
+        request = Request(RequestFactory().get("/api/"))
+        context = {"request": request}
+        paper_ids = list(Paper.objects.order_by("-created_at").values_list("pk", flat=True)[:opts["rows"]])
+        papers = PaperViewSet.queryset.filter(pk__in=paper_ids)
+        applications = ApplicationViewSet.queryset.filter(
+            pk__in=Paper.objects.filter(pk__in=paper_ids).values("application_id")
+        )
+
+        repeat = opts["repeat"]
+        for label, queryset, serializer_class in (
+            (f"papers ({len(paper_ids)})", papers, PaperSerializer),
+            (f"applications ({applications.count()})", applications, ApplicationSerializer),
+        ):
+            serialized = self._median(repeat, lambda: serializer_class(queryset, many=True, context=context).data)
+            values = self._median(repeat, lambda: represent(serializer_class(context=context), queryset))
+            (serializer_seconds, data), (values_seconds, values_data) = serialized, values
+            content = renderers.JSONRenderer().render(data)
+            same = content == renderers.JSONRenderer().render(values_data) == JSONRenderer().render(values_data) == (
+                b"".join(JSONRenderer().iter_render(values_data, settings.JSON_STREAM_CHUNK_ITEMS))
+            )
+            self.stdout.write(
+                f"{label}: serializers {serializer_seconds * 1000:.0f} ms, values {values_seconds * 1000:.0f} ms "
+                f"(x{serializer_seconds / values_seconds:.1f}), {len(content) / 1024 / 1024:.1f} MB, "
+                f"identical: {same}"
+            )
+            del content
+
+            for name, render in (
+                ("json", lambda: renderers.JSONRenderer().render(data)),
+                ("orjson", lambda: JSONRenderer().render(data)),
+                ("stream", lambda: self._stream(data)),
+            ):
+                seconds, result = self._median(repeat, render)
+                first = f", first chunk {result * 1000:.1f} ms" if name == "stream" else ""
+                self.stdout.write(
+                    f"  render {name}: {seconds * 1000:.0f} ms{first}, peak {self._peak(render) / 1024 / 1024:.1f} MB"
+                )
+
+    @staticmethod
+    def _stream(data):
+        """Seconds until the first list chunk, consuming the stream like a response would."""
+        started = time.perf_counter()
+        first = None
+        for chunk in JSONRenderer().iter_render(data, settings.JSON_STREAM_CHUNK_ITEMS):
+            if first is None and len(chunk) > 1:
+                first = time.perf_counter() - started
+        return first
+
+    @staticmethod
+    def _peak(call):
+        tracemalloc.start()
+        try:
+            call()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @staticmethod
+    def _median(repeat, call):
+        """Median seconds of ``repeat`` calls, and the result of the last one."""
+        timings = []
+        for _ in range(repeat):
+            reset_queries()
+            started = time.perf_counter()
+            result = call()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), result
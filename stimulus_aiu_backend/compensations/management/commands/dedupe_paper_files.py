@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from compensations.models import FileBlob, Paper
+from compensations.storage import BLOB_PREFIX, paper_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит файлы публикаций, загруженные до content-addressed хранилища, в blobs/ "
+        "(одинаковые файлы сохраняются один раз) и удаляет исходные копии."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--keep-originals", action="store_true", help="Не удалять исходные файлы")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        storage = paper_storage()
+        papers = (
+            Paper.objects.exclude(file_upload="").exclude(file_upload__isnull=True)
+            .exclude(file_upload__startswith=f"{BLOB_PREFIX}/")
+            .values_list("id", "file_upload")
+        )
+        moved = missing = freed = 0
+
+        for paper_id, old_name in papers.iterator(chunk_size=opts["batch_size"]):
+            if not storage.exists(old_name):
+                missing += 1
+                if opts["verbosity"] > 1:
+                    self.stderr.write(f"missing: {old_name}")
+                continue
+            size = storage.size(old_name)
+            if opts["dry_run"]:
+                self.stdout.write(f"would move: {old_name}")
+                moved += 1
+                continue
+
+            with storage.open(old_name, "rb") as content:
+                new_name = storage.save(old_name, content)
+            # queryset update: no post_save, the reference is counted here
+            Paper.objects.filter(id=paper_id, file_upload=old_name).update(file_upload=new_name)
+            FileBlob.add_reference(new_name, size=size)
+            if not opts["keep_originals"]:
+                storage.delete(old_name)
+                freed += size
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would move' if opts['dry_run'] else 'Moved'} {moved} files, {missing} missing, "
+            f"{freed / 1024 / 1024:.1f} MB of originals removed"
+        ))
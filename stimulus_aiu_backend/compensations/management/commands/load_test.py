@@ -0,0 +1,210 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .seed_synthetic_data import PLACEHOLDER_PDF
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Stats:
+    """Latencies per endpoint, shared by all worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class Client:
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, endpoint, method, path, json_body=None, body=None, content_type=None, expected=(200,)):
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            content_type = "application/json"
+        if content_type:
+            headers["Content-Type"] = content_type
+
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        started = time.perf_counter()
+        status, payload = None, b""
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+        except HTTPError as exc:
+            status, payload = exc.code, exc.read()
+        except (URLError, TimeoutError, ConnectionError):
+            pass
+        self.stats.record(endpoint, time.perf_counter() - started, status in expected)
+
+        if status not in expected:
+            raise RuntimeError(f"{method} {path} -> {status}: {payload[:200]!r}")
+        if payload and payload[:1] in (b"{", b"["):
+            return json.loads(payload)
+        return payload
+
+    def login(self, email, password):
+        data = self.request("login", "POST", "/api/auth/login/", {"email": email, "password": password})
+        self.token = data["access"]
+
+
+def researcher_flow(client, email, password, papers, rng):
+    client.login(email, password)
+    app = client.request(
+        "application create", "POST", "/api/applications/",
+        {"faculty": "it_engineering", "report_year": date.today().year}, expected=(201,),
+    )
+    for i in range(papers):
+        scopus = rng.random() < 0.6
+        fields = {
+            "application": app["id"],
+            "title": f"Load test paper {i}",
+            "journal_or_source": "IEEE Access",
+            "indexation": "scopus" if scopus else "wos",
+            "has_university_affiliation": "true",
+            "registered_in_platonus": "true",
+            "coauthors_json": json.dumps([{"full_name": "Иванов Иван", "position": "Доцент"}]),
+        }
+        if scopus:
+            fields["percentile"] = str(rng.randint(1, 99))
+        else:
+            fields["quartile"] = rng.choice(["Q1", "Q2", "Q3", "Q4"])
+        body, content_type = _multipart(fields, {"file_upload": ("article.pdf", PLACEHOLDER_PDF, "application/pdf")})
+        client.request("paper create", "POST", "/api/papers/", body=body, content_type=content_type, expected=(201,))
+
+    client.request("application submit", "POST", f"/api/applications/{app['id']}/submit/", {})
+    client.request("application list", "GET", "/api/applications/")
+    client.request("application detail", "GET", f"/api/applications/{app['id']}/")
+    client.request("application docx", "GET", f"/api/applications/{app['id']}/docx/")
+
+
+def admin_flow(client, email, password, rng):
+    client.login(email, password)
+    submitted = client.request("admin list", "GET", "/api/applications/?status=submitted")
+    if submitted:
+        app = rng.choice(submitted)
+        client.request(
+            "admin approve", "POST", f"/api/applications/{app['id']}/approve/", {},
+            expected=(200, 400),  # заявку мог уже одобрить другой администратор
+        )
+    client.request("admin export", "GET", "/api/applications/export_xlsx/?status=submitted")
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест API: проигрывает сценарии исследователей и администраторов против "
+        "запущенного сервера и печатает пропускную способность и p50/p95/p99 по эндпоинтам. "
+        "Пользователи берутся из seed_synthetic_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=60, help="Длительность теста, секунд")
+        parser.add_argument("--admin-ratio", type=float, default=0.1, help="Доля сценариев администратора")
+        parser.add_argument("--papers", type=int, default=2, help="Публикаций в заявке сценария исследователя")
+        parser.add_argument("--users", type=int, default=1000, help="Сколько синтетических исследователей задействовать")
+        parser.add_argument("--admins", type=int, default=5)
+        parser.add_argument("--password", default="password123")
+        parser.add_argument("--prefix", default="synthetic")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        if opts["users"] < 1 or opts["concurrency"] < 1:
+            raise CommandError("--users и --concurrency должны быть положительными.")
+
+        stats = Stats()
+        failures = defaultdict(int)
+        deadline = time.monotonic() + opts["duration"]
+        flows = {"researcher": 0, "admin": 0}
+        flows_lock = threading.Lock()
+
+        def worker(worker_id):
+            rng = random.Random(None if opts["seed"] is None else opts["seed"] + worker_id)
+            while time.monotonic() < deadline:
+                client = Client(opts["base_url"], stats, opts["timeout"])
+                kind = "admin" if opts["admins"] and rng.random() < opts["admin_ratio"] else "researcher"
+                try:
+                    if kind == "admin":
+                        email = f"{opts['prefix']}-admin-{rng.randrange(opts['admins'])}@example.com"
+                        admin_flow(client, email, opts["password"], rng)
+                    else:
+                        email = f"{opts['prefix']}-researcher-{rng.randrange(opts['users'])}@example.com"
+                        researcher_flow(client, email, opts["password"], opts["papers"], rng)
+                except RuntimeError as exc:
+                    with flows_lock:
+                        failures[str(exc)[:120]] += 1
+                    continue
+                with flows_lock:
+                    flows[kind] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts["concurrency"]) as pool:
+            list(pool.map(worker, range(opts["concurrency"])))
+        elapsed = time.perf_counter() - started
+
+        self._report(stats, elapsed, flows, failures)
+
+    def _report(self, stats, elapsed, flows, failures):
+        total = sum(len(v) for v in stats.latencies.values())
+        self.stdout.write(
+            f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s; "
+            f"flows completed: {flows['researcher']} researcher, {flows['admin']} admin\n"
+        )
+        header = f"{'endpoint':<22}{'count':>8}{'err':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for endpoint, values in sorted(stats.latencies.items()):
+            ms = [v * 1000 for v in values]
+            self.stdout.write(
+                f"{endpoint:<22}{len(ms):>8}{stats.errors[endpoint]:>6}{len(ms) / elapsed:>8.1f}"
+                f"{_percentile(ms, 50):>9.0f}{_percentile(ms, 95):>9.0f}{_percentile(ms, 99):>9.0f}{max(ms):>9.0f}"
+            )
+        if failures:
+            self.stdout.write(self.style.WARNING("\nFailed flows:"))
+            for message, count in sorted(failures.items(), key=lambda item: -item[1])[:10]:
+                self.stdout.write(f"  {count:>5}  {message}")
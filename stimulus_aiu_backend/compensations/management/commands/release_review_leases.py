@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from compensations.review import release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Снимает истёкшие закрепления заявок за проверяющими (очередь проверки). "
+        "Истёкшие заявки и без этого снова выдаются в очередь; команда лишь очищает поля."
+    )
+
+    def handle(self, *args, **opts):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired review leases"))
@@ -0,0 +1,230 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from core.models import User
+from compensations.models import Application, Paper, Coauthor, FileBlob
+from compensations.storage import paper_storage
+
+LAST_NAMES = [
+    "Ахметов", "Смагулов", "Иванов", "Нурланов", "Петров", "Жумабаев", "Ким", "Сейткали",
+    "Омаров", "Кузнецов", "Абенов", "Садыков", "Тулегенов", "Попов", "Есенов", "Бекмуханов",
+]
+FIRST_NAMES = [
+    "Айдар", "Асель", "Данияр", "Алия", "Ерлан", "Мария", "Нурлан", "Дана",
+    "Тимур", "Гульнара", "Арман", "Елена", "Бауыржан", "Камила", "Руслан", "Жанар",
+]
+POSITIONS = ["Ассистент", "Старший преподаватель", "Доцент", "Профессор", "Научный сотрудник"]
+JOURNALS = [
+    "Journal of Applied Physics", "Computers & Education", "Sustainability", "IEEE Access",
+    "Applied Sciences", "Economies", "Journal of Legal Studies", "Education Sciences",
+]
+TOPICS = [
+    "machine learning", "higher education", "renewable energy", "financial inclusion",
+    "digital law", "language policy", "water resources", "public health", "smart cities",
+]
+
+PLACEHOLDER_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+def _full_name(rng):
+    return f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические данные для нагрузочного тестирования: исследователей, "
+        "заявки за несколько отчётных лет, публикации (Scopus/WoS), соавторов и PDF-заглушки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20000, help="Число исследователей")
+        parser.add_argument("--admins", type=int, default=5)
+        parser.add_argument("--years", type=int, default=3, help="Число отчётных лет (по текущий включительно)")
+        parser.add_argument("--max-apps-per-year", type=int, default=2)
+        parser.add_argument("--max-papers", type=int, default=4, help="Максимум публикаций в заявке")
+        parser.add_argument("--max-coauthors", type=int, default=4, help="Максимум соавторов у публикации")
+        parser.add_argument("--files", action="store_true", help="Записать PDF-заглушки для публикаций")
+        parser.add_argument(
+            "--duplicate-files", type=float, default=0.2,
+            help="Доля публикаций, повторно загружающих уже существующий PDF",
+        )
+        parser.add_argument("--password", default="password123", help="Пароль всех синтетических пользователей")
+        parser.add_argument("--prefix", default="synthetic", help="Префикс email синтетических пользователей")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        self.batch_size = opts["batch_size"]
+        password = make_password(opts["password"])
+        prefix = opts["prefix"]
+
+        admins = self._create_users(f"{prefix}-admin", opts["admins"], password, rng, staff=True)
+        researchers = self._create_users(f"{prefix}-researcher", opts["users"], password, rng)
+        self.stdout.write(f"Users: {len(researchers)} researchers, {len(admins)} admins")
+
+        current_year = date.today().year
+        years = list(range(current_year - opts["years"] + 1, current_year + 1))
+        totals = {"applications": 0, "papers": 0, "coauthors": 0}
+
+        for start in range(0, len(researchers), self.batch_size):
+            owners = researchers[start:start + self.batch_size]
+            with transaction.atomic():
+                counts = self._create_batch(owners, years, current_year, opts, rng)
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(
+                f"  {min(start + self.batch_size, len(researchers))}/{len(researchers)} owners, "
+                f"{totals['applications']} applications, {totals['papers']} papers"
+            )
+
+        self._spread_timestamps(prefix)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['applications']} applications, {totals['papers']} papers, "
+            f"{totals['coauthors']} coauthors"
+        ))
+
+    def _create_users(self, email_prefix, count, password, rng, staff=False):
+        offset = User.objects.filter(email__startswith=f"{email_prefix}-").count()
+        users = [
+            User(
+                email=f"{email_prefix}-{offset + i}@example.com",
+                password=password,
+                full_name=_full_name(rng),
+                role=User.ROLE_ADMIN if staff else User.ROLE_RESEARCHER,
+                is_staff=staff,
+                is_superuser=staff,
+                position=rng.choice(POSITIONS),
+                subdivision=rng.choice(Application.FACULTY_CHOICES)[1],
+                telephone=f"+7 7{rng.randint(0, 99):02d} {rng.randint(0, 9999999):07d}",
+            )
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return users
+
+    def _create_batch(self, owners, years, current_year, opts, rng):
+        applications, papers, coauthors, links = [], [], [], []
+        files, file_names = Counter(), []
+        storage = paper_storage()
+        faculties = [value for value, _ in Application.FACULTY_CHOICES]
+
+        for owner in owners:
+            for year in years:
+                for _ in range(rng.randint(0, opts["max_apps_per_year"])):
+                    if year == current_year:
+                        status = rng.choice(["draft", "submitted", "submitted", "approved", "rejected"])
+                    else:
+                        status = rng.choice(["approved", "approved", "approved", "rejected"])
+                    app = Application(
+                        owner=owner,
+                        report_year=year,
+                        faculty=rng.choice(faculties),
+                        status=status,
+                        admin_comment="Нет подтверждения индексации" if status == "rejected" else "",
+                    )
+                    applications.append(app)
+
+                    for _ in range(rng.randint(1, opts["max_papers"])):
+                        scopus = rng.random() < 0.6
+                        published = date(year - 1, 1, 1) + timedelta(days=rng.randint(0, 364))
+                        paper = Paper(
+                            application=app,
+                            title=f"On {rng.choice(TOPICS)} in {rng.choice(TOPICS)}: evidence from Kazakhstan",
+                            journal_or_source=rng.choice(JOURNALS),
+                            indexation=Paper.INDEXATION_SCOPUS if scopus else Paper.INDEXATION_WOS,
+                            percentile=rng.randint(1, 99) if scopus else None,
+                            quartile=None if scopus else rng.choice(["Q1", "Q2", "Q3", "Q4"]),
+                            doi=f"10.{rng.randint(1000, 9999)}/{rng.getrandbits(40):x}",
+                            publication_date=published,
+                            year=published.year,
+                            number=str(rng.randint(1, 12)),
+                            volume=rng.randint(1, 80),
+                            pages=f"{rng.randint(1, 300)}-{rng.randint(301, 600)}",
+                            has_university_affiliation=True,
+                            registered_in_platonus=status != "draft" or rng.random() < 0.5,
+                        )
+                        if opts["files"]:
+                            if file_names and rng.random() < opts["duplicate_files"]:
+                                name = rng.choice(file_names)
+                            else:
+                                content = PLACEHOLDER_PDF + f"% {rng.getrandbits(64):x}\n".encode()
+                                name = storage.save("article.pdf", ContentFile(content))
+                                file_names.append(name)
+                            paper.file_upload.name = name
+                            files[name] += 1
+                        papers.append(paper)
+
+                        for c in range(rng.randint(0, opts["max_coauthors"])):
+                            coauthor = Coauthor(
+                                full_name=_full_name(rng),
+                                position=rng.choice(POSITIONS),
+                                email=f"co{rng.getrandbits(32):x}@example.com",
+                                is_aiu_employee=rng.random() < 0.4,
+                            )
+                            coauthors.append(coauthor)
+                            links.append(Paper.coauthors.through(paper=paper, coauthor=coauthor))
+
+        Application.objects.bulk_create(applications, batch_size=self.batch_size)
+        Paper.objects.bulk_create(papers, batch_size=self.batch_size)
+        Coauthor.objects.bulk_create(coauthors, batch_size=self.batch_size)
+        Paper.coauthors.through.objects.bulk_create(links, batch_size=self.batch_size)
+        # bulk_create skips the post_save signal that counts blob references
+        for name, count in files.items():
+            FileBlob.add_reference(name, size=storage.size(name))
+            if count > 1:
+                FileBlob.objects.filter(name=name).update(ref_count=F("ref_count") + count - 1)
+
+        return {"applications": len(applications), "papers": len(papers), "coauthors": len(coauthors)}
+
+    def _spread_timestamps(self, prefix):
+        """bulk_create stamps every row with now(); spread rows over their report year instead."""
+        if connection.vendor != "postgresql":
+            return
+        app_table = Application._meta.db_table
+        paper_table = Paper._meta.db_table
+        user_table = User._meta.db_table
+        # updated_at falls between created_at and now(), as for rows written by the API
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {app_table} AS a
+                SET created_at = s.created_at,
+                    updated_at = s.created_at + random() * (now() - s.created_at)
+                FROM (
+                    SELECT a.id,
+                           LEAST(make_date(a.report_year, 1, 1) + random() * interval '365 days', now()) AS created_at
+                    FROM {app_table} AS a
+                    JOIN {user_table} AS u ON u.id = a.owner_id
+                    WHERE u.email LIKE %s
+                ) AS s
+                WHERE a.id = s.id
+                """,
+                [f"{prefix}-researcher-%"],
+            )
+            cursor.execute(
+                f"""
+                UPDATE {paper_table} AS p
+                SET created_at = s.created_at,
+                    updated_at = s.created_at + random() * (now() - s.created_at)
+                FROM (
+                    SELECT p.id, LEAST(a.created_at + random() * interval '3 days', now()) AS created_at
+                    FROM {paper_table} AS p
+                    JOIN {app_table} AS a ON a.id = p.application_id
+                    JOIN {user_table} AS u ON u.id = a.owner_id
+                    WHERE u.email LIKE %s
+                ) AS s
+                WHERE p.id = s.id
+                """,
+                [f"{prefix}-researcher-%"],
+            )
@@ -0,0 +1,163 @@
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from compensations.models import Application, ArchivedFile, FileBlob, Paper, UploadSession
+from compensations.storage import paper_storage
+
+
+def iter_storage_files(storage, path):
+    """Yield file names under ``path`` one directory listing at a time."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f"{path}/{name}"
+    for directory in directories:
+        yield from iter_storage_files(storage, f"{path}/{directory}")
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _valid_uuids(values):
+    valid = []
+    for value in values:
+        try:
+            valid.append(uuid.UUID(value))
+        except ValueError:
+            pass
+    return valid
+
+
+def referenced_paper_files(names):
+    referenced = set(Paper.objects.filter(file_upload__in=names).values_list("file_upload", flat=True))
+    referenced.update(FileBlob.objects.filter(name__in=names, ref_count__gt=0).values_list("name", flat=True))
+    referenced.update(archived_files(names))
+    return referenced
+
+
+def referenced_documents(names):
+    referenced = set(Application.objects.filter(generated_docx__in=names).values_list("generated_docx", flat=True))
+    referenced.update(archived_files(names))
+    return referenced
+
+
+def archived_files(names):
+    # files of archived applications (compensations/archive.py)
+    return ArchivedFile.objects.filter(name__in=names).values_list("name", flat=True)
+
+
+# (storage, top-level directories to sweep, lookup of the names still referenced from the database)
+SOURCES = [
+    (paper_storage, ("blobs", "papers"), referenced_paper_files),
+    (lambda: default_storage, ("generated", "applications/docx"), referenced_documents),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы в media, на которые не ссылается ни одна запись в БД, включая архив заявок "
+        "(старые файлы публикаций, blob без ссылок, сгенерированные документы), и брошенные сессии "
+        "загрузки старше периода ожидания."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-hours", type=float, default=24, help="Не трогать файлы моложе этого срока")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Показать файлы, которые будут удалены")
+        parser.add_argument("--report", action="store_true", help="Только сводка по каталогам, без удаления")
+
+    def handle(self, *args, **opts):
+        self.cutoff = timezone.now() - timedelta(hours=opts["grace_hours"])
+        self.delete = not (opts["dry_run"] or opts["report"])
+        self.verbose = opts["dry_run"]
+        self.summary = defaultdict(lambda: [0, 0])  # directory -> [files, bytes]
+
+        for get_storage, directories, lookup in SOURCES:
+            storage = get_storage()
+            for directory in directories:
+                for names in batched(iter_storage_files(storage, directory), opts["batch_size"]):
+                    referenced = lookup(names)
+                    for name in names:
+                        if name not in referenced:
+                            self._sweep_file(storage, name, directory)
+
+        self._sweep_uploads()
+        self._print_summary()
+
+    def _sweep_file(self, storage, name, directory):
+        try:
+            if storage.get_modified_time(name) >= self.cutoff:
+                return
+            size = storage.size(name)
+        except FileNotFoundError:
+            return
+
+        if self.delete and name.startswith("blobs/"):
+            # a blob may have been referenced or reused since the batch was checked;
+            # the row stays locked until the file is gone (FileBlob.keep waits for it)
+            with transaction.atomic():
+                if FileBlob.lock_unreferenced(name, self.cutoff):
+                    self._remove(directory, name, size, lambda: storage.delete(name))
+                    FileBlob.objects.filter(name=name).delete()
+            return
+        self._remove(directory, name, size, lambda: storage.delete(name))
+
+    def _sweep_uploads(self):
+        stale = UploadSession.objects.filter(updated_at__lt=self.cutoff)
+        for session in stale.iterator():
+            path = os.path.join(settings.UPLOAD_TEMP_DIR, f"{session.id}.part")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            self._remove("upload sessions", str(session.id), size, session.delete)
+            if self.delete and os.path.exists(path):
+                os.remove(path)
+
+        if not os.path.isdir(settings.UPLOAD_TEMP_DIR):
+            return
+        with os.scandir(settings.UPLOAD_TEMP_DIR) as entries:
+            for batch in batched(entries, 1000):
+                ids = [entry.name.removesuffix(".part") for entry in batch]
+                live = {str(pk) for pk in UploadSession.objects.filter(id__in=_valid_uuids(ids)).values_list("id", flat=True)}
+                for entry in batch:
+                    stat = entry.stat()
+                    modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+                    if entry.name.removesuffix(".part") in live or modified >= self.cutoff:
+                        continue
+                    self._remove("upload_tmp", entry.name, stat.st_size, lambda path=entry.path: os.remove(path))
+
+    def _remove(self, directory, name, size, delete):
+        self.summary[directory][0] += 1
+        self.summary[directory][1] += size
+        if self.verbose:
+            self.stdout.write(f"would delete {name} ({size} B)")
+        if self.delete:
+            delete()
+
+    def _print_summary(self):
+        action = "Deleted" if self.delete else "Unreferenced"
+        total_files = total_bytes = 0
+        for directory, (files, size) in sorted(self.summary.items()):
+            self.stdout.write(f"{directory:<20}{files:>10} files {size / 1024 / 1024:>10.1f} MB")
+            total_files += files
+            total_bytes += size
+        self.stdout.write(self.style.SUCCESS(
+            f"{action}: {total_files} files, {total_bytes / 1024 / 1024:.1f} MB "
+            f"(older than {self.cutoff:%Y-%m-%d %H:%M} UTC)"
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:58
+
+import compensations.models
+import compensations.storage
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('name', models.CharField(max_length=1024, unique=True, verbose_name='Путь в хранилище')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Размер, байт')),
+                ('ref_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл (blob)',
+                'verbose_name_plural': 'Файлы (blob)',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='paper',
+            name='file_upload',
+            field=models.FileField(blank=True, max_length=1024, null=True, storage=compensations.storage.paper_storage, upload_to=compensations.models.article_upload_path, verbose_name='Файл публикации/подтверждения'),
+        ),
+    ]
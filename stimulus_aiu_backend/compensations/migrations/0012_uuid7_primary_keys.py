@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:20
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0011_fileblob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='application',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='coauthor',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='fileblob',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='paper',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='id',
+            field=models.UUIDField(default=core.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
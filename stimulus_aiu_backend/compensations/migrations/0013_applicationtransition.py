@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0012_uuid7_primary_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationTransition',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('from_status', models.CharField(choices=[('draft', 'Черновик'), ('submitted', 'Отправлено'), ('approved', 'Одобрено'), ('rejected', 'Отклонено')], max_length=32, verbose_name='Был статус')),
+                ('to_status', models.CharField(choices=[('draft', 'Черновик'), ('submitted', 'Отправлено'), ('approved', 'Одобрено'), ('rejected', 'Отклонено')], max_length=32, verbose_name='Новый статус')),
+                ('comment', models.TextField(blank=True, default='', verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Кто изменил')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='compensations.application', verbose_name='Заявка')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса заявки',
+                'verbose_name_plural': 'История статусов заявок',
+                'ordering': ['application', 'id'],
+            },
+        ),
+    ]
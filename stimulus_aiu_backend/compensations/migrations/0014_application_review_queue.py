@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0013_applicationtransition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='review_lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Заявка закреплена за проверяющим до'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='reviewer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Проверяющий'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(condition=models.Q(('status', 'submitted')), fields=['created_at'], name='application_review_queue_idx'),
+        ),
+    ]
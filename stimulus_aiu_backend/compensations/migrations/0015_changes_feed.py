@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0014_application_review_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=32, verbose_name='Модель')),
+                ('object_id', models.UUIDField(verbose_name='ID объекта')),
+                ('owner_id', models.UUIDField(blank=True, null=True, verbose_name='Владелец')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+                'ordering': ['deleted_at', 'id'],
+                'indexes': [models.Index(fields=['model', 'deleted_at', 'id'], name='tombstone_feed_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['updated_at', 'id'], name='application_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coauthor',
+            index=models.Index(fields=['updated_at', 'id'], name='coauthor_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paper',
+            index=models.Index(fields=['updated_at', 'id'], name='paper_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 19:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0015_changes_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedApplication',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('report_year', models.PositiveIntegerField(db_index=True, verbose_name='Отчётный год')),
+                ('faculty', models.CharField(blank=True, choices=[('pedagogical_institute', 'Педагогический институт'), ('arts_humanities', 'Высшая школа искусства и гуманитарных наук'), ('it_engineering', 'Высшая школа информационных технологий и инженерии'), ('natural_sciences', 'Высшая школа естественных наук'), ('economics', 'Высшая школа экономики'), ('law', 'Высшая школа права')], max_length=64, null=True, verbose_name='Факультет')),
+                ('status', models.CharField(choices=[('draft', 'Черновик'), ('submitted', 'Отправлено'), ('approved', 'Одобрено'), ('rejected', 'Отклонено')], max_length=32, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('data', models.BinaryField(verbose_name='Снимок')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_applications', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Архивная заявка',
+                'verbose_name_plural': 'Архив заявок',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFile',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('paper_id', models.UUIDField(blank=True, null=True, unique=True, verbose_name='ID публикации')),
+                ('name', models.CharField(db_index=True, max_length=1024, verbose_name='Путь в хранилище')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='compensations.archivedapplication', verbose_name='Архивная заявка')),
+            ],
+            options={
+                'verbose_name': 'Файл архивной заявки',
+                'verbose_name_plural': 'Файлы архивных заявок',
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 21:40
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('compensations', '0016_report_year_archive'),
+        # pg_trgm
+        ('core', '0005_search_trigram_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='coauthor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('full_name'), name='gin_trgm_ops'), name='coauthor_full_name_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='coauthor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='coauthor_email_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='coauthor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('telephone'), name='gin_trgm_ops'), name='coauthor_telephone_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='paper',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='paper_title_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='paper',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('doi'), name='gin_trgm_ops'), name='paper_doi_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='paper',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('journal_or_source'), name='gin_trgm_ops'), name='paper_journal_trgm'),
+        ),
+    ]
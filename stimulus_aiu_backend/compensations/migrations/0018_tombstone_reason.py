@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0017_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='reason',
+            field=models.CharField(choices=[('deleted', 'Удалён'), ('archived', 'Перенесён в архив')], default='deleted', max_length=16, verbose_name='Причина'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:40
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('compensations', '0018_tombstone_reason'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='coauthor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('position'), name='gin_trgm_ops'), name='coauthor_position_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='coauthor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('subdivision'), name='gin_trgm_ops'), name='coauthor_subdivision_trgm'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compensations', '0019_coauthor_position_subdivision_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='coauthor',
+            options={'ordering': ['full_name', 'id'], 'verbose_name': 'Соавтор', 'verbose_name_plural': 'Соавторы'},
+        ),
+    ]
@@ -1,13 +1,19 @@
+import json
 import os
 import uuid
+import zlib
 from datetime import date
 
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connection, models
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-from core.models import UUIDModel, TimeStampedModel, StatusModel
+from core.models import UUIDModel, TimeStampedModel, StatusModel, TracedQuerySet, trigram_index, uuid7
+
+from .storage import blob_digest, paper_storage
 
 
 def article_upload_path(instance, filename):
@@ -73,15 +79,71 @@ class Application(UUIDModel, TimeStampedModel, StatusModel):
         verbose_name="Сгенерированный DOCX"
     )
 
+    # очередь проверки (compensations/review.py)
+    reviewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Проверяющий",
+    )
+    review_lease_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Заявка закреплена за проверяющим до",
+    )
+
+    objects = TracedQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Заявка на компенсацию"
         verbose_name_plural = "Заявки на компенсацию"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["created_at"], condition=Q(status="submitted"), name="application_review_queue_idx",
+            ),
+            # лента изменений (compensations/changes.py)
+            models.Index(fields=["updated_at", "id"], name="application_updated_idx"),
+        ]
 
     def __str__(self):
         return f"Заявка {self.id} ({self.owner})"
 
 
+class ApplicationTransition(models.Model):
+    """One status change of an application, written by compensations/transitions.py."""
+
+    id = models.BigAutoField(primary_key=True)
+    application = models.ForeignKey(
+        Application,
+        on_delete=models.CASCADE,
+        related_name="transitions",
+        verbose_name="Заявка",
+    )
+    from_status = models.CharField(max_length=32, choices=StatusModel.STATUS_CHOICES, verbose_name="Был статус")
+    to_status = models.CharField(max_length=32, choices=StatusModel.STATUS_CHOICES, verbose_name="Новый статус")
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Кто изменил",
+    )
+    comment = models.TextField(blank=True, default="", verbose_name="Комментарий")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата")
+
+    class Meta:
+        verbose_name = "Смена статуса заявки"
+        verbose_name_plural = "История статусов заявок"
+        ordering = ["application", "id"]
+
+    def __str__(self):
+        return f"{self.application_id}: {self.from_status} → {self.to_status}"
+
+
 class Coauthor(UUIDModel, TimeStampedModel):
 
     full_name = models.CharField(
@@ -113,10 +175,22 @@ class Coauthor(UUIDModel, TimeStampedModel):
         verbose_name="Сотрудник AIU",
     )
 
+    objects = TracedQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Соавтор"
         verbose_name_plural = "Соавторы"
-        ordering = ["full_name"]
+        # id: coauthors with the same name keep one order in every read path
+        ordering = ["full_name", "id"]
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="coauthor_updated_idx"),
+            # поиск в админке, автодополнение соавторов и API
+            trigram_index("full_name", "coauthor_full_name_trgm"),
+            trigram_index("email", "coauthor_email_trgm"),
+            trigram_index("position", "coauthor_position_trgm"),
+            trigram_index("subdivision", "coauthor_subdivision_trgm"),
+            trigram_index("telephone", "coauthor_telephone_trgm"),
+        ]
 
     def __str__(self):
         return self.full_name or "Соавтор без имени"
@@ -243,12 +317,15 @@ class Paper(UUIDModel, TimeStampedModel):
 
     file_upload = models.FileField(
         upload_to=article_upload_path,
+        storage=paper_storage,
         max_length=1024,
         verbose_name="Файл публикации/подтверждения",
         blank=True,
         null=True,
     )
 
+    objects = TracedQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Публикация"
         verbose_name_plural = "Публикации"
@@ -270,6 +347,21 @@ class Paper(UUIDModel, TimeStampedModel):
                 ),
             ),
         ]
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="paper_updated_idx"),
+            # поиск в админке и API
+            trigram_index("title", "paper_title_trgm"),
+            trigram_index("doi", "paper_doi_trgm"),
+            trigram_index("journal_or_source", "paper_journal_trgm"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # file name as stored, to count blob references when it changes (signals.py)
+        if "file_upload" in field_names:
+            instance._stored_file_name = values[field_names.index("file_upload")] or ""
+        return instance
 
     def __str__(self):
         tag = ""
@@ -279,4 +371,204 @@ class Paper(UUIDModel, TimeStampedModel):
             tag = str(self.percentile)
         if tag:
             tag = f" {tag}"
-        return f"{self.title} [{self.indexation}{tag}]"
\ No newline at end of file
+        return f"{self.title} [{self.indexation}{tag}]"
+
+
+class Tombstone(models.Model):
+    """A deleted application, paper or coauthor, reported by the changes feed (compensations/changes.py)."""
+
+    DELETED = "deleted"
+    ARCHIVED = "archived"
+    REASON_CHOICES = [
+        (DELETED, "Удалён"),
+        (ARCHIVED, "Перенесён в архив"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=32, verbose_name="Модель")
+    object_id = models.UUIDField(verbose_name="ID объекта")
+    # не FK: владелец может быть удалён; пусто — виден всем (соавторы)
+    owner_id = models.UUIDField(null=True, blank=True, verbose_name="Владелец")
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Дата удаления")
+    reason = models.CharField(max_length=16, choices=REASON_CHOICES, default=DELETED, verbose_name="Причина")
+
+    class Meta:
+        verbose_name = "Удалённый объект"
+        verbose_name_plural = "Удалённые объекты"
+        ordering = ["deleted_at", "id"]
+        indexes = [models.Index(fields=["model", "deleted_at", "id"], name="tombstone_feed_idx")]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+
+class ArchivedApplication(models.Model):
+    """An application of a closed report year, frozen by compensations/archive.py; never changes."""
+
+    # id заявки до архивации
+    id = models.UUIDField(primary_key=True, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="archived_applications",
+        verbose_name="Владелец",
+    )
+    report_year = models.PositiveIntegerField(db_index=True, verbose_name="Отчётный год")
+    faculty = models.CharField(
+        max_length=64,
+        choices=Application.FACULTY_CHOICES,
+        blank=True,
+        null=True,
+        verbose_name="Факультет",
+    )
+    status = models.CharField(max_length=32, choices=StatusModel.STATUS_CHOICES, verbose_name="Статус")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Дата архивации")
+    # сжатый JSON: ответ API, строки выгрузки XLSX и история статусов
+    data = models.BinaryField(verbose_name="Снимок")
+
+    class Meta:
+        verbose_name = "Архивная заявка"
+        verbose_name_plural = "Архив заявок"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Заявка {self.id} ({self.report_year}, архив)"
+
+    @cached_property
+    def snapshot(self):
+        return json.loads(zlib.decompress(self.data))
+
+
+class ArchivedFile(models.Model):
+    """A stored file an archived application still refers to (paper file or generated DOCX)."""
+
+    id = models.BigAutoField(primary_key=True)
+    application = models.ForeignKey(
+        ArchivedApplication,
+        on_delete=models.CASCADE,
+        related_name="files",
+        verbose_name="Архивная заявка",
+    )
+    # пусто — сгенерированный DOCX заявки
+    paper_id = models.UUIDField(null=True, blank=True, unique=True, verbose_name="ID публикации")
+    name = models.CharField(max_length=1024, db_index=True, verbose_name="Путь в хранилище")
+
+    class Meta:
+        verbose_name = "Файл архивной заявки"
+        verbose_name_plural = "Файлы архивных заявок"
+
+    def __str__(self):
+        return self.name
+
+
+class UploadSession(UUIDModel, TimeStampedModel):
+    """Resumable upload of a paper file, received in numbered chunks (see compensations/uploads.py)."""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="upload_sessions",
+        verbose_name="Владелец",
+    )
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    chunk_size = models.PositiveIntegerField(verbose_name="Размер части, байт")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Получено, байт")
+
+    class Meta:
+        verbose_name = "Сессия загрузки"
+        verbose_name_plural = "Сессии загрузки"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.filename} {self.offset}/{self.size}"
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+
+class FileBlob(UUIDModel, TimeStampedModel):
+    """A stored paper file shared by all papers with identical content (compensations/storage.py)."""
+
+    name = models.CharField(max_length=1024, unique=True, verbose_name="Путь в хранилище")
+    sha256 = models.CharField(max_length=64, db_index=True, verbose_name="SHA-256")
+    size = models.PositiveBigIntegerField(default=0, verbose_name="Размер, байт")
+    ref_count = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Число ссылок")
+
+    class Meta:
+        verbose_name = "Файл (blob)"
+        verbose_name_plural = "Файлы (blob)"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.name} ×{self.ref_count}"
+
+    @classmethod
+    def add_reference(cls, name, size=0):
+        """Count one more paper pointing at ``name``; creates the row on first use."""
+        digest = blob_digest(name)
+        if digest is None:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} (id, created_at, updated_at, name, sha256, size, ref_count)
+                VALUES (%s, now(), now(), %s, %s, %s, 1)
+                ON CONFLICT (name) DO UPDATE
+                SET ref_count = {cls._meta.db_table}.ref_count + 1,
+                    size = GREATEST({cls._meta.db_table}.size, EXCLUDED.size),
+                    updated_at = now()
+                """,
+                [uuid7(), name, digest, size],
+            )
+
+    @classmethod
+    def keep(cls, name):
+        """
+        Mark ``name`` as in use before a stored file is reused: waits for a
+        sweep_media that holds the row and restarts the grace period of the blob.
+        """
+        digest = blob_digest(name)
+        if digest is None:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} (id, created_at, updated_at, name, sha256, size, ref_count)
+                VALUES (%s, now(), now(), %s, %s, 0, 0)
+                ON CONFLICT (name) DO UPDATE SET updated_at = now()
+                """,
+                [uuid7(), name, digest],
+            )
+
+    @classmethod
+    def lock_unreferenced(cls, name, cutoff):
+        """
+        Lock the row of ``name`` (inside a transaction) and tell whether the
+        file may be deleted: no references and not touched since ``cutoff``.
+        A blob without a row gets a placeholder row, locked the same way.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {cls._meta.db_table} (id, created_at, updated_at, name, sha256, size, ref_count)
+                VALUES (%s, now(), now(), %s, %s, 0, 0)
+                ON CONFLICT (name) DO NOTHING
+                RETURNING id
+                """,
+                [uuid7(), name, blob_digest(name) or ""],
+            )
+            if cursor.fetchone() is not None:
+                return True
+        blob = cls.objects.select_for_update().filter(name=name).first()
+        return blob is not None and blob.ref_count == 0 and blob.updated_at < cutoff
+
+    @classmethod
+    def release_reference(cls, name):
+        if blob_digest(name) is None:
+            return
+        cls.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=models.F("ref_count") - 1, updated_at=timezone.now(),
+        )
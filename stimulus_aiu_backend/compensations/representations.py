@@ -0,0 +1,199 @@
+"""
+GET list and retrieve without per-object serialization.
+
+A DRF serializer looks up and converts every value through a field object,
+per object, which dominates the CPU time of large lists. ``represent``
+compiles the readable fields of a serializer once per request into
+(``.values()`` key, converter) pairs, reads the rows with ``.values()``
+and fills nested serializers (application papers, paper coauthors) from
+one more ``.values()`` query each, grouped in Python. The result is the
+same data, in the same key order, as ``serializer.data`` (tests compare
+the rendered JSON byte for byte).
+
+Access is only checked by the queryset: the viewsets using
+ValuesReadMixin must scope ``get_queryset`` to what the user may see.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core.instrumentation import measure
+from core.tracing import span
+
+
+def _same(value):
+    return value
+
+
+def _file_url(storage, request):
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    base_url = getattr(storage, "base_url", None)
+    if not (isinstance(storage, FileSystemStorage) and base_url and base_url.startswith("/")
+            and not base_url.startswith("//") and base_url.endswith("/")):
+        return convert
+    # FileSystemStorage.url is urljoin(base_url, name): a plain concatenation unless
+    # the name has segments urljoin normalizes ("." / ".." / empty ones)
+    prefix = request.build_absolute_uri(base_url) if request is not None else base_url
+
+    def concatenate(name):
+        if not name:
+            return None
+        path = filepath_to_uri(name).lstrip("/")
+        if path.startswith(".") or "/." in path or "//" in path:
+            return convert(name)
+        return prefix + path
+    return concatenate
+
+
+def _datetime(field):
+    """DateTimeField.to_representation with the time zone looked up once instead of per value."""
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if getattr(field, "format", api_settings.DATETIME_FORMAT) != ISO_8601 or tz is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return convert
+
+
+def _converter(field, model_field):
+    """What ``field.to_representation`` does to a value of ``model_field`` read by ``.values()``."""
+    if isinstance(field, serializers.FileField):
+        return _file_url(model_field.storage, field.context.get("request"))
+    if isinstance(field, serializers.IntegerField):
+        # CoauthorIdField marks its numbers for the JSON renderer
+        return int if type(field) is serializers.IntegerField else field.to_representation
+    if isinstance(field, (serializers.CharField, serializers.ChoiceField, serializers.BooleanField)):
+        return _same
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return _same
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime(field)
+    return field.to_representation
+
+
+def _plan(serializer, model):
+    """
+    (output name, ``.values()`` key, converter) per readable field of
+    ``serializer``, and (output name, fetch) per nested list serializer.
+    """
+    fields, nested = [], []
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.ListSerializer):
+            fields.append((field.field_name, None, None))
+            nested.append((field.field_name, _nested_fetch(model, field)))
+            continue
+        *path, name = field.source_attrs
+        owner = model
+        for attr in path:
+            owner = owner._meta.get_field(attr).related_model
+        display = re.fullmatch(r"get_(\w+)_display", name)
+        if display:
+            model_field = owner._meta.get_field(display[1])
+            choices = dict(model_field.flatchoices)
+            convert = lambda value, choices=choices: choices.get(value, value)
+        else:
+            model_field = owner._meta.get_field(name)
+            convert = _converter(field, model_field)
+        fields.append((field.field_name, "__".join([*path, model_field.attname]), convert))
+    return fields, nested
+
+
+def _nested_fetch(model, field):
+    """A function returning (parent pk, pk, data) rows of nested ``field`` for a list of parent pks."""
+    relation = model._meta.get_field(field.source)
+    related = relation.related_model
+    if relation.one_to_many:
+        parent = relation.field.attname
+        return lambda ids: _rows(
+            field.child, related, related._default_manager.filter(**{f"{parent}__in": ids}), group_by=parent,
+        )
+    if relation.many_to_many and not relation.auto_created:
+        through = relation.remote_field.through
+        source, target = relation.m2m_field_name(), relation.m2m_reverse_field_name()
+        parent = through._meta.get_field(source).attname
+        # the order the prefetch of the related model has
+        ordering = [
+            f"-{target}__{name[1:]}" if name.startswith("-") else f"{target}__{name}"
+            for name in related._meta.ordering
+        ]
+        return lambda ids: _rows(
+            field.child, related, through.objects.filter(**{f"{parent}__in": ids}).order_by(*ordering),
+            prefix=f"{target}__", group_by=parent,
+        )
+    raise ValueError(f"Unsupported nested serializer {field.field_name} on {model.__name__}")
+
+
+def _rows(serializer, model, queryset, prefix="", group_by=None):
+    fields, nested = _plan(serializer, model)
+    pk = prefix + model._meta.pk.attname
+    keys = {pk, *(prefix + key for _, key, _ in fields if key)}
+    if group_by:
+        keys.add(group_by)
+
+    with span(f"values {model.__name__}", "orm"):
+        values = list(queryset.values(*keys))
+    rows = []
+    with measure("serialize"), span(f"represent {model.__name__}", "serializer", rows=len(values)):
+        for row in values:
+            data = {}
+            for name, key, convert in fields:
+                if key is None:
+                    data[name] = None  # filled below, keeps the key order
+                    continue
+                value = row[prefix + key]
+                data[name] = None if value is None else convert(value)
+            rows.append((row[group_by] if group_by else None, row[pk], data))
+
+    for name, fetch in nested:
+        children = defaultdict(list)
+        if rows:
+            for parent, _, child in fetch([row_pk for _, row_pk, _ in rows]):
+                children[parent].append(child)
+        for _, pk_value, data in rows:
+            data[name] = children.get(pk_value, [])
+    return rows
+
+
+def represent(serializer, queryset):
+    """``serializer.__class__(queryset, many=True).data``, built from ``.values()`` rows."""
+    return [data for _, _, data in _rows(serializer, queryset.model, queryset.prefetch_related(None))]
+
+
+class ValuesReadMixin:
+    """Serve ``list`` and ``retrieve`` of a viewset through ``represent`` (VALUES_READ_PATH)."""
+
+    def list(self, request, *args, **kwargs):
+        if not settings.VALUES_READ_PATH:
+            return super().list(request, *args, **kwargs)
+        return Response(represent(self.get_serializer(), self.filter_queryset(self.get_queryset())))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.VALUES_READ_PATH:
+            return super().retrieve(request, *args, **kwargs)
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            data = represent(self.get_serializer(), queryset.filter(**{self.lookup_field: kwargs[lookup]}))
+        except (TypeError, ValueError, DjangoValidationError):
+            data = None
+        if not data:
+            raise Http404
+        return Response(data[0])
@@ -0,0 +1,67 @@
+"""
+Review queue of submitted applications.
+
+``claim`` gives one administrator the oldest submitted applications that
+nobody is reviewing, for REVIEW_LEASE_SECONDS. Candidates are locked with
+FOR UPDATE SKIP LOCKED, so reviewers claiming at the same moment get
+different applications and never wait for each other. A claim ends when
+the application changes status (compensations/transitions.py), when the
+reviewer releases it, or when the lease expires; expired leases can be
+claimed again right away and are cleared by ``release_review_leases``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Application
+from .transitions import application_pk
+
+
+def claimable(now):
+    return Q(status="submitted") & (Q(review_lease_until__isnull=True) | Q(review_lease_until__lt=now))
+
+
+def claim(reviewer, count, faculty=None, report_year=None):
+    """Claim up to ``count`` applications for ``reviewer``; returns their ids, oldest first."""
+    now = timezone.now()
+    candidates = Application.objects.filter(claimable(now))
+    if faculty:
+        candidates = candidates.filter(faculty=faculty)
+    if report_year:
+        candidates = candidates.filter(report_year=report_year)
+
+    with transaction.atomic():
+        ids = list(
+            candidates.order_by("created_at").select_for_update(skip_locked=True).values_list("id", flat=True)[:count]
+        )
+        if ids:
+            # claims are shown only by the review queue, so cached lists stay valid
+            Application.objects.filter(pk__in=ids).update(
+                reviewer=reviewer, review_lease_until=now + timedelta(seconds=settings.REVIEW_LEASE_SECONDS),
+            )
+    return ids
+
+
+def open_to(reviewer):
+    """Applications ``reviewer`` may decide: unclaimed, claimed by them, or with an expired lease."""
+    return Q(reviewer__isnull=True) | Q(reviewer=reviewer) | Q(review_lease_until__lt=timezone.now())
+
+
+def claimed_by(reviewer):
+    return Application.objects.filter(reviewer=reviewer, review_lease_until__gte=timezone.now(), status="submitted")
+
+
+def release(reviewer, pk):
+    """End ``reviewer``'s claim on application ``pk``; returns whether there was one."""
+    return bool(
+        Application.objects.filter(pk=application_pk(pk), reviewer=reviewer).update(reviewer=None, review_lease_until=None)
+    )
+
+
+def release_expired():
+    return Application.objects.filter(review_lease_until__lt=timezone.now()).update(
+        reviewer=None, review_lease_until=None,
+    )
@@ -1,14 +1,27 @@
 import json
 from rest_framework import serializers
-from .models import Application, Paper, Coauthor
+
+from core.instrumentation import TimedSerializerMixin
+from core.metrics import observe_upload
+from core.renderers import WideInt
+from . import review
+from .models import Application, Paper, Coauthor, UploadSession
+from .transitions import HAS_FILES, SUBMITTABLE, transition
 
 BLOCKED_STATUSES = {"approved", "submitted"}
 MAX_UPLOAD_BYTES = 5 * 1024 * 1024
 ALLOWED_CONTENT_TYPES = {"application/pdf"}
 
 
-class CoauthorSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField(required=False, allow_null=True)
+class CoauthorIdField(serializers.IntegerField):
+    """The coauthor UUID as a number, as the frontend sends it back."""
+
+    def to_representation(self, value):
+        return WideInt(value)
+
+
+class CoauthorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = CoauthorIdField(required=False, allow_null=True)
     full_name = serializers.CharField(required=False, allow_blank=True)
 
     class Meta:
@@ -16,7 +29,7 @@ class CoauthorSerializer(serializers.ModelSerializer):
         fields = ("id", "full_name", "position", "subdivision", "telephone", "email", "is_aiu_employee")
 
 
-class PaperSerializer(serializers.ModelSerializer):
+class PaperSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     coauthors = CoauthorSerializer(many=True, required=False)
     coauthors_json = serializers.CharField(write_only=True, required=False, allow_blank=True)
     application = serializers.PrimaryKeyRelatedField(queryset=Application.objects.all())
@@ -32,6 +45,7 @@ class PaperSerializer(serializers.ModelSerializer):
         if not value:
             return value
 
+        observe_upload(value.size)
         if value.size > MAX_UPLOAD_BYTES:
             raise serializers.ValidationError("Размер файла не должен превышать 5 МБ.")
         
@@ -69,14 +83,17 @@ class PaperSerializer(serializers.ModelSerializer):
 
     def _handle_coauthors(self, paper, coauthors_data):
         paper.coauthors.clear()
+        coauthors = []
         for co_data in coauthors_data:
             full_name = co_data.get("full_name", "").strip()
             if not full_name:
                 continue
             if 'id' in co_data:
                 del co_data['id']
-            coauthor = Coauthor.objects.create(**co_data)
-            paper.coauthors.add(coauthor)
+            coauthors.append(Coauthor(**co_data))
+        if coauthors:
+            # one INSERT and one add(): every add() also runs m2m_changed (response cache)
+            paper.coauthors.add(*Coauthor.objects.bulk_create(coauthors))
 
     def create(self, validated_data):
         coauthors_data = validated_data.pop("coauthors", [])
@@ -113,7 +130,7 @@ class PaperSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class ApplicationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(read_only=True)
     owner_email = serializers.EmailField(source="owner.email", read_only=True)
     owner_full_name = serializers.CharField(source="owner.full_name", read_only=True)
@@ -188,24 +205,70 @@ class ApplicationSerializer(serializers.ModelSerializer):
         raise serializers.ValidationError("У вас нет прав для установки этого статуса.")
 
     def update(self, instance, validated_data):
-        new_status = validated_data.get("status")
+        new_status = validated_data.pop("status", None)
+        user = self.context["request"].user
         
         if not new_status or new_status == instance.status:
             if (
                 instance.status in BLOCKED_STATUSES
-                and not self.context["request"].user.is_staff
+                and not user.is_staff
             ):
                 raise serializers.ValidationError(
                     "Редактирование запрещено для отправленных или одобренных заявок."
                 )
-
-        if new_status == "submitted" and instance.status == "rejected":
-             instance.admin_comment = ""
-             instance.save(update_fields=["admin_comment"])
+        else:
+            # guarded by what validate_status checked
+            submitting = new_status == "submitted" and not user.is_staff
+            condition = SUBMITTABLE & HAS_FILES if submitting else None
+            if user.is_staff and instance.status == "submitted":
+                # a review claimed by another admin (compensations/review.py)
+                condition = review.open_to(user)
+            updated = transition(
+                Application.objects.all(), instance.pk, new_status, {instance.status}, actor=user,
+                comment="" if new_status == "submitted" and instance.status == "rejected" else None,
+                condition=condition,
+            )
+            for field in ("status", "admin_comment", "updated_at"):
+                setattr(instance, field, getattr(updated, field))
+            if not validated_data:
+                return instance
 
         return super().update(instance, validated_data)
 
 
 class ApplicationDetailSerializer(ApplicationSerializer):
     papers = PaperSerializer(many=True, read_only=True)
-    status_display = serializers.CharField(source="get_status_display", read_only=True)
\ No newline at end of file
+    status_display = serializers.CharField(source="get_status_display", read_only=True)
+
+
+class ReviewQueueSerializer(ApplicationSerializer):
+    class Meta(ApplicationSerializer.Meta):
+        fields = ApplicationSerializer.Meta.fields + ["reviewer", "review_lease_until"]
+        read_only_fields = fields
+
+
+class ReviewClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    faculty = serializers.ChoiceField(choices=Application.FACULTY_CHOICES, required=False)
+    report_year = serializers.IntegerField(required=False)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(source="is_complete", read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ("id", "filename", "size", "chunk_size", "offset", "complete", "created_at")
+        read_only_fields = ("chunk_size", "offset", "created_at")
+
+    def validate_filename(self, value):
+        if not value.lower().endswith(".pdf"):
+            raise serializers.ValidationError("Файл должен быть в формате PDF.")
+        return value
+
+    def validate_size(self, value):
+        if value > MAX_UPLOAD_BYTES:
+            raise serializers.ValidationError("Размер файла не должен превышать 5 МБ.")
+        if value < 5:
+            raise serializers.ValidationError("Файл должен быть в формате PDF.")
+        return value
@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.models import Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_owners
+from .models import Application, Coauthor, FileBlob, Paper, Tombstone
+
+
+@receiver(post_save, sender=Paper, dispatch_uid="paper_blob_references_on_save")
+def count_blob_references_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "file_upload" not in update_fields:
+        return
+    new_name = instance.file_upload.name or ""
+    old_name = getattr(instance, "_stored_file_name", "")
+    if new_name == old_name:
+        return
+    if new_name:
+        FileBlob.add_reference(new_name, size=instance.file_upload.size)
+    if old_name:
+        FileBlob.release_reference(old_name)
+    instance._stored_file_name = new_name
+
+
+@receiver(post_delete, sender=Paper, dispatch_uid="paper_blob_references_on_delete")
+def release_blob_reference_on_delete(sender, instance, **kwargs):
+    name = getattr(instance, "_stored_file_name", instance.file_upload.name)
+    if name:
+        FileBlob.release_reference(name)
+
+
+# --- response cache versions (compensations/cache.py) ---
+
+def _paper_owner_ids(papers):
+    """Owners of ``papers`` (instances), querying only for papers whose application is not loaded."""
+    owners, missing = set(), set()
+    for paper in papers:
+        if Paper.application.is_cached(paper):
+            owners.add(paper.application.owner_id)
+        else:
+            missing.add(paper.application_id)
+    if missing:
+        owners.update(Application.objects.filter(pk__in=missing).values_list("owner_id", flat=True))
+    return owners
+
+
+def _coauthor_owner_ids(coauthor_ids):
+    return set(
+        Application.objects.filter(papers__coauthors__in=coauthor_ids)
+        .order_by().values_list("owner_id", flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Application, dispatch_uid="application_response_cache_on_save")
+@receiver(post_delete, sender=Application, dispatch_uid="application_response_cache_on_delete")
+def invalidate_application_responses(sender, instance, **kwargs):
+    bump_owners([instance.owner_id])
+
+
+@receiver(post_save, sender=Paper, dispatch_uid="paper_response_cache_on_save")
+@receiver(post_delete, sender=Paper, dispatch_uid="paper_response_cache_on_delete")
+def invalidate_paper_responses(sender, instance, **kwargs):
+    if settings.RESPONSE_CACHE_TIMEOUT:
+        bump_owners(_paper_owner_ids([instance]))
+
+
+@receiver(post_save, sender=Coauthor, dispatch_uid="coauthor_response_cache_on_save")
+def invalidate_coauthor_responses(sender, instance, created, **kwargs):
+    # a new coauthor is not linked to any paper yet; m2m_changed covers linking
+    if settings.RESPONSE_CACHE_TIMEOUT and not created:
+        bump_owners(_coauthor_owner_ids([instance.pk]))
+
+
+@receiver(pre_delete, sender=Coauthor, dispatch_uid="coauthor_response_cache_on_delete")
+def invalidate_deleted_coauthor_responses(sender, instance, **kwargs):
+    # before the delete: afterwards the links to the papers are gone
+    if settings.RESPONSE_CACHE_TIMEOUT:
+        bump_owners(_coauthor_owner_ids([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Paper.coauthors.through, dispatch_uid="paper_coauthors_response_cache")
+def invalidate_paper_coauthor_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if not settings.RESPONSE_CACHE_TIMEOUT or action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        bump_owners(_paper_owner_ids([instance]))
+    elif action == "pre_clear":
+        bump_owners(_coauthor_owner_ids([instance.pk]))
+    else:
+        bump_owners(Application.objects.filter(papers__in=pk_set).values_list("owner_id", flat=True))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid="user_response_cache_on_save")
+def invalidate_user_responses(sender, instance, **kwargs):
+    # owner name, position etc. are part of the application responses
+    bump_owners([instance.pk])
+
+
+# --- changes feed tombstones (compensations/changes.py) ---
+
+_tombstone_reason = ContextVar("tombstone_reason", default=Tombstone.DELETED)
+
+
+@contextmanager
+def tombstone_reason(reason):
+    """Record the rows deleted inside the block with ``reason`` (Tombstone.ARCHIVED when archiving)."""
+    token = _tombstone_reason.set(reason)
+    try:
+        yield
+    finally:
+        _tombstone_reason.reset(token)
+
+
+@receiver(post_delete, sender=Application, dispatch_uid="application_tombstone")
+def record_deleted_application(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk, owner_id=instance.owner_id,
+        reason=_tombstone_reason.get(),
+    )
+
+
+@receiver(post_delete, sender=Paper, dispatch_uid="paper_tombstone")
+def record_deleted_paper(sender, instance, **kwargs):
+    if Paper.application.is_cached(instance):
+        owner_id = instance.application.owner_id
+    else:
+        # deleted with its application: the application row is still there, in the same transaction
+        owner_id = Subquery(Application.objects.filter(pk=instance.application_id).values("owner_id")[:1])
+    Tombstone.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk, owner_id=owner_id, reason=_tombstone_reason.get(),
+    )
+
+
+@receiver(post_delete, sender=Coauthor, dispatch_uid="coauthor_tombstone")
+def record_deleted_coauthor(sender, instance, **kwargs):
+    # coauthors are visible to every user
+    Tombstone.objects.create(model=sender._meta.model_name, object_id=instance.pk, reason=_tombstone_reason.get())
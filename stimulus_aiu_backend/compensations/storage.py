@@ -0,0 +1,78 @@
+"""
+Content-addressed storage for paper files.
+
+Every file is stored once under the SHA-256 of its content
+(``blobs/ab/abcdef….pdf``); saving bytes that are already stored returns
+the existing name without writing, also when a concurrent upload of the
+same bytes wrote it first. Papers that share a file share the
+name, and ``FileBlob.ref_count`` tracks how many papers point at it
+(see compensations/signals.py). Reusing a stored file goes through
+``FileBlob.keep``, so that sweep_media cannot delete it in between; a file
+deleted just before is written again.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+from core.storage import PresignedS3Storage
+
+BLOB_PREFIX = "blobs"
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, extension):
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest}{extension}"
+
+
+def blob_digest(name):
+    """SHA-256 of a content-addressed name, or None for other (legacy) names."""
+    if not name or not name.startswith(f"{BLOB_PREFIX}/"):
+        return None
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+class ContentAddressedMixin:
+    def save(self, name, content, max_length=None):
+        from .models import FileBlob  # compensations.models imports this module
+
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        # HashingUploadHandlerMixin hashes uploads while they stream in
+        digest = getattr(content, "sha256", None) or file_sha256(content)
+        name = blob_name(digest, os.path.splitext(name)[1].lower())
+        # after keep() a running sweep_media has either given up the blob or deleted it
+        FileBlob.keep(name)
+        try:
+            return super().save(name, content, max_length=max_length)
+        except FileExistsError:
+            # stored already, or by a concurrent upload of the same bytes
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # never suffixed: blob_digest() reads the digest back from the name
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
+
+
+class S3ContentAddressedStorage(ContentAddressedMixin, PresignedS3Storage):
+    pass
+
+
+def paper_storage():
+    return storages["papers"]
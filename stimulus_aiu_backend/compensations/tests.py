@@ -1,3 +1,1358 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import boto3
+from asgiref.sync import async_to_sync, sync_to_async
+from boto3.s3.transfer import TransferConfig
+from openpyxl import load_workbook
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.admin import estimated_count
+from core.models import User, uuid7
+from core.storage import PresignedS3Storage
+from core.testing import SHARED_CACHE_SETTINGS, QueryBudgetMixin
+
+from .models import Application, ArchivedApplication, Paper, Coauthor, FileBlob, UploadSession
+from . import events, review
+from .storage import ContentAddressedStorage, S3ContentAddressedStorage, blob_name
+from .transitions import TransitionConflict, transition
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed for the S3 storage tests
+    mock_aws = None
+
+PDF_BYTES = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+
+
+class TempMediaRootMixin:
+    """A MEDIA_ROOT of its own for each test class, removed after the class."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp(prefix="stimulus_test_media_")
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+
+def make_user(email, is_staff=False, **extra):
+    if is_staff:
+        return User.objects.create_superuser(email=email, password="password123", **extra)
+    return User.objects.create_user(email=email, password="password123", **extra)
+
+
+def seed_papers(application, count=2, coauthors=2):
+    papers = []
+    for p in range(count):
+        scopus = p % 2 == 0
+        paper = Paper.objects.create(
+            application=application,
+            title=f"Paper {p}",
+            journal_or_source="Journal of Tests",
+            indexation=Paper.INDEXATION_SCOPUS if scopus else Paper.INDEXATION_WOS,
+            percentile=80 if scopus else None,
+            quartile=None if scopus else Paper.QUARTILE_Q1,
+            doi=f"10.1000/{p}",
+            publication_date=date(2024, 1, 1),
+            year=2024,
+            has_university_affiliation=True,
+            registered_in_platonus=True,
+        )
+        paper.coauthors.set([
+            Coauthor.objects.create(
+                full_name=f"Coauthor {p}-{c}",
+                email=f"co{p}{c}@example.com",
+                is_aiu_employee=c == 0,
+            )
+            for c in range(coauthors)
+        ])
+        papers.append(paper)
+    return papers
+
+
+def seed_applications(owner, count=3, papers=2, coauthors=2, status="submitted", year=None):
+    applications = []
+    for _ in range(count):
+        app = Application.objects.create(
+            owner=owner,
+            status=status,
+            faculty=Application.FAC_IT_ENGINEERING,
+            report_year=year or date.today().year,
+        )
+        seed_papers(app, count=papers, coauthors=coauthors)
+        applications.append(app)
+    return applications
+
+
+@override_settings(**SHARED_CACHE_SETTINGS)
+class EndpointBudgetTests(TempMediaRootMixin, QueryBudgetMixin, TestCase):
+    """
+    Query-count and latency budgets for every router endpoint and custom action.
+    Budgets are maxima: lower them when an endpoint gets cheaper.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com", full_name="Иванов Иван")
+        cls.other = make_user("other@example.com", full_name="Петров Пётр")
+        cls.admin = make_user("admin@example.com", is_staff=True, full_name="Админ")
+
+        cls.apps = seed_applications(cls.researcher, count=3)
+        seed_applications(cls.other, count=3)
+        cls.draft = seed_applications(cls.researcher, count=1, status="draft")[0]
+        cls.paper = cls.apps[0].papers.first()
+        cls.coauthor = cls.paper.coauthors.first()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def call(self, user, method, url, data=None, expected=200, max_queries=10, max_seconds=0.5, **kwargs):
+        client = self.client_for(user)
+        with self.assertBudget(max_queries, max_seconds, label=f"{user.email} {method.upper()} {url}"):
+            response = getattr(client, method)(url, data, **kwargs)
+        self.assertEqual(response.status_code, expected, getattr(response, "data", response.content))
+        return response
+
+    # --- applications ---
+
+    def test_application_reads(self):
+        app = self.apps[0]
+        for user in (self.researcher, self.admin):
+            with self.subTest(user=user.email):
+                self.call(user, "get", "/api/applications/", max_queries=4)
+                self.call(user, "get", "/api/applications/?search=Иванов&ordering=-report_year", max_queries=4)
+                self.call(user, "get", f"/api/applications/{app.id}/", max_queries=4)
+
+    def test_application_writes(self):
+        response = self.call(
+            self.researcher, "post", "/api/applications/",
+            {"faculty": Application.FAC_LAW, "report_year": 2025}, format="json",
+            expected=201, max_queries=3,
+        )
+        app_id = response.data["id"]
+        self.call(
+            self.researcher, "patch", f"/api/applications/{app_id}/",
+            {"faculty": Application.FAC_ECONOMICS}, format="json", max_queries=5,
+        )
+        self.call(
+            self.researcher, "put", f"/api/applications/{self.draft.id}/",
+            {"faculty": Application.FAC_ECONOMICS, "report_year": 2025}, format="json", max_queries=8,
+        )
+        self.call(self.researcher, "delete", f"/api/applications/{app_id}/", expected=204, max_queries=6)
+
+    def test_submit(self):
+        self.call(self.researcher, "post", f"/api/applications/{self.draft.id}/submit/", max_queries=2)
+
+    def test_approve(self):
+        self.call(
+            self.admin, "post", f"/api/applications/{self.apps[0].id}/approve/",
+            {"comment": "ok"}, format="json", max_queries=2,
+        )
+
+    def test_reject(self):
+        self.call(
+            self.admin, "post", f"/api/applications/{self.apps[0].id}/reject/",
+            {"comment": "нет DOI"}, format="json", max_queries=2,
+        )
+
+    def test_docx(self):
+        for user in (self.researcher, self.admin):
+            with self.subTest(user=user.email):
+                self.call(user, "get", f"/api/applications/{self.apps[0].id}/docx/", max_queries=4, max_seconds=3)
+
+    def test_export_xlsx(self):
+        self.call(self.admin, "get", "/api/applications/export_xlsx/", max_queries=4, max_seconds=3)
+        self.call(self.researcher, "get", "/api/applications/export_xlsx/", expected=403, max_queries=1)
+
+    # --- papers ---
+
+    def test_paper_reads(self):
+        for user in (self.researcher, self.admin):
+            with self.subTest(user=user.email):
+                self.call(user, "get", "/api/papers/", max_queries=3)
+                self.call(user, "get", f"/api/papers/?application={self.apps[0].id}&indexation=scopus", max_queries=3)
+                self.call(user, "get", f"/api/papers/{self.paper.id}/", max_queries=3)
+
+    def test_paper_writes(self):
+        data = {
+            "application": str(self.draft.id),
+            "title": "New paper",
+            "indexation": "scopus",
+            "percentile": 75,
+            "has_university_affiliation": True,
+            "registered_in_platonus": True,
+            "coauthors_json": '[{"full_name": "Сидоров", "email": "s@example.com"}]',
+            "file_upload": SimpleUploadedFile("paper.pdf", PDF_BYTES, content_type="application/pdf"),
+        }
+        response = self.call(
+            self.researcher, "post", "/api/papers/", data, format="multipart", expected=201, max_queries=10,
+        )
+        paper_id = response.data["id"]
+        self.call(
+            self.researcher, "patch", f"/api/papers/{paper_id}/",
+            {"title": "Renamed", "coauthors_json": "[]"}, format="multipart", max_queries=10,
+        )
+        self.call(
+            self.researcher, "put", f"/api/papers/{paper_id}/",
+            {"application": str(self.draft.id), "title": "Again", "indexation": "wos", "quartile": "Q2"},
+            format="multipart", max_queries=8,
+        )
+        self.call(self.researcher, "delete", f"/api/papers/{paper_id}/", expected=204, max_queries=6)
+
+    # --- coauthors ---
+
+    def test_coauthor_endpoints(self):
+        for user in (self.researcher, self.admin):
+            with self.subTest(user=user.email):
+                self.call(user, "get", "/api/coauthors/", max_queries=2)
+                self.call(user, "get", "/api/coauthors/?search=Coauthor&ordering=email", max_queries=2)
+                self.call(user, "get", f"/api/coauthors/{self.coauthor.id}/", max_queries=2)
+
+        self.call(
+            self.researcher, "post", "/api/coauthors/", {"full_name": "Новый"}, format="json",
+            expected=201, max_queries=2,
+        )
+        coauthor = Coauthor.objects.get(full_name="Новый")
+        self.call(
+            self.researcher, "patch", f"/api/coauthors/{coauthor.id}/", {"position": "Доцент"},
+            format="json", max_queries=4,
+        )
+        self.call(self.researcher, "delete", f"/api/coauthors/{coauthor.id}/", expected=403, max_queries=1)
+        self.call(self.admin, "delete", f"/api/coauthors/{coauthor.id}/", expected=204, max_queries=5)
+
+    # --- N+1 guards ---
+
+    def test_lists_do_not_scale_queries_with_rows(self):
+        for user in (self.researcher, self.admin):
+            client = self.client_for(user)
+            for url in ("/api/applications/", "/api/papers/", "/api/coauthors/"):
+                with self.subTest(user=user.email, url=url):
+                    self.assertConstantQueries(
+                        lambda: client.get(url),
+                        lambda: seed_applications(self.researcher, count=2, papers=3, coauthors=3),
+                        label=f"{user.email} GET {url}",
+                    )
+
+    def test_exports_do_not_scale_queries_with_rows(self):
+        client = self.client_for(self.admin)
+        self.assertConstantQueries(
+            lambda: client.get("/api/applications/export_xlsx/"),
+            lambda: seed_applications(self.other, count=2, papers=3, coauthors=3),
+            label="GET export_xlsx",
+        )
+        app = self.apps[1]
+        self.assertConstantQueries(
+            lambda: client.get(f"/api/applications/{app.id}/docx/"),
+            lambda: seed_papers(app, count=2, coauthors=3),
+            label="GET docx",
+        )
+
+
+@override_settings(**SHARED_CACHE_SETTINGS)
+class ResponseCacheTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com", full_name="Иванов Иван")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.app = seed_applications(cls.researcher, count=1)[0]
+        cls.paper = cls.app.papers.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_repeated_list_is_served_from_cache(self):
+        client = self.client_for(self.researcher)
+        first = client.get("/api/applications/")
+        self.assertEqual(first["X-Cache"], "miss")
+
+        with self.assertBudget(1, 0.5, label="cached GET /api/applications/"):
+            second = client.get("/api/applications/")
+        self.assertEqual(second["X-Cache"], "hit")
+        self.assertEqual(second.content, first.content)
+        # other query parameters are a separate entry
+        self.assertEqual(client.get("/api/applications/?ordering=created_at")["X-Cache"], "miss")
+
+    def test_writes_invalidate_owner_and_admin_responses(self):
+        researcher, admin = self.client_for(self.researcher), self.client_for(self.admin)
+        for client in (researcher, admin):
+            client.get("/api/applications/")
+            client.get(f"/api/papers/{self.paper.id}/")
+
+        Paper.objects.get(pk=self.paper.pk).save(update_fields=["title"])
+        for client in (researcher, admin):
+            self.assertEqual(client.get("/api/applications/")["X-Cache"], "miss")
+            self.assertEqual(client.get(f"/api/papers/{self.paper.id}/")["X-Cache"], "miss")
+
+    def test_coauthor_changes_invalidate(self):
+        client = self.client_for(self.researcher)
+        coauthor = self.paper.coauthors.first()
+
+        client.get("/api/applications/")
+        coauthor.full_name = "Переименован"
+        coauthor.save()
+        response = client.get("/api/applications/")
+        self.assertEqual(response["X-Cache"], "miss")
+        self.assertContains(response, "Переименован")
+
+        self.paper.coauthors.remove(coauthor)
+        self.assertNotContains(client.get("/api/applications/"), "Переименован")
+
+    def test_other_owners_keep_their_cache(self):
+        other = make_user("other@example.com")
+        seed_applications(other, count=1)
+        client = self.client_for(other)
+        client.get("/api/applications/")
+
+        self.app.save()
+        self.assertEqual(client.get("/api/applications/")["X-Cache"], "hit")
+
+    def test_replica_reads_right_after_a_write_are_not_cached(self):
+        client = self.client_for(self.researcher)
+        self.app.save()
+        with mock.patch("compensations.cache.reading_from_replica", return_value=True):
+            with override_settings(DB_PRIMARY_PIN_SECONDS=60):
+                client.get("/api/applications/")
+                self.assertEqual(client.get("/api/applications/")["X-Cache"], "miss")
+            with override_settings(DB_PRIMARY_PIN_SECONDS=0):
+                client.get("/api/applications/")
+                self.assertEqual(client.get("/api/applications/")["X-Cache"], "hit")
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        client = self.client_for(self.researcher)
+        client.get("/api/applications/")
+        self.assertNotIn("X-Cache", client.get("/api/applications/"))
+
+
+class StatusTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.app = seed_applications(cls.researcher, count=1, status="rejected")[0]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_transitions_are_recorded(self):
+        Application.objects.filter(pk=self.app.pk).update(admin_comment="нет DOI")
+        researcher, admin = self.client_for(self.researcher), self.client_for(self.admin)
+        self.assertEqual(researcher.post(f"/api/applications/{self.app.id}/submit/").status_code, 200)
+        self.assertEqual(
+            admin.post(f"/api/applications/{self.app.id}/approve/", {"comment": "ok"}, format="json").status_code, 200,
+        )
+
+        history = list(self.app.transitions.values_list("from_status", "to_status", "actor_id", "comment"))
+        self.assertEqual(history, [
+            ("rejected", "submitted", self.researcher.id, ""),
+            ("submitted", "approved", self.admin.id, "ok"),
+        ])
+        self.app.refresh_from_db()
+        self.assertEqual((self.app.status, self.app.admin_comment), ("approved", "ok"))
+        self.assertGreater(self.app.updated_at, self.app.created_at)
+
+    def test_second_review_of_the_same_application_fails(self):
+        Application.objects.filter(pk=self.app.pk).update(status="submitted")
+        admin = self.client_for(self.admin)
+        self.assertEqual(admin.post(f"/api/applications/{self.app.id}/approve/").status_code, 200)
+        response = admin.post(f"/api/applications/{self.app.id}/reject/", {"comment": "поздно"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.app.transitions.count(), 1)
+
+    def test_submit_reports_what_is_missing(self):
+        Paper.objects.filter(application=self.app).update(registered_in_platonus=False)
+        response = self.client_for(self.researcher).post(f"/api/applications/{self.app.id}/submit/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Platonus", response.data["detail"])
+        self.assertFalse(self.app.transitions.exists())
+
+    def test_submit_with_invalid_id_is_not_found(self):
+        self.assertEqual(self.client_for(self.researcher).post("/api/applications/bad/submit/").status_code, 404)
+
+    def test_approve_with_invalid_id_is_not_found(self):
+        self.assertEqual(self.client_for(self.admin).post("/api/applications/bad/approve/").status_code, 404)
+
+    def test_reject_with_invalid_id_is_not_found(self):
+        response = self.client_for(self.admin).post("/api/applications/bad/reject/", {"comment": "нет"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_status_change_through_update(self):
+        response = self.client_for(self.admin).patch(
+            f"/api/applications/{self.app.id}/", {"status": "approved", "report_year": 2024}, format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data["status"], response.data["report_year"]), ("approved", 2024))
+        self.assertEqual(self.app.transitions.get().from_status, "rejected")
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+    def test_only_one_of_concurrent_reviews_applies(self):
+        admin = make_user("admin@example.com", is_staff=True)
+        app = seed_applications(make_user("researcher@example.com"), count=1, papers=0)[0]
+        barrier = threading.Barrier(4)
+        results = []
+
+        def review(to_status):
+            barrier.wait()
+            try:
+                transition(Application.objects.all(), app.pk, to_status, {"submitted"}, actor=admin, comment="")
+                results.append(to_status)
+            except TransitionConflict:
+                results.append("conflict")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=review, args=(s,)) for s in ("approved", "rejected") * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count("conflict"), 3)
+        app.refresh_from_db()
+        self.assertEqual([app.status], [s for s in results if s != "conflict"])
+        self.assertEqual(app.transitions.count(), 1)
+
+
+class ReviewQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = make_user("first@example.com", is_staff=True)
+        cls.second = make_user("second@example.com", is_staff=True)
+        researcher = make_user("researcher@example.com")
+        cls.apps = seed_applications(researcher, count=3, papers=1, coauthors=0)
+        cls.law = seed_applications(researcher, count=1, papers=0)[0]
+        Application.objects.filter(pk=cls.law.pk).update(faculty=Application.FAC_LAW)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def claim(self, user, **data):
+        response = self.client_for(user).post("/api/applications/review_queue/", data, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item["id"] for item in response.data]
+
+    def test_reviewers_get_different_applications(self):
+        first = self.claim(self.first, count=2, faculty=Application.FAC_IT_ENGINEERING)
+        second = self.claim(self.second, count=2, faculty=Application.FAC_IT_ENGINEERING)
+        self.assertEqual(first, [str(app.id) for app in self.apps[:2]])
+        self.assertEqual(second, [str(self.apps[2].id)])
+        self.assertEqual(self.claim(self.second, count=5), [str(self.law.id)])
+
+        response = self.client_for(self.first).get("/api/applications/review_queue/")
+        self.assertEqual([item["id"] for item in response.data], first)
+        self.assertEqual(response.data[0]["reviewer"], self.first.id)
+
+    def test_release_and_expiry_return_applications_to_the_queue(self):
+        first = self.claim(self.first, count=1)
+        self.assertEqual(self.client_for(self.second).post(f"/api/applications/{first[0]}/release/").status_code, 400)
+        self.assertEqual(self.client_for(self.first).post(f"/api/applications/{first[0]}/release/").status_code, 200)
+        self.assertEqual(self.claim(self.second, count=1), first)
+
+        Application.objects.filter(pk=first[0]).update(review_lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.claim(self.first, count=1), first)
+
+        Application.objects.filter(pk=first[0]).update(review_lease_until=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command("release_review_leases", stdout=out)
+        self.assertIn("Released 1", out.getvalue())
+        self.assertIsNone(Application.objects.get(pk=first[0]).reviewer_id)
+
+    def test_review_decision_ends_the_claim(self):
+        app_id = self.claim(self.first, count=1)[0]
+        self.client_for(self.first).post(f"/api/applications/{app_id}/approve/")
+        app = Application.objects.get(pk=app_id)
+        self.assertEqual((app.status, app.reviewer_id, app.review_lease_until), ("approved", None, None))
+
+    def test_claimed_application_is_decided_only_by_its_reviewer(self):
+        app_id = self.claim(self.first, count=1)[0]
+        second = self.client_for(self.second)
+        self.assertEqual(second.post(f"/api/applications/{app_id}/approve/").status_code, 409)
+        response = second.patch(f"/api/applications/{app_id}/", {"status": "approved"}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Application.objects.get(pk=app_id).status, "submitted")
+
+        Application.objects.filter(pk=app_id).update(review_lease_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(second.post(f"/api/applications/{app_id}/reject/", {"comment": "нет"}, format="json").status_code, 200)
+
+    def test_release_with_invalid_id_is_not_found(self):
+        self.assertEqual(self.client_for(self.first).post("/api/applications/bad/release/").status_code, 404)
+
+    def test_researchers_cannot_claim(self):
+        response = self.client_for(self.apps[0].owner).post("/api/applications/review_queue/")
+        self.assertEqual(response.status_code, 403)
+
+
+class ConcurrentReviewClaimTests(TransactionTestCase):
+    def test_locked_applications_are_skipped_without_waiting(self):
+        admin = make_user("admin@example.com", is_staff=True)
+        apps = seed_applications(make_user("researcher@example.com"), count=2, papers=0)
+        locked, release_lock = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with transaction.atomic():
+                Application.objects.select_for_update().get(pk=apps[0].pk)
+                locked.set()
+                release_lock.wait(5)
+            connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(5)
+        try:
+            started = time.monotonic()
+            claimed = review.claim(admin, 2)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            release_lock.set()
+            thread.join()
+        self.assertEqual(claimed, [apps[1].pk])
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0, **SHARED_CACHE_SETTINGS)
+class ChangesFeedTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.other = make_user("other@example.com")
+        cls.apps = seed_applications(cls.researcher, count=2)
+        cls.other_app = seed_applications(cls.other, count=1)[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.researcher)}")
+
+    def changes(self, resource, **params):
+        response = self.client.get(f"/api/{resource}/changes/", params)
+        self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+        return response.data
+
+    def test_feed_returns_only_what_changed_since_the_token(self):
+        with self.assertBudget(4, 0.5, label="GET /api/applications/changes/"):
+            first = self.changes("applications")
+        self.assertEqual({item["id"] for item in first["results"]}, {str(app.id) for app in self.apps})
+        self.assertEqual(self.changes("applications", since=first["next"])["results"], [])
+
+        self.apps[1].report_year = 2023
+        self.apps[1].save()
+        self.other_app.save()
+        paper = self.apps[0].papers.first()
+        paper_token, paper_id = self.changes("papers")["next"], paper.pk
+        paper.delete()
+
+        changed = self.changes("applications", since=first["next"])
+        self.assertEqual([item["id"] for item in changed["results"]], [str(self.apps[1].id)])
+        self.assertEqual(changed["results"][0]["report_year"], 2023)
+        deleted = self.changes("papers", since=paper_token)
+        self.assertEqual(deleted["results"], [])
+        self.assertEqual([item["id"] for item in deleted["deleted"]], [paper_id])
+        self.assertEqual(deleted["deleted"][0]["reason"], "deleted")
+
+    def test_deletions_of_other_owners_are_hidden(self):
+        token, app_id = self.changes("applications")["next"], self.apps[0].pk
+        self.other_app.delete()
+        self.apps[0].delete()
+        deleted = self.changes("applications", since=token)["deleted"]
+        self.assertEqual([item["id"] for item in deleted], [app_id])
+        # the papers went with the application
+        self.assertEqual(len(self.changes("papers", since=token)["deleted"]), 2)
+
+    def test_forged_tokens_are_rejected(self):
+        stamp = timezone.now().isoformat()
+        for cursors in (
+            [[stamp, "x"], [stamp, None]],
+            [[stamp, None], [stamp, "x"]],
+            [[stamp, 5], [stamp, None]],
+            [["yesterday", None], [stamp, None]],
+            [[stamp, str(uuid7())], ["2024-13-45T00:00:00", "1"]],
+        ):
+            with self.subTest(cursors=cursors):
+                token = base64.urlsafe_b64encode(json.dumps(cursors).encode()).decode()
+                response = self.client.get("/api/applications/changes/", {"since": token})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("since", response.json())
+        token = base64.urlsafe_b64encode(json.dumps([[stamp, str(uuid7())], [stamp, "12"]]).encode()).decode()
+        self.assertEqual(self.client.get("/api/applications/changes/", {"since": token}).status_code, 200)
+
+    def test_paging_and_updated_since(self):
+        page = self.changes("coauthors", limit=3)
+        seen = [item["id"] for item in page["results"]]
+        while page["has_more"]:
+            page = self.changes("coauthors", since=page["next"], limit=3)
+            seen += [item["id"] for item in page["results"]]
+        self.assertEqual(len(seen), Coauthor.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+
+        later = timezone.now()
+        Application.objects.filter(pk=self.apps[0].pk).update(updated_at=later)
+        results = self.changes("applications", updated_since=later.isoformat())["results"]
+        self.assertEqual([item["id"] for item in results], [str(self.apps[0].id)])
+
+    def test_invalid_token(self):
+        self.assertEqual(self.client.get("/api/papers/changes/", {"since": "garbage"}).status_code, 400)
+
+
+def read_events(token, scenario, last_event_id=None, count=1, ticket=None):
+    """Opens /api/events/, runs ``scenario`` (sync) and returns the next ``count`` chunks after ``retry``."""
+    async def run():
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = str(last_event_id)
+        response = await AsyncClient().get("/api/events/", {"ticket": ticket} if ticket else {}, headers=headers)
+        chunks = aiter(response.streaming_content)
+        try:
+            retry = await anext(chunks)
+            await sync_to_async(scenario)()
+            return [retry] + [await asyncio.wait_for(anext(chunks), 5) for _ in range(count)]
+        finally:
+            await chunks.aclose()
+
+    return [chunk.decode() for chunk in async_to_sync(run)()]
+
+
+def event_data(chunk):
+    return json.loads(chunk.split("data: ", 1)[1])
+
+
+@override_settings(ASGI_MODE=True, EVENTS_BACKEND="local")
+class ApplicationEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.other = make_user("other@example.com")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.app = seed_applications(cls.researcher, count=1, papers=0)[0]
+        cls.other_app = seed_applications(cls.other, count=1, papers=0)[0]
+
+    def review(self, app, to_status, comment=""):
+        with self.captureOnCommitCallbacks(execute=True):
+            return transition(Application.objects.all(), app.pk, to_status, {"submitted"}, self.admin, comment)
+
+    def test_owner_gets_own_status_changes(self):
+        def scenario():
+            self.review(self.other_app, "approved")
+            self.review(self.app, "rejected", "нет DOI")
+
+        retry, chunk = read_events(AccessToken.for_user(self.researcher), scenario)
+        self.assertEqual(retry, "retry: 5000\n\n")
+        self.assertIn("event: application\n", chunk)
+        event = event_data(chunk)
+        self.assertEqual(
+            (event["application"], event["status"], event["from_status"], event["comment"]),
+            (str(self.app.id), "rejected", "submitted", "нет DOI"),
+        )
+        self.assertTrue(chunk.startswith(f"id: {self.app.transitions.get().id}\n"))
+
+    def test_admins_get_new_submissions(self):
+        Application.objects.filter(pk=self.app.pk).update(status="rejected")
+
+        def scenario():
+            self.review(self.other_app, "approved")
+            with self.captureOnCommitCallbacks(execute=True):
+                transition(Application.objects.all(), self.app.pk, "submitted", {"rejected"}, self.researcher)
+
+        _, chunk = read_events(AccessToken.for_user(self.admin), scenario)
+        self.assertEqual((event_data(chunk)["application"], event_data(chunk)["status"]), (str(self.app.id), "submitted"))
+
+    def test_reconnect_replays_missed_events(self):
+        first = self.review(self.app, "rejected")
+        seen = self.app.transitions.get().id
+        Application.objects.filter(pk=first.pk).update(status="submitted")
+        self.review(self.app, "approved", "ok")
+        self.review(self.other_app, "approved")
+
+        _, chunk = read_events(AccessToken.for_user(self.researcher), lambda: None, last_event_id=seen)
+        self.assertEqual((event_data(chunk)["status"], event_data(chunk)["comment"]), ("approved", "ok"))
+
+    @override_settings(EVENTS_REPLAY_LIMIT=3)
+    def test_resync_replays_after_the_latest_sent_ids(self):
+        def scenario():
+            for _ in range(4):
+                Application.objects.filter(pk=self.app.pk).update(status="submitted")
+                self.review(self.app, "rejected")
+            # committed while the listener was disconnected: never published
+            Application.objects.filter(pk=self.app.pk).update(status="submitted")
+            transition(Application.objects.all(), self.app.pk, "approved", {"submitted"}, self.admin, "ok")
+            events.bus.publish(events.RESYNC)
+
+        with mock.patch.object(events, "RECENT_IDS", 2):
+            chunks = read_events(AccessToken.for_user(self.researcher), scenario, count=5)
+        self.assertEqual([event_data(chunk)["status"] for chunk in chunks[1:]], ["rejected"] * 4 + ["approved"])
+
+    def test_resync_without_last_event_id_skips_history(self):
+        self.review(self.app, "rejected")
+        Application.objects.filter(pk=self.app.pk).update(status="submitted")
+
+        def scenario():
+            # committed while the listener was disconnected: never published
+            transition(Application.objects.all(), self.app.pk, "approved", {"submitted"}, self.admin, "ok")
+            events.bus.publish(events.RESYNC)
+
+        _, chunk = read_events(AccessToken.for_user(self.researcher), scenario)
+        self.assertEqual((event_data(chunk)["status"], event_data(chunk)["comment"]), ("approved", "ok"))
+
+    def test_ticket_opens_one_stream(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.researcher)}")
+        ticket = client.post("/api/events/ticket/").data["ticket"]
+
+        retry, chunk = read_events(None, lambda: self.review(self.app, "approved"), ticket=ticket)
+        self.assertEqual(event_data(chunk)["application"], str(self.app.id))
+        response = async_to_sync(AsyncClient().get)("/api/events/", {"ticket": ticket})
+        self.assertEqual(response.status_code, 401)
+
+    def test_requires_credentials_and_asgi(self):
+        response = async_to_sync(AsyncClient().get)("/api/events/")
+        self.assertEqual(response.status_code, 401)
+        # access tokens are not accepted in the query string
+        response = async_to_sync(AsyncClient().get)(
+            "/api/events/", {"token": str(AccessToken.for_user(self.researcher))},
+        )
+        self.assertEqual(response.status_code, 401)
+        with override_settings(ASGI_MODE=False):
+            response = async_to_sync(AsyncClient().get)(
+                "/api/events/", headers={"Authorization": f"Bearer {AccessToken.for_user(self.researcher)}"},
+            )
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(ASGI_MODE=True, EVENTS_BACKEND="postgres")
+class PostgresEventsTests(TransactionTestCase):
+    def test_notify_reaches_the_stream(self):
+        researcher = make_user("researcher@example.com")
+        app = seed_applications(researcher, count=1, papers=0)[0]
+        self.addCleanup(events.bus.stop)
+
+        def scenario():
+            self.assertTrue(events.bus.listening.wait(5))
+            transition(Application.objects.all(), app.pk, "approved", {"submitted"}, comment="ok")
+
+        _, chunk = read_events(AccessToken.for_user(researcher), scenario)
+        self.assertEqual((event_data(chunk)["application"], event_data(chunk)["status"]), (str(app.id), "approved"))
+
+
+class ReportYearArchiveTests(TempMediaRootMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.closed = seed_applications(cls.researcher, count=2, status="approved", year=2023)
+        cls.current = seed_applications(cls.researcher, count=1)[0]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def export(self, **params):
+        response = self.client_for(self.admin).get("/api/applications/export_xlsx/", params)
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(BytesIO(response.content)).active
+        return [[(cell.value, cell.font.color and cell.font.color.rgb) for cell in row] for row in sheet.iter_rows()]
+
+    def test_archived_year_reads_as_before(self):
+        paper = self.closed[0].papers.first()
+        paper.file_upload.save("proof.pdf", SimpleUploadedFile("proof.pdf", PDF_BYTES))
+        researcher = self.client_for(self.researcher)
+        url = f"/api/applications/{self.closed[0].id}/"
+        detail = researcher.get(url).json()
+        export = self.export(report_year=2023)
+        self.assertEqual(len(export), 1 + 4)
+
+        call_command("archive_report_year", "2023", stdout=StringIO())
+
+        self.assertEqual(ArchivedApplication.objects.count(), 2)
+        self.assertFalse(Application.objects.filter(report_year=2023).exists())
+        self.assertEqual(Paper.objects.count(), 2)
+        self.assertEqual(Coauthor.objects.count(), 4)
+        cache.clear()
+        with self.assertBudget(3, 0.5, label=f"GET {url} (archived)"):
+            self.assertEqual(researcher.get(url).json(), detail)
+        self.assertEqual(self.export(report_year=2023), export)
+        listed = researcher.get("/api/applications/archive/", {"report_year": 2023}).json()
+        self.assertEqual((listed["count"], len(listed["results"])), (2, 2))
+        self.assertEqual(researcher.get("/api/applications/").json()[0]["id"], str(self.current.id))
+
+        response = researcher.get(f"/api/papers/{paper.id}/file/")
+        self.assertEqual(b"".join(response.streaming_content), PDF_BYTES)
+        self.assertEqual(FileBlob.objects.get(name=paper.file_upload.name).ref_count, 1)
+        other = self.client_for(make_user("other@example.com"))
+        self.assertEqual(other.get(url).status_code, 404)
+        self.assertEqual(other.get(f"/api/papers/{paper.id}/file/").status_code, 404)
+
+    def test_archive_list_is_paginated(self):
+        call_command("archive_report_year", "2023", stdout=StringIO())
+        researcher = self.client_for(self.researcher)
+        with self.assertBudget(3, 0.5, label="GET /api/applications/archive/?limit=1"):
+            first = researcher.get("/api/applications/archive/", {"limit": 1}).json()
+        second = researcher.get(first["next"]).json()
+        self.assertEqual(first["count"], 2)
+        self.assertIsNone(second["next"])
+        self.assertEqual(
+            {first["results"][0]["id"], second["results"][0]["id"]}, {str(app.id) for app in self.closed},
+        )
+
+    @override_settings(CHANGES_SETTLE_SECONDS=0)
+    def test_changes_feed_reports_archived_records(self):
+        client = self.client_for(self.researcher)
+        token = client.get("/api/applications/changes/").json()["next"]
+        paper_token = client.get("/api/papers/changes/").json()["next"]
+        call_command("archive_report_year", "2023", stdout=StringIO())
+        current_id, current_papers = str(self.current.pk), self.current.papers.count()
+        self.current.delete()
+
+        deleted = client.get("/api/applications/changes/", {"since": token}).json()["deleted"]
+        self.assertEqual(
+            {(item["id"], item["reason"]) for item in deleted},
+            {(str(app.id), "archived") for app in self.closed} | {(current_id, "deleted")},
+        )
+        papers = client.get("/api/papers/changes/", {"since": paper_token}).json()["deleted"]
+        self.assertEqual(
+            sorted(item["reason"] for item in papers),
+            ["archived"] * (len(papers) - current_papers) + ["deleted"] * current_papers,
+        )
+        self.assertGreater(len(papers), current_papers)
+
+    def test_year_with_pending_reviews_is_not_archived(self):
+        Application.objects.filter(pk=self.closed[0].pk).update(status="submitted")
+        with self.assertRaises(CommandError):
+            call_command("archive_report_year", "2023", stdout=StringIO())
+        self.assertFalse(ArchivedApplication.objects.exists())
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class ValuesReadPathTests(TempMediaRootMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com", full_name="Исследователь Тестов")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.apps = seed_applications(cls.researcher, count=2)
+        Application.objects.filter(pk=cls.apps[1].pk).update(status="rejected", admin_comment="Нет DOI «журнала»")
+        seed_applications(make_user("other@example.com"), count=1, papers=0, status="draft")
+        cls.paper = cls.apps[0].papers.first()
+        cls.paper.file_upload.save("proof.pdf", SimpleUploadedFile("proof.pdf", PDF_BYTES))
+        Paper.objects.filter(pk=cls.paper.pk).update(publication_date=None, volume=12, number="3", pages="1-10")
+        # namesakes are ordered by id in both paths
+        cls.paper.coauthors.add(Coauthor.objects.create(full_name=cls.paper.coauthors.first().full_name))
+
+    def get(self, user, url, values_path):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        with override_settings(VALUES_READ_PATH=values_path):
+            return client.get(url)
+
+    def test_same_json_as_the_serializers(self):
+        urls = [
+            "/api/applications/",
+            "/api/applications/?status=rejected&ordering=created_at",
+            f"/api/applications/{self.apps[0].id}/",
+            "/api/papers/",
+            f"/api/papers/?application={self.apps[0].id}&indexation=scopus",
+            f"/api/papers/{self.paper.id}/",
+            "/api/coauthors/?ordering=-email",
+            f"/api/coauthors/{self.paper.coauthors.first().id}/",
+            f"/api/applications/{uuid7()}/",
+            "/api/papers/not-a-uuid/",
+        ]
+        for user in (self.researcher, self.admin):
+            for url in urls:
+                with self.subTest(user=user.email, url=url):
+                    expected = self.get(user, url, values_path=False)
+                    response = self.get(user, url, values_path=True)
+                    self.assertEqual(response.status_code, expected.status_code)
+                    self.assertEqual(response.content, expected.content)
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.assertConstantQueries(
+            lambda: self.get(self.admin, "/api/applications/", values_path=True),
+            lambda: seed_applications(self.researcher, count=3),
+            label="GET /api/applications/ (values path)",
+        )
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0, JSON_STREAM_CHUNK_ITEMS=2)
+class StreamingListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        seed_applications(make_user("researcher@example.com"), count=3)
+
+    def get(self, url, streaming):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin)}")
+        with override_settings(JSON_STREAMING=streaming):
+            return client.get(url)
+
+    def test_long_lists_are_streamed_with_the_same_json(self):
+        for url in ("/api/applications/", "/api/papers/", "/api/coauthors/"):
+            with self.subTest(url=url):
+                expected = self.get(url, streaming=False)
+                response = self.get(url, streaming=True)
+                self.assertTrue(response.streaming)
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertEqual(b"".join(response.streaming_content), expected.content)
+
+    def test_short_lists_and_details_are_not_streamed(self):
+        application = Application.objects.first()
+        for url in (f"/api/applications/{application.id}/", f"/api/papers/?application={application.id}"):
+            with self.subTest(url=url):
+                self.assertFalse(self.get(url, streaming=True).streaming)
+
+
+class AdminChangelistTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.researcher = make_user("researcher@example.com", full_name="Исследователь Тестов")
+        cls.app = seed_applications(cls.researcher, count=2)[0]
+        cls.paper = cls.app.papers.first()
+        Coauthor.objects.create(full_name="Посторонний Соавтор")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(f"admin:compensations_{name}", args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_changelists_do_not_grow_with_rows(self):
+        for model in ("application", "paper", "coauthor"):
+            self.assertConstantQueries(
+                lambda: self.get(f"{model}_changelist"),
+                lambda: seed_applications(self.researcher, count=2),
+                label=f"admin {model} changelist",
+            )
+
+    def test_change_forms_do_not_load_all_coauthors(self):
+        self.get("application_change", self.app.pk)
+        response = self.get("paper_change", self.paper.pk)
+        self.assertContains(response, self.paper.coauthors.first().full_name)
+        self.assertNotContains(response, "Посторонний Соавтор")
+
+    def test_unfiltered_count_comes_from_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE compensations_coauthor")
+        estimate = estimated_count(Coauthor)
+        self.assertEqual(estimate, Coauthor.objects.count())
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1), self.assertBudget(10, 1, label="changelist") as captured:
+            response = self.get("coauthor_changelist")
+        self.assertEqual(response.context["cl"].result_count, estimate)
+        self.assertFalse([q for q in captured if "COUNT(*)" in q["sql"] and "compensations_coauthor" in q["sql"]])
+
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1):
+            response = self.get("coauthor_changelist", q="Посторонний")
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_search_covers_coauthor_positions_and_paper_owners(self):
+        Coauthor.objects.create(full_name="Третий Соавтор", position="Доцент", subdivision="Кафедра физики")
+        response = self.get("coauthor_changelist", q="Кафедра физики")
+        self.assertEqual([str(c) for c in response.context["cl"].result_list], ["Третий Соавтор"])
+        self.assertEqual(self.get("coauthor_changelist", q="Доцент").context["cl"].result_count, 1)
+
+        other = seed_applications(make_user("other@example.com"), count=1)[0]
+        response = self.get("paper_changelist", q="researcher@example")
+        self.assertEqual(response.context["cl"].result_count, 4)
+        self.assertNotIn(other.pk, {paper.application_id for paper in response.context["cl"].result_list})
+        title = self.paper.title
+        self.assertIn(self.paper, self.get("paper_changelist", q=title).context["cl"].result_list)
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=16)
+class UploadSessionTests(TempMediaRootMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.other = make_user("other@example.com")
+        cls.draft = seed_applications(cls.researcher, count=1, papers=1, status="draft")[0]
+        cls.paper = cls.draft.papers.get()
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="stimulus_test_uploads_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_TEMP_DIR=self.temp_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.researcher)}")
+
+    def start(self, content=PDF_BYTES, **extra):
+        response = self.client.post(
+            "/api/uploads/", {"filename": "paper.pdf", "size": len(content), **extra}, format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put_chunk(self, session_id, index, data):
+        return self.client.put(
+            f"/api/uploads/{session_id}/chunks/{index}/", data, content_type="application/octet-stream",
+        )
+
+    def test_chunked_upload_is_attached_to_paper(self):
+        session = self.start()
+        self.assertEqual(session["chunk_size"], 16)
+        chunks = [PDF_BYTES[i:i + 16] for i in range(0, len(PDF_BYTES), 16)]
+
+        for index, chunk in enumerate(chunks):
+            with self.assertBudget(3, 0.5, label=f"PUT chunk {index}"):
+                response = self.put_chunk(session["id"], index, chunk)
+            self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["offset"], len(PDF_BYTES))
+        self.assertTrue(response.data["complete"])
+
+        response = self.client.post(
+            f"/api/uploads/{session['id']}/complete/", {"paper": str(self.paper.id)}, format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.paper.refresh_from_db()
+        with self.paper.file_upload.open("rb") as fh:
+            self.assertEqual(fh.read(), PDF_BYTES)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_resume_after_broken_chunk(self):
+        session = self.start()
+        self.assertEqual(self.put_chunk(session["id"], 0, PDF_BYTES[:16]).status_code, 200)
+
+        # a chunk shorter than announced is rejected and the offset does not move
+        response = self.put_chunk(session["id"], 1, PDF_BYTES[16:20])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f"/api/uploads/{session['id']}/").data["offset"], 16)
+
+        response = self.put_chunk(session["id"], 2, PDF_BYTES[32:48])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["offset"], 16)
+
+        # re-sending an already received chunk is harmless
+        self.assertEqual(self.put_chunk(session["id"], 0, PDF_BYTES[:16]).data["offset"], 16)
+
+        response = self.client.post(f"/api/uploads/{session['id']}/complete/", {"paper": str(self.paper.id)}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_non_pdf_and_oversized_files(self):
+        session = self.start(content=b"GIF89a" + b"\0" * 20)
+        response = self.put_chunk(session["id"], 0, b"GIF89a" + b"\0" * 10)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f"/api/uploads/{session['id']}/").data["offset"], 0)
+
+        response = self.client.post(
+            "/api/uploads/", {"filename": "big.pdf", "size": 6 * 1024 * 1024}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("size", response.data)
+
+    def test_sessions_and_papers_of_other_users_are_hidden(self):
+        session = self.start()
+        other = APIClient()
+        other.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.other)}")
+        self.assertEqual(other.put(
+            f"/api/uploads/{session['id']}/chunks/0/", PDF_BYTES[:16], content_type="application/octet-stream",
+        ).status_code, 404)
+
+        response = other.post("/api/uploads/", {"filename": "p.pdf", "size": len(PDF_BYTES)}, format="json")
+        other_session = response.data["id"]
+        for index in range(3):
+            other.put(
+                f"/api/uploads/{other_session}/chunks/{index}/", PDF_BYTES[index * 16:(index + 1) * 16],
+                content_type="application/octet-stream",
+            )
+        response = other.post(f"/api/uploads/{other_session}/complete/", {"paper": str(self.paper.id)}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("paper", response.data)
+
+
+class ContentAddressedStorageTests(TempMediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.first, cls.second = seed_papers(
+            seed_applications(cls.researcher, count=1, papers=0, status="draft")[0], count=2, coauthors=0,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.researcher)}")
+
+    def upload(self, paper, content):
+        response = self.client.patch(
+            f"/api/papers/{paper.id}/",
+            {"file_upload": SimpleUploadedFile("article.pdf", content, content_type="application/pdf")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        paper.refresh_from_db()
+        return paper.file_upload.name
+
+    def test_identical_uploads_share_one_blob(self):
+        first_name = self.upload(self.first, PDF_BYTES)
+        second_name = self.upload(self.second, PDF_BYTES)
+
+        self.assertEqual(first_name, second_name)
+        self.assertTrue(first_name.startswith("blobs/"))
+        blob = FileBlob.objects.get(name=first_name)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.size, len(PDF_BYTES))
+        self.assertEqual(blob.sha256, hashlib.sha256(PDF_BYTES).hexdigest())
+
+        replaced = self.upload(self.second, PDF_BYTES + b"% revised\n")
+        self.assertNotEqual(replaced, first_name)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertEqual(FileBlob.objects.get(name=replaced).ref_count, 1)
+
+        self.first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertEqual(self.second.file_upload.open("rb").read(), PDF_BYTES + b"% revised\n")
+        self.second.file_upload.close()
+
+    def test_concurrent_identical_upload_keeps_the_blob_name(self):
+        location = tempfile.mkdtemp(prefix="stimulus_test_blobs_")
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        storage = ContentAddressedStorage(location=location)
+        original = storage.get_available_name
+
+        def racing(name, max_length=None):
+            # the other upload writes the same bytes right after the exists() check
+            available = original(name, max_length)
+            os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+            with open(storage.path(name), "wb") as fh:
+                fh.write(PDF_BYTES)
+            return available
+
+        with mock.patch.object(storage, "get_available_name", side_effect=racing):
+            name = storage.save("article.pdf", ContentFile(PDF_BYTES))
+        self.assertEqual(name, blob_name(hashlib.sha256(PDF_BYTES).hexdigest(), ".pdf"))
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(name))), [os.path.basename(name)])
+        with storage.open(name) as fh:
+            self.assertEqual(fh.read(), PDF_BYTES)
+
+
+class PaperFileDownloadTests(TempMediaRootMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.other = make_user("other@example.com")
+        cls.admin = make_user("admin@example.com", is_staff=True)
+        cls.paper, cls.without_file = seed_papers(
+            seed_applications(cls.researcher, count=1, papers=0)[0], count=2, coauthors=1,
+        )
+        cls.paper.file_upload.save("article.pdf", SimpleUploadedFile("article.pdf", PDF_BYTES))
+
+    def get(self, user, paper, max_queries=2):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        with self.assertBudget(max_queries, 0.5, label=f"{user.email} GET file"):
+            return client.get(f"/api/papers/{paper.id}/file/")
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX="/protected_media/")
+    def test_nginx_sends_the_file(self):
+        for user in (self.researcher, self.admin):
+            response = self.get(user, self.paper)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["X-Accel-Redirect"], f"/protected_media/{self.paper.file_upload.name}")
+            self.assertEqual(response["Content-Type"], "application/pdf")
+            self.assertEqual(response.content, b"")
+
+    def test_streams_without_nginx(self):
+        response = self.get(self.researcher, self.paper)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Accel-Redirect", response)
+        self.assertEqual(b"".join(response.streaming_content), PDF_BYTES)
+
+    def test_access_is_checked(self):
+        # a miss also looks for the paper in the archive
+        self.assertEqual(self.get(self.other, self.paper, max_queries=3).status_code, 404)
+        self.assertEqual(self.get(self.researcher, self.without_file).status_code, 404)
+
+
+class SweepMediaTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="stimulus_test_uploads_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        settings_override = override_settings(UPLOAD_TEMP_DIR=self.temp_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        owner = make_user("researcher@example.com")
+        self.paper = seed_papers(seed_applications(owner, count=1, papers=0)[0], count=1, coauthors=0)[0]
+        self.paper.file_upload.save("kept.pdf", SimpleUploadedFile("kept.pdf", PDF_BYTES + b"% kept\n"))
+
+        storage = self.paper.file_upload.storage
+        replaced = self.paper.file_upload.name
+        self.paper.file_upload.save("new.pdf", SimpleUploadedFile("new.pdf", PDF_BYTES + b"% new\n"))
+        self.orphans = [
+            (storage, replaced),
+            (default_storage, default_storage.save("papers/legacy_article.pdf", SimpleUploadedFile("a.pdf", PDF_BYTES))),
+            (default_storage, default_storage.save("generated/old.docx", SimpleUploadedFile("old.docx", b"docx"))),
+        ]
+        self.young = (default_storage, default_storage.save("papers/just_uploaded.pdf", SimpleUploadedFile("b.pdf", PDF_BYTES)))
+
+        self.stale_session = UploadSession.objects.create(owner=owner, filename="a.pdf", size=10, chunk_size=16)
+        UploadSession.objects.filter(pk=self.stale_session.pk).update(updated_at=timezone.now() - timedelta(days=3))
+        self.stray_part = os.path.join(self.temp_dir, "not-a-session.part")
+        open(self.stray_part, "wb").close()
+
+        old = time.time() - 3 * 24 * 3600
+        for storage, name in self.orphans + [(storage, self.paper.file_upload.name)]:
+            os.utime(storage.path(name), (old, old))
+        os.utime(self.stray_part, (old, old))
+        FileBlob.objects.filter(name=replaced).update(updated_at=timezone.now() - timedelta(days=3))
+
+    def test_dry_run_keeps_everything(self):
+        out = StringIO()
+        call_command("sweep_media", "--dry-run", stdout=out)
+        self.assertIn("Unreferenced: 5 files", out.getvalue())
+        for storage, name in self.orphans:
+            self.assertTrue(storage.exists(name), name)
+        self.assertTrue(UploadSession.objects.exists())
+
+    def test_removes_unreferenced_files_older_than_grace_period(self):
+        call_command("sweep_media", stdout=StringIO())
+
+        for storage, name in self.orphans:
+            self.assertFalse(storage.exists(name), name)
+        self.assertFalse(FileBlob.objects.filter(name=self.orphans[0][1]).exists())
+        self.assertTrue(self.paper.file_upload.storage.exists(self.paper.file_upload.name))
+        self.assertEqual(FileBlob.objects.get(name=self.paper.file_upload.name).ref_count, 1)
+        self.assertTrue(self.young[0].exists(self.young[1]))
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(self.stray_part))
+
+    def test_blob_reused_after_the_batch_check_is_kept(self):
+        storage, name = self.orphans[0]
+        # an upload of the same content between the batch lookup and the deletion
+        with mock.patch("compensations.management.commands.sweep_media.referenced_paper_files", return_value=set()):
+            FileBlob.keep(name)
+            call_command("sweep_media", stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+
+    def test_reuse_writes_a_swept_file_again(self):
+        storage, name = self.orphans[0]
+        call_command("sweep_media", stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+
+        self.assertEqual(storage.save("again.pdf", ContentFile(PDF_BYTES + b"% kept\n")), name)
+        self.assertTrue(storage.exists(name))
+
+
+S3_OPTIONS = {
+    "bucket_name": "stimulus-test",
+    "access_key": "test",
+    "secret_key": "test",
+    "region_name": "us-east-1",
+    "public_endpoint_url": "http://localhost:9000",
+    "addressing_style": "path",
+    "signature_version": "s3v4",
+    "file_overwrite": False,
+}
+
+
+@skipUnless(mock_aws, "moto is not installed")
+class S3StorageTests(TestCase):
+    """The S3 drivers against moto's in-process S3 stand-in."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.researcher = make_user("researcher@example.com")
+        cls.first, cls.second = seed_papers(
+            seed_applications(cls.researcher, count=1, papers=0, status="draft")[0], count=2, coauthors=0,
+        )
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=S3_OPTIONS["bucket_name"])
+
+        self.storage = S3ContentAddressedStorage(**S3_OPTIONS)
+        field_storage = mock.patch.object(Paper._meta.get_field("file_upload"), "storage", self.storage)
+        field_storage.start()
+        self.addCleanup(field_storage.stop)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.researcher)}")
+
+    def upload(self, paper):
+        response = self.client.patch(
+            f"/api/papers/{paper.id}/",
+            {"file_upload": SimpleUploadedFile("article.pdf", PDF_BYTES, content_type="application/pdf")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        paper.refresh_from_db()
+        return paper.file_upload.name
+
+    def test_uploads_are_stored_once_in_the_bucket(self):
+        name = self.upload(self.first)
+        self.assertEqual(self.upload(self.second), name)
+
+        keys = [obj.key for obj in self.storage.bucket.objects.all()]
+        self.assertEqual(keys, [name])
+        self.assertEqual(FileBlob.objects.get(name=name).ref_count, 2)
+        with self.storage.open(name, "rb") as fh:
+            self.assertEqual(fh.read(), PDF_BYTES)
+
+    def test_download_redirects_to_presigned_url(self):
+        name = self.upload(self.first)
+
+        response = self.client.get(f"/api/papers/{self.first.id}/file/")
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response["Location"].startswith(f"http://localhost:9000/stimulus-test/{name}?"))
+        self.assertIn("X-Amz-Signature=", response["Location"])
+
+        response = self.client.get(f"/api/papers/{self.first.id}/file/?redirect=false")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Amz-Signature=", response.data["url"])
+
+    def test_presigned_urls_share_one_client(self):
+        with mock.patch.object(boto3.session, "Session", wraps=boto3.session.Session) as session:
+            storage = S3ContentAddressedStorage(**S3_OPTIONS)
+            urls = [storage.url(f"blobs/{n}.pdf") for n in range(3)]
+        self.assertEqual(session.call_count, 1)
+        self.assertEqual(len(set(urls)), 3)
+
+    def test_large_files_use_multipart_upload(self):
+        storage = PresignedS3Storage(**S3_OPTIONS, transfer_config=TransferConfig(
+            multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024,
+        ))
+        name = storage.save("generated/big.bin", ContentFile(b"x" * (6 * 1024 * 1024)))
+
+        self.assertEqual(storage.size(name), 6 * 1024 * 1024)
+        # multipart ETags are "<md5 of part md5s>-<number of parts>"
+        self.assertTrue(storage.bucket.Object(name).e_tag.endswith('-2"'))
@@ -0,0 +1,124 @@
+"""
+Application status transitions.
+
+A transition is one SQL statement: the application row is locked and
+updated only while it is still in one of the allowed source statuses (and
+matches the extra conditions), and the change is appended to
+ApplicationTransition in the same statement. Two admins acting on the same
+application cannot both succeed, and no lock outlives the statement. The
+statement also sends the change to the event streams (compensations/events.py).
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import events
+from .cache import bump_owners
+from .models import Application, ApplicationTransition, Paper
+
+# what ApplicationViewSet.submit checks in Python, as a filter
+SUBMITTABLE = (
+    Q(faculty__isnull=False)
+    & ~Q(faculty="")
+    & Exists(Paper.objects.filter(application=OuterRef("pk")))
+    & ~Exists(
+        Paper.objects.filter(application=OuterRef("pk"))
+        .exclude(has_university_affiliation=True, registered_in_platonus=True)
+    )
+)
+# ApplicationSerializer.validate_status also requires the paper files
+HAS_FILES = ~Exists(
+    Paper.objects.filter(application=OuterRef("pk")).filter(Q(file_upload="") | Q(file_upload__isnull=True))
+)
+
+
+def application_pk(pk):
+    """``pk`` from the URL as an application id; Http404 when it is not one, as get_object() would."""
+    try:
+        return Application._meta.pk.to_python(pk)
+    except ValidationError:
+        raise Http404
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Статус заявки изменился, обновите страницу."
+    default_code = "transition_conflict"
+
+
+def transition(queryset, pk, to_status, from_statuses, actor=None, comment=None, condition=None):
+    """
+    Move application ``pk`` of ``queryset`` to ``to_status`` if its status
+    is in ``from_statuses`` and it matches ``condition`` (a Q/expression).
+    ``comment`` replaces ``admin_comment`` unless None; a review claim
+    (compensations/review.py) ends. Returns the updated application; raises
+    TransitionConflict when no row qualified.
+    """
+    target = queryset.filter(pk=application_pk(pk), status__in=list(from_statuses))
+    if condition is not None:
+        target = target.filter(condition)
+    target_sql, target_params = target.order_by().values("id", "status").query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    table = qn(Application._meta.db_table)
+    fields = Application._meta.concrete_fields
+    returning = ", ".join(f"{table}.{qn(field.column)}" for field in fields)
+    history = ApplicationTransition._meta
+    now = timezone.now()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH target AS ({target_sql} FOR UPDATE),
+            updated AS (
+                UPDATE {table}
+                SET {qn("status")} = %s,
+                    {qn("admin_comment")} = COALESCE(%s, {table}.{qn("admin_comment")}),
+                    {qn("updated_at")} = %s,
+                    {qn("reviewer_id")} = NULL,
+                    {qn("review_lease_until")} = NULL
+                FROM target WHERE {table}.{qn("id")} = target.{qn("id")}
+                RETURNING {returning}, target.{qn("status")} AS from_status
+            ),
+            history AS (
+                INSERT INTO {qn(history.db_table)}
+                    ({qn("application_id")}, {qn("from_status")}, {qn("to_status")},
+                     {qn("actor_id")}, {qn("comment")}, {qn("created_at")})
+                SELECT {qn("id")}, from_status, {qn("status")}, %s, %s, %s FROM updated
+                RETURNING {qn("id")}, {qn("comment")}
+            )
+            SELECT updated.*, event.payload, pg_notify(%s, event.payload)
+            FROM updated CROSS JOIN history CROSS JOIN LATERAL (
+                SELECT json_build_object(
+                    'id', history.{qn("id")}, 'application', updated.{qn("id")}, 'owner', updated.{qn("owner_id")},
+                    'status', updated.{qn("status")}, 'from_status', updated.from_status,
+                    'comment', left(history.{qn("comment")}, %s), 'at', %s
+                )::text AS payload
+            ) event
+            """,
+            [
+                *target_params, to_status, comment, now, getattr(actor, "pk", None), comment or "", now,
+                events.CHANNEL, events.COMMENT_LENGTH, now.isoformat(),
+            ],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise TransitionConflict()
+
+    application = Application.from_db(
+        connection.alias, [field.attname for field in fields], row[:len(fields)],
+    )
+    # a queryset UPDATE sends no post_save
+    bump_owners([application.owner_id])
+    # NOTIFY reaches the listeners of every process on commit; the local bus only this one
+    if settings.EVENTS_BACKEND == "local":
+        payload = json.loads(row[len(fields) + 1])
+        transaction.on_commit(lambda: events.bus.publish(payload))
+    return application
@@ -0,0 +1,120 @@
+"""
+Resumable chunked upload of paper PDFs.
+
+Protocol:
+    POST   /api/uploads/                      {filename, size} -> session with chunk_size
+    PUT    /api/uploads/{id}/chunks/{n}/      raw bytes of chunk n (offset n * chunk_size)
+    GET    /api/uploads/{id}/                 current offset, to resume after a broken connection
+    POST   /api/uploads/{id}/complete/        {paper} -> attaches the file to the paper
+
+Chunks are streamed from the request body straight into a part file in
+UPLOAD_TEMP_DIR; the body is never parsed or held in memory. Size and the
+``%PDF-`` signature are checked while the bytes arrive.
+"""
+import fcntl
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+PDF_MAGIC = b"%PDF-"
+READ_SIZE = 64 * 1024
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Конфликт смещения загрузки."
+    default_code = "upload_conflict"
+
+
+class PartFile(File):
+    """
+    Finished part file. ``temporary_file_path`` lets FileSystemStorage move
+    it into MEDIA_ROOT instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(session):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, f"{session.id}.part")
+
+
+def create_part_file(session):
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    open(part_path(session), "wb").close()
+
+
+def delete_part_file(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def write_chunk(session, index, stream, content_length):
+    """
+    Stream chunk ``index`` into the part file and return the new offset.
+
+    Chunks may be re-sent (the same bytes are written again at the same
+    place) but not skip ahead of the received offset. The offset only
+    advances when the whole chunk has arrived, so a dropped connection is
+    resumed by re-sending that chunk.
+    """
+    start = index * session.chunk_size
+    if start >= session.size:
+        raise ValidationError({"detail": "Номер части вне диапазона файла."})
+    if start > session.offset:
+        raise UploadConflict("Части нужно отправлять по порядку.")
+
+    expected = min(session.chunk_size, session.size - start)
+    if content_length != expected:
+        raise ValidationError({"detail": f"Ожидалось {expected} байт в части {index}, получено {content_length}."})
+
+    try:
+        fh = open(part_path(session), "r+b")
+    except FileNotFoundError:
+        raise ValidationError({"detail": "Файл сессии загрузки не найден, начните загрузку заново."})
+
+    with fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict("Часть этой загрузки уже принимается.")
+
+        fh.seek(start)
+        header = b""
+        received = 0
+        while received < expected:
+            data = stream.read(min(READ_SIZE, expected - received)) if stream is not None else b""
+            if not data:
+                break
+            if start == 0 and len(header) < len(PDF_MAGIC):
+                header += data[:len(PDF_MAGIC) - len(header)]
+                if not PDF_MAGIC.startswith(header):
+                    raise ValidationError({"detail": "Файл должен быть в формате PDF."})
+            fh.write(data)
+            received += len(data)
+
+    if received < expected:
+        raise ValidationError({"detail": f"Часть {index} получена не полностью ({received} из {expected} байт)."})
+
+    end = start + expected
+    if end > session.offset:
+        type(session).objects.filter(pk=session.pk, offset__lt=end).update(offset=end, updated_at=timezone.now())
+        session.offset = end
+    return session.offset
+
+
+def attach_to_paper(session, paper):
+    """Move the finished part file into ``paper.file_upload``."""
+    with open(part_path(session), "rb") as fh:
+        paper.file_upload.save(session.filename, PartFile(fh), save=False)
+    # content that is already stored is not moved (ContentAddressedStorage)
+    delete_part_file(session)
+    paper.save(update_fields=["file_upload", "updated_at"])
+    return paper
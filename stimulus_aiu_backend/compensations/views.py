@@ -1,57 +1,108 @@
-from django.http import HttpResponse
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from rest_framework import viewsets, permissions, status, decorators, response, filters
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework import viewsets, mixins, permissions, status, decorators, response, filters
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
 
-from .models import Application, Paper, Coauthor
+from core.instrumentation import measure
+from core.parsers import JSONParser
+from core.renderers import StreamingListMixin
+from core.tracing import span
+from core.metrics import observe_document, observe_upload
+
+from .cache import CachedReadMixin
+from .changes import ChangesFeedMixin
+from .models import Application, Paper, Coauthor, UploadSession
+from .representations import ValuesReadMixin
 from .serializers import (
     ApplicationSerializer,
     ApplicationDetailSerializer,
     PaperSerializer,
+    ReviewClaimSerializer,
+    ReviewQueueSerializer,
     CoauthorSerializer,
+    UploadSessionSerializer,
 )
+from . import archive, review
 from .permissions import IsOwnerOrAdmin
 from .services import generate_application_docx
 from .exporters import build_applications_xlsx
+from .transitions import SUBMITTABLE, TransitionConflict, transition
+from .uploads import UploadConflict, attach_to_paper, create_part_file, delete_part_file, write_chunk
 
 BLOCKED_STATUSES = {"approved", "submitted"}
 EDITABLE_STATUSES = {"draft", "rejected"}
 
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(StreamingListMixin, CachedReadMixin, ValuesReadMixin, ChangesFeedMixin, viewsets.ModelViewSet):
     queryset = Application.objects.select_related("owner").prefetch_related("papers__coauthors").all()
     serializer_class = ApplicationSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ["status", "faculty"]
+    filterset_fields = ["status", "faculty", "report_year"]
     ordering_fields = ["created_at", "report_year"]
     search_fields = ["owner__email", "owner__full_name"]
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        if self.request.user.is_staff:
-            qs = qs.exclude(status="draft")
-        else:
-            qs = qs.filter(owner=self.request.user)
-        return qs
+        with span("ApplicationViewSet.get_queryset"):
+            qs = super().get_queryset()
+            if self.request.user.is_staff:
+                qs = qs.exclude(status="draft")
+            else:
+                qs = qs.filter(owner=self.request.user)
+            return qs
 
     def get_serializer_class(self):
         if self.action in ["retrieve"]:
             return ApplicationDetailSerializer
         return ApplicationSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # applications of closed report years (compensations/archive.py)
+            archived = get_object_or_404(archive.visible_to(request.user), pk=kwargs["pk"])
+            return Response(archive.detail(archived, request))
+
+    @action(detail=False, methods=["get"])
+    def archive(self, request):
+        """Archived applications, filtered like the list (report_year, status, faculty, search), ?limit=&offset= pages."""
+        archived = self.filter_queryset(archive.visible_to(request.user))
+        # the pk keeps the offsets stable between applications created at the same moment
+        archived = archived.order_by(*(archived.query.order_by or archived.model._meta.ordering), "pk")
+        paginator = archive.ArchivePagination()
+        page = paginator.paginate_queryset(archived, request, view=self)
+        return paginator.get_paginated_response([archive.detail(item, request) for item in page])
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user, status="draft")
 
     @action(detail=True, methods=["post"])
     def submit(self, request, pk=None):
+        try:
+            transition(
+                self.get_queryset(), pk, "submitted", EDITABLE_STATUSES,
+                actor=request.user, comment="", condition=SUBMITTABLE,
+            )
+        except TransitionConflict:
+            return self._submit_error()
+        return Response({"detail": "Заявка отправлена"})
+
+    def _submit_error(self):
+        """Why ``submit`` did not apply; only read when the transition failed."""
         app = self.get_object()
         if app.status not in EDITABLE_STATUSES:
             return Response({"detail": "Заявка не в статусе, позволяющем отправку."}, status=400)
@@ -63,41 +114,59 @@ class ApplicationViewSet(viewsets.ModelViewSet):
         for paper in app.papers.all():
             if not (paper.has_university_affiliation and paper.registered_in_platonus):
                 return Response({"detail": "Все публикации должны иметь аффилиацию университета и быть зарегистрированы в Platonus."}, status=400)
-        
-        app.status = "submitted"
-        app.admin_comment = ""
-        app.save(update_fields=["status", "admin_comment"])
-        return Response({"detail": "Заявка отправлена"})
+        raise TransitionConflict()
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
     def approve(self, request, pk=None):
-        app = self.get_object()
-        if app.status != "submitted":
-            return Response({"detail": "Заявка должна быть в статусе 'Отправлено'."}, status=400)
         comment = request.data.get("comment", "").strip()
-        if comment:
-            app.admin_comment = comment
-        app.status = "approved"
-        app.save(update_fields=["status", "admin_comment"])
-        return Response({"detail": "Заявка одобрена"})
+        return self._review(pk, "approved", comment or None) or Response({"detail": "Заявка одобрена"})
 
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
     def reject(self, request, pk=None):
-        app = self.get_object()
-        if app.status != "submitted":
-            return Response({"detail": "Заявка должна быть в статусе 'Отправлено'."}, status=400)
         comment = request.data.get("comment", "").strip()
         if not comment:
             return Response({"detail": "Комментарий обязателен при отклонении"}, status=400)
-        app.admin_comment = comment
-        app.status = "rejected"
-        app.save(update_fields=["status", "admin_comment"])
-        return Response({"detail": "Заявка отклонена"})
+        return self._review(pk, "rejected", comment) or Response({"detail": "Заявка отклонена"})
+
+    def _review(self, pk, to_status, comment):
+        """Error response, or None when the transition applied."""
+        user = self.request.user
+        try:
+            transition(
+                self.get_queryset(), pk, to_status, {"submitted"}, actor=user, comment=comment,
+                condition=review.open_to(user),
+            )
+        except TransitionConflict:
+            if self.get_object().status == "submitted":
+                return Response({"detail": "Заявку рассматривает другой администратор."}, status=409)
+            return Response({"detail": "Заявка должна быть в статусе 'Отправлено'."}, status=400)
+        return None
+
+    @action(detail=False, methods=["get", "post"], permission_classes=[permissions.IsAdminUser])
+    def review_queue(self, request):
+        """GET: applications claimed by the current admin. POST: claim the next ``count`` of them."""
+        if request.method == "POST":
+            params = ReviewClaimSerializer(data=request.data)
+            params.is_valid(raise_exception=True)
+            ids = review.claim(request.user, **params.validated_data)
+            queryset = self.get_queryset().filter(pk__in=ids)
+        else:
+            queryset = self.get_queryset().filter(pk__in=review.claimed_by(request.user).values("pk"))
+        return Response(ReviewQueueSerializer(queryset.order_by("created_at"), many=True).data)
+
+    @action(detail=True, methods=["post"], permission_classes=[permissions.IsAdminUser])
+    def release(self, request, pk=None):
+        if not review.release(request.user, pk):
+            return Response({"detail": "Заявка не закреплена за вами."}, status=400)
+        return Response({"detail": "Заявка возвращена в очередь"})
 
     @action(detail=True, methods=["get"])
     def docx(self, request, pk=None):
         app = self.get_object()
-        filename, file_content = generate_application_docx(app)
+        started = time.perf_counter()
+        with measure("render"):
+            filename, file_content = generate_application_docx(app)
+        observe_document("docx", time.perf_counter() - started, file_content.size)
         response = HttpResponse(
             file_content.read(),
             content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
@@ -108,7 +177,12 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"], permission_classes=[permissions.IsAdminUser])
     def export_xlsx(self, request, *args, **kwargs):
         applications_qs = self.filter_queryset(self.get_queryset())
-        xlsx_bytes = build_applications_xlsx(applications_qs)
+        started = time.perf_counter()
+        with measure("render"):
+            xlsx_bytes = build_applications_xlsx(
+                applications_qs, self.filter_queryset(archive.visible_to(request.user)).iterator(chunk_size=200),
+            )
+        observe_document("xlsx", time.perf_counter() - started, len(xlsx_bytes))
         filename = f"applications_export_{timezone.now().strftime('%Y-%m-%d_%H-%M')}.xlsx" 
         response = HttpResponse(
             xlsx_bytes,
@@ -119,8 +193,8 @@ class ApplicationViewSet(viewsets.ModelViewSet):
 
 
 
-class PaperViewSet(viewsets.ModelViewSet):
-    queryset = Paper.objects.select_related("application", "application__owner").all()
+class PaperViewSet(StreamingListMixin, CachedReadMixin, ValuesReadMixin, ChangesFeedMixin, viewsets.ModelViewSet):
+    queryset = Paper.objects.select_related("application", "application__owner").prefetch_related("coauthors").all()
     serializer_class = PaperSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
@@ -131,13 +205,16 @@ class PaperViewSet(viewsets.ModelViewSet):
     http_method_names = ["get", "post", "put", "patch", "delete", "head", "options"]
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        if not self.request.user.is_staff:
-            qs = qs.filter(application__owner=self.request.user)
-        app_id = self.request.query_params.get("application")
-        if app_id:
-            qs = qs.filter(application_id=app_id)
-        return qs
+        with span("PaperViewSet.get_queryset"):
+            qs = super().get_queryset()
+            if self.action == "file":
+                qs = qs.prefetch_related(None)
+            if not self.request.user.is_staff:
+                qs = qs.filter(application__owner=self.request.user)
+            app_id = self.request.query_params.get("application")
+            if app_id:
+                qs = qs.filter(application_id=app_id)
+            return qs
     
     def perform_create(self, serializer):
         application_id = self.request.data.get("application")
@@ -240,8 +317,52 @@ class PaperViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_id="papers_file",
+        operation_description=(
+            "Скачать файл публикации. С хранилищем S3 — редирект на presigned-ссылку "
+            "(?redirect=false — ссылка в JSON); за nginx — X-Accel-Redirect на внутренний location "
+            "(MEDIA_ACCEL_REDIRECT_PREFIX), и файл отправляет nginx."
+        ),
+        responses={200: openapi.Response("PDF"), 404: openapi.Response("Файл не загружен")},
+    )
+    @action(detail=True, methods=["get"])
+    def file(self, request, pk=None):
+        try:
+            paper = self.get_object()
+        except Http404:
+            # papers of archived applications (compensations/archive.py)
+            archived = get_object_or_404(archive.files_visible_to(request.user), paper_id=pk)
+            paper = Paper(id=archived.paper_id, file_upload=archived.name)
+        if not paper.file_upload:
+            raise Http404("Файл не загружен.")
+        filename = f"paper_{paper.id}.pdf"
+
+        storage = paper.file_upload.storage
+        if getattr(storage, "supports_presigned_urls", False):
+            url = storage.url(paper.file_upload.name, parameters={
+                "ResponseContentType": "application/pdf",
+                "ResponseContentDisposition": f'attachment; filename="{filename}"',
+            })
+            if request.query_params.get("redirect") == "false":
+                return Response({"url": url})
+            return HttpResponseRedirect(url)
+
+        if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+            response = HttpResponse(content_type="application/pdf")
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(paper.file_upload.name)
+            response["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
 
-class CoauthorViewSet(viewsets.ModelViewSet):
+        try:
+            return FileResponse(
+                paper.file_upload.open("rb"), as_attachment=True, filename=filename, content_type="application/pdf",
+            )
+        except FileNotFoundError:
+            raise Http404("Файл не найден.")
+
+
+class CoauthorViewSet(StreamingListMixin, ValuesReadMixin, ChangesFeedMixin, viewsets.ModelViewSet):
     queryset = Coauthor.objects.all()
     serializer_class = CoauthorSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -308,4 +429,87 @@ class CoauthorViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return response.Response({"detail": "Только администратор может удалять соавторов."},
                                      status=status.HTTP_403_FORBIDDEN)
-        return super().destroy(request, *args, **kwargs)
\ No newline at end of file
+        return super().destroy(request, *args, **kwargs)
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Resumable chunked upload of paper files; see compensations/uploads.py for the protocol."""
+
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        session = serializer.save(owner=self.request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+        create_part_file(session)
+
+    def perform_destroy(self, instance):
+        delete_part_file(instance)
+        super().perform_destroy(instance)
+
+    @swagger_auto_schema(
+        operation_id="uploads_chunk",
+        operation_description=(
+            "Загрузить часть N файла (тело запроса — байты части, Content-Length = chunk_size, "
+            "последняя часть — остаток). Части отправляются по порядку; при обрыве связи "
+            "повторите часть offset // chunk_size."
+        ),
+        request_body=no_body,
+        responses={200: UploadSessionSerializer()},
+    )
+    @action(detail=True, methods=["put"], url_path=r"chunks/(?P<index>\d+)")
+    def chunk(self, request, pk=None, index=None):
+        session = self.get_object()
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        try:
+            write_chunk(session, int(index), request.stream, content_length)
+        except UploadConflict as exc:
+            return Response({"detail": exc.detail, "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(session).data)
+
+    @swagger_auto_schema(
+        operation_id="uploads_complete",
+        operation_description="Завершить загрузку и прикрепить файл к публикации.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={"paper": openapi.Schema(type=openapi.TYPE_STRING)},
+        ),
+        responses={200: PaperSerializer()},
+    )
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        if not session.is_complete:
+            return Response(
+                {"detail": "Файл загружен не полностью.", "offset": session.offset},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paper_id = request.data.get("paper")
+        if not paper_id:
+            raise ValidationError({"paper": "Paper ID is required."})
+        papers = Paper.objects.select_related("application")
+        if not request.user.is_staff:
+            papers = papers.filter(application__owner=request.user)
+        try:
+            paper = papers.get(id=paper_id)
+        except (Paper.DoesNotExist, DjangoValidationError):
+            raise ValidationError({"paper": "Invalid paper."})
+        if paper.application.status not in EDITABLE_STATUSES and not request.user.is_staff:
+            raise ValidationError("Можно редактировать публикации только в черновики или отклонённые заявки.")
+
+        observe_upload(session.size)
+        attach_to_paper(session, paper)
+        session.delete()
+        return Response(PaperSerializer(paper, context=self.get_serializer_context()).data)
@@ -1,3 +1,63 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .models import SlowQuery
+
+
+def estimated_count(model, using="default"):
+    """Row count of ``model``'s table from the planner statistics; None when unknown."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [connection.ops.quote_name(model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1: never vacuumed or analyzed
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator for large tables: an unfiltered changelist takes
+    its count from pg_class.reltuples instead of COUNT(*), which reads the
+    whole table. Filtered changelists and tables under
+    ADMIN_ESTIMATED_COUNT_THRESHOLD rows are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not getattr(queryset, "query", None) or queryset.query.where:
+            return super().count
+        estimate = estimated_count(queryset.model, queryset.db)
+        if estimate is None or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # the "N total" next to filtered results is another COUNT(*) of the whole table
+    show_full_result_count = False
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(LargeTableAdmin):
+    list_display = ("created_at", "duration_ms", "view", "caller")
+    list_filter = ("view",)
+    search_fields = ("sql", "view", "caller")
+    readonly_fields = ("created_at", "duration_ms", "view", "caller", "sql", "params", "plan")
+    exclude = ("updated_at",)
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+        from .authentication import forget_cached_user
+        from .instrumentation import install_db_instrumentation
+        from .slow_queries import install_slow_query_capture
+        from .tracing import install_tracing
+
+        connection_created.connect(install_db_instrumentation, dispatch_uid="core_db_instrumentation")
+        connection_created.connect(install_slow_query_capture, dispatch_uid="core_slow_query_capture")
+        connection_created.connect(install_tracing, dispatch_uid="core_tracing")
+        post_save.connect(forget_cached_user, sender=get_user_model(), dispatch_uid="core_forget_cached_user_on_save")
+        post_delete.connect(forget_cached_user, sender=get_user_model(), dispatch_uid="core_forget_cached_user_on_delete")
@@ -0,0 +1,128 @@
+"""
+JWT authentication without a ``core_user`` query per request.
+
+With a shared cache backend (file, redis) the user behind a token is kept
+in the cache for AUTH_USER_CACHE_TIMEOUT seconds and dropped when the user
+is saved or deleted; with the per-process locmem cache the timeout
+defaults to 0, as the other workers would not see the deletion.
+
+With AUTH_STATELESS_USER=True the user is built from the claims that
+``UserClaimsRefreshToken`` puts into the token (id, email, name, role,
+is_staff, is_active) and the database is not read at all. The refresh
+endpoint (``UserClaimsTokenRefreshSerializer``) reloads the user and
+stamps the claims again, so changes of those fields take effect with the
+next refresh, at the latest after ACCESS_TOKEN_LIFETIME.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .tracing import span
+
+User = get_user_model()
+
+# copied into the token by UserClaimsRefreshToken
+USER_CLAIMS = ("email", "full_name", "role", "is_staff", "is_active")
+# everything but the password hash
+CACHED_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != "password"]
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    """``post_save``/``post_delete`` receiver for the user model."""
+    cache.delete(user_cache_key(instance.pk))
+
+
+def _user_from_values(values):
+    """User instance loaded with ``values`` (attname -> value); the other fields are deferred."""
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+class UserClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the USER_CLAIMS of the user."""
+
+    @classmethod
+    def for_user(cls, user):
+        return super().for_user(user).stamp(user)
+
+    def stamp(self, user):
+        for claim in USER_CLAIMS:
+            self[claim] = getattr(user, claim)
+        return self
+
+
+class UserClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    ``api/auth/refresh/`` (SIMPLE_JWT["TOKEN_REFRESH_SERIALIZER"]): the new
+    access token and the rotated refresh token get the USER_CLAIMS of the
+    user as it is now, not the ones copied from the token at login.
+    """
+
+    token_class = UserClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        refresh.stamp(user)
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # token_blacklist is not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
+
+
+class TracedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        with span("authenticate", "auth"):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if settings.AUTH_STATELESS_USER and all(claim in validated_token for claim in USER_CLAIMS):
+            claims = {"id": User._meta.pk.to_python(user_id), **{claim: validated_token[claim] for claim in USER_CLAIMS}}
+            return self._check_active(_user_from_values(claims))
+
+        # revocation by password change needs the password hash
+        if not settings.AUTH_USER_CACHE_TIMEOUT or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            cache.set(key, [getattr(user, name) for name in CACHED_FIELDS], settings.AUTH_USER_CACHE_TIMEOUT)
+            return user
+        return self._check_active(_user_from_values(dict(zip(CACHED_FIELDS, values))))
+
+    @staticmethod
+    def _check_active(user):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,152 @@
+"""
+Bounded thread pools for the ASGI deployment (stimulus_aiu/asgi.py).
+
+Under ASGI Django runs every sync view in one shared thread per process, so
+a single DOCX render or XLSX export holds up all other requests of that
+process. ``pooled_view`` turns a DRF view into an async view that runs it
+in a named pool instead:
+
+* ``read`` — lists, details, meta and downloads, ASYNC_READ_THREADS threads;
+* ``render`` — DOCX/XLSX generation, RENDER_THREADS threads. When more than
+  RENDER_QUEUE_LIMIT renders are waiting the request is answered with 503
+  and ``Retry-After`` instead of queueing without bound.
+
+Both pools report their depth in the ``stimulus_background_queue_depth``
+gauge. Every pool thread keeps its own database connection, so the pool
+sizes also bound the number of connections per process.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import FileResponse, JsonResponse
+from django.urls import URLPattern
+
+from .instrumentation import measure
+from .metrics import observe_queue_depth
+from .tracing import span
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PoolFull(Exception):
+    pass
+
+
+class Pool:
+    def __init__(self, name, threads, queue_limit=None):
+        self.name = name
+        self.queue_limit = queue_limit
+        self.depth = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"{name}-pool")
+
+    async def run(self, func, *args, **kwargs):
+        """Run ``func`` in the pool with the caller's context variables (metrics, trace)."""
+        with self._lock:
+            if self.queue_limit is not None and self.depth >= self.queue_limit:
+                raise PoolFull(self.name)
+            self.depth += 1
+            observe_queue_depth(self.name, self.depth)
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, _with_connection_cleanup, func, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # released when the thread is done, not when the awaiting request is cancelled
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None):
+        with self._lock:
+            self.depth -= 1
+            observe_queue_depth(self.name, self.depth)
+
+
+def _with_connection_cleanup(func, *args, **kwargs):
+    # request_started/request_finished only close the connection of Django's own sync thread
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    with _pools_lock:
+        if name not in _pools:
+            if name == "render":
+                _pools[name] = Pool(name, settings.RENDER_THREADS, settings.RENDER_QUEUE_LIMIT)
+            else:
+                _pools[name] = Pool(name, settings.ASYNC_READ_THREADS)
+        return _pools[name]
+
+
+async def aiter_file(file, chunk_size=STREAM_CHUNK_SIZE):
+    """Read ``file`` chunk by chunk in a worker thread without blocking the event loop."""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(chunk_size):
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def _render(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    # serialize in the pool thread rather than in Django's shared sync thread; the
+    # middleware sees a rendered response, so the render time is recorded here
+    if hasattr(response, "render") and callable(response.render):
+        with measure("render"), span("render", "render"):
+            response.render()
+    return response
+
+
+def pooled_view(view, pool="read"):
+    """
+    Async version of a sync (DRF) view. Safe methods run in ``pool``; writes
+    keep Django's default thread-sensitive executor.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view)(request, *args, **kwargs)
+        try:
+            response = await get_pool(pool).run(_render, view, request, args, kwargs)
+        except PoolFull:
+            response = JsonResponse({"detail": "Сервер перегружен, повторите запрос позже."}, status=503)
+            response["Retry-After"] = "5"
+            return response
+
+        if isinstance(response, FileResponse) and response.file_to_stream is not None:
+            response.streaming_content = aiter_file(response.file_to_stream)
+        return response
+
+    return wrapper
+
+
+def pooled_urls(patterns, pools):
+    """
+    Copy of ``patterns`` where views whose URL name is in ``pools``
+    ({name: pool}) are replaced by their ``pooled_view``.
+    """
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern) and pattern.name in pools:
+            pattern = URLPattern(
+                pattern.pattern, pooled_view(pattern.callback, pools[pattern.name]), pattern.default_args, pattern.name,
+            )
+        result.append(pattern)
+    return result
@@ -0,0 +1,46 @@
+"""
+Read-replica routing, active when POSTGRES_REPLICA_HOST is set.
+
+ReadReplicaMiddleware marks read-only requests (list/retrieve GETs and the
+XLSX export); their reads go to the ``replica`` database, everything else
+and every write goes to ``default``. After a successful write the user is
+pinned to the primary for DB_PRIMARY_PIN_SECONDS by a cookie, so that
+reading back what was just saved does not hit a lagging replica.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+REPLICA = "replica"
+
+# viewset actions that only read
+REPLICA_ACTIONS = {"list", "retrieve", "export_xlsx"}
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def reading_from_replica():
+    return _read_from_replica.get()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if _read_from_replica.get() else None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
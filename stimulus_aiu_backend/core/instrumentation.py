@@ -0,0 +1,90 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .tracing import span
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings collected while one request is being handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_name = ""
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.sections = {}
+        self._open = set()
+
+    def add(self, section, seconds):
+        self.sections[section] = self.sections.get(section, 0.0) + seconds
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+
+def current_metrics():
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+@contextmanager
+def measure(section):
+    """
+    Add the wall time of the block to ``section`` of the current request.
+    Nested blocks of the same section (e.g. nested serializers) are counted once.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or section in metrics._open:
+        yield
+        return
+
+    metrics._open.add(section)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(section, time.perf_counter() - started)
+        metrics._open.discard(section)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+def install_db_instrumentation(sender, connection, **kwargs):
+    """``connection_created`` receiver: wrap every query of the connection."""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+class TimedSerializerMixin:
+    """
+    Count ``to_representation`` of DRF serializers as the ``serialize`` section
+    and trace it as a span per serialized object.
+    """
+
+    def to_representation(self, instance):
+        with measure("serialize"), span(f"{type(self).__name__}.to_representation", "serializer"):
+            return super().to_representation(instance)
@@ -0,0 +1,92 @@
+"""
+Prometheus metrics of the running app.
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR (see
+config/gunicorn.conf.py): every worker writes its samples there and
+``/metrics`` aggregates all of them.
+"""
+import os
+
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 2_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+REQUEST_LATENCY = Histogram(
+    "stimulus_request_duration_seconds",
+    "Request latency by view and action",
+    ["view", "method", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUEST_QUERIES = Histogram(
+    "stimulus_request_db_queries",
+    "SQL queries per request by view and action",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DOCUMENT_DURATION = Histogram(
+    "stimulus_document_render_seconds",
+    "DOCX/XLSX generation time",
+    ["kind"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+DOCUMENT_SIZE = Histogram(
+    "stimulus_document_size_bytes",
+    "Size of generated DOCX/XLSX files",
+    ["kind"],
+    buckets=SIZE_BUCKETS,
+)
+UPLOAD_SIZE = Histogram(
+    "stimulus_upload_size_bytes",
+    "Size of uploaded paper files",
+    buckets=SIZE_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "stimulus_background_queue_depth",
+    "Tasks waiting or running in background pools",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+
+
+def observe_request(view, method, status, seconds, queries):
+    if not settings.METRICS_ENABLED:
+        return
+    view = view or "unresolved"
+    REQUEST_LATENCY.labels(view=view, method=method, status=str(status)).observe(seconds)
+    REQUEST_QUERIES.labels(view=view).observe(queries)
+
+
+def observe_document(kind, seconds, size):
+    if not settings.METRICS_ENABLED:
+        return
+    DOCUMENT_DURATION.labels(kind=kind).observe(seconds)
+    DOCUMENT_SIZE.labels(kind=kind).observe(size)
+
+
+def observe_upload(size):
+    if settings.METRICS_ENABLED:
+        UPLOAD_SIZE.observe(size)
+
+
+def observe_queue_depth(queue, depth):
+    if settings.METRICS_ENABLED:
+        QUEUE_DEPTH.labels(queue=queue).set(depth)
+
+
+def render_metrics():
+    """Metrics in Prometheus text format: ``(body, content_type)``."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,294 @@
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+
+from .authentication import TracedJWTAuthentication
+from .db import REPLICA, REPLICA_ACTIONS, replica_reads
+from .instrumentation import collect_metrics, current_metrics
+from .metrics import observe_request
+from .profiling import StackSampler, write_profile
+from .tracing import current_trace, export_trace, span, start_trace
+
+logger = logging.getLogger("stimulus_aiu.requests")
+
+
+def resolve_view_name(request, view_func):
+    """``ApplicationViewSet.export_xlsx``-style name of the view handling the request."""
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    if view_class is None:
+        return getattr(view_func, "__name__", "unknown")
+
+    method = request.method.lower()
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method, method)}"
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Per-request SQL count, DB time, serializer time and render time.
+    Reported in the ``Server-Timing`` header and the ``stimulus_aiu.requests`` log
+    when REQUEST_INSTRUMENTATION=True.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # Slow-query capture and metrics also need the per-request context (view name, query count).
+        if not (settings.REQUEST_INSTRUMENTATION or settings.SLOW_QUERY_THRESHOLD_MS or settings.METRICS_ENABLED):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+            total = metrics.total_seconds
+        return self.finish(request, response, metrics, total)
+
+    async def __acall__(self, request):
+        with collect_metrics() as metrics:
+            response = await self.get_response(request)
+            total = metrics.total_seconds
+        return self.finish(request, response, metrics, total)
+
+    def finish(self, request, response, metrics, total):
+        observe_request(metrics.view_name, request.method, response.status_code, total, metrics.queries)
+        if settings.REQUEST_INSTRUMENTATION:
+            self.report(request, response, metrics, total)
+        return response
+
+    def report(self, request, response, metrics, total):
+        response["Server-Timing"] = self.server_timing(metrics, total)
+        logger.info(
+            "view=%s method=%s path=%s status=%s queries=%d db_ms=%.1f serialize_ms=%.1f render_ms=%.1f total_ms=%.1f",
+            metrics.view_name or "-",
+            request.method,
+            request.path,
+            response.status_code,
+            metrics.queries,
+            metrics.db_seconds * 1000,
+            metrics.sections.get("serialize", 0.0) * 1000,
+            metrics.sections.get("render", 0.0) * 1000,
+            total * 1000,
+            extra={
+                "view": metrics.view_name,
+                "queries": metrics.queries,
+                "db_ms": metrics.db_seconds * 1000,
+                "serialize_ms": metrics.sections.get("serialize", 0.0) * 1000,
+                "render_ms": metrics.sections.get("render", 0.0) * 1000,
+                "total_ms": total * 1000,
+            },
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view_name = resolve_view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        # DRF Response is rendered right after this hook; time it until the post-render callback.
+        # Views served from the ASGI pools come rendered and are timed there (core/concurrency.py).
+        metrics = current_metrics()
+        if metrics is not None and not response.is_rendered:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda r: metrics.add("render", time.perf_counter() - started))
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        parts = [
+            f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.queries} queries"',
+            f"serialize;dur={metrics.sections.get('serialize', 0.0) * 1000:.1f}",
+            f"render;dur={metrics.sections.get('render', 0.0) * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ]
+        return ", ".join(parts)
+
+
+class TracingMiddleware:
+    """
+    Nested spans of sampled requests (TRACING_ENABLED=True), exported by
+    ``core.tracing.export_trace`` to TRACING_DIR or stdout.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRACING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with start_trace(f"{request.method} {request.path}") as trace:
+            if trace is None:
+                return self.get_response(request)
+
+            started = time.perf_counter()
+            with span(f"{request.method} {request.path}", "request"):
+                response = self.get_response(request)
+            duration_ms = (time.perf_counter() - started) * 1000
+        return self.export(request, response, trace, duration_ms)
+
+    async def __acall__(self, request):
+        with start_trace(f"{request.method} {request.path}") as trace:
+            if trace is None:
+                return await self.get_response(request)
+
+            started = time.perf_counter()
+            with span(f"{request.method} {request.path}", "request"):
+                response = await self.get_response(request)
+            duration_ms = (time.perf_counter() - started) * 1000
+        return self.export(request, response, trace, duration_ms)
+
+    def export(self, request, response, trace, duration_ms):
+        try:
+            export_trace(
+                trace,
+                trace.view_name or request.path,
+                duration_ms,
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+            )
+        except OSError:
+            logger.exception("Could not export trace")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        trace = current_trace()
+        if trace is not None:
+            trace.view_name = resolve_view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        trace = current_trace()
+        if trace is not None and not response.is_rendered:
+            started = time.perf_counter_ns()
+            response.add_post_render_callback(
+                lambda r: trace.add("render", "render", started, time.perf_counter_ns(), {})
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Sampling profile of a whole request written to PROFILING_DIR
+    (PROFILING_ENABLED=True). A request is profiled when it sends
+    ``X-Profile: <PROFILING_TOKEN>``, when a request with the JWT of a staff
+    user adds ``?_profile=1``, or at random for PROFILING_SAMPLE_RATE of requests.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = self.trigger(request)
+        if reason is None:
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            filename = write_profile(sampler, getattr(request, "profiled_view_name", "") or request.path, duration_ms)
+        except OSError:
+            logger.exception("Could not write profile")
+            return response
+        if reason != "sample":
+            response["X-Profile-File"] = filename
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profiled_view_name = resolve_view_name(request, view_func)
+
+    @staticmethod
+    def trigger(request):
+        token = settings.PROFILING_TOKEN
+        if token and request.headers.get("X-Profile") == token:
+            return "header"
+        if request.GET.get("_profile") == "1" and ProfilingMiddleware.is_staff(request):
+            return "query"
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    @staticmethod
+    def is_staff(request):
+        """Whether the request carries the JWT of a staff user; checked before the sampler starts."""
+        try:
+            authenticated = TracedJWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
+
+
+class ReadReplicaMiddleware:
+    """
+    Route reads of read-only requests to the replica (core/db.py) and pin
+    the user to the primary for a while after a successful write.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    @staticmethod
+    def use_replica(request):
+        if request.method not in ("GET", "HEAD") or settings.DB_PRIMARY_PIN_COOKIE in request.COOKIES:
+            return False
+        try:
+            match = resolve(request.path_info, getattr(request, "urlconf", None))
+        except Resolver404:
+            return False
+        actions = getattr(match.func, "actions", None) or {}
+        return actions.get(request.method.lower()) in REPLICA_ACTIONS
+
+    @staticmethod
+    def pin(request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            response.set_cookie(
+                settings.DB_PRIMARY_PIN_COOKIE, "1",
+                max_age=settings.DB_PRIMARY_PIN_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
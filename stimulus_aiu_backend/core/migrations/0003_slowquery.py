@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:08
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_user_position_user_subdivision_user_telephone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('view', models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Представление')),
+                ('caller', models.CharField(blank=True, max_length=512, verbose_name='Место вызова')),
+                ('sql', models.TextField(verbose_name='SQL')),
+                ('params', models.TextField(blank=True, verbose_name='Параметры')),
+                ('duration_ms', models.FloatField(db_index=True, verbose_name='Длительность, мс')),
+                ('plan', models.TextField(blank=True, verbose_name='План EXPLAIN')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,10 +1,54 @@
+import os
+import threading
+import time
 import uuid
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
+
+from .tracing import span
+
+
+class TracedQuerySet(models.QuerySet):
+    """QuerySet that traces ``prefetch_related`` lookups as their own spans."""
+
+    def _prefetch_related_objects(self):
+        with span(f"prefetch {self.model.__name__}", "orm", lookups=[str(l) for l in self._prefetch_related_lookups]):
+            super()._prefetch_related_objects()
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = 0
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562, version 7): Unix time in milliseconds, a
+    12-bit fraction of the millisecond, then random bits; increasing within
+    the process. New keys land at the right edge of the btree indexes
+    instead of on random pages; existing version 4 keys stay valid.
+    """
+    global _uuid7_last
+    milliseconds, nanoseconds = divmod(time.time_ns(), 1_000_000)
+    fraction = nanoseconds * 4096 // 1_000_000
+    random_bits = int.from_bytes(os.urandom(8), "big") & (1 << 62) - 1
+    value = milliseconds << 80 | 0x7 << 76 | fraction << 64 | 0x2 << 62 | random_bits
+    with _uuid7_lock:
+        # same clock slot (or the clock went back): continue after the last key
+        if value <= _uuid7_last:
+            value = _uuid7_last + 1
+        _uuid7_last = value
+    return uuid.UUID(int=value)
+
+
+def trigram_index(field, name):
+    """GIN trigram index serving ``<field>__icontains``, i.e. UPPER(field) LIKE '%...%' (admin and API search)."""
+    return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
 
 
 class UUIDModel(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
 
     class Meta:
         abstract = True
@@ -98,6 +142,24 @@ class User(AbstractUser, UUIDModel, TimeStampedModel):
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
+        indexes = [trigram_index("email", "user_email_trgm"), trigram_index("full_name", "user_full_name_trgm")]
+
+    def __str__(self):
+        return f"{self.email} ({self.role})"
+
+
+class SlowQuery(UUIDModel, TimeStampedModel):
+    view = models.CharField(max_length=255, blank=True, db_index=True, verbose_name="Представление")
+    caller = models.CharField(max_length=512, blank=True, verbose_name="Место вызова")
+    sql = models.TextField(verbose_name="SQL")
+    params = models.TextField(blank=True, verbose_name="Параметры")
+    duration_ms = models.FloatField(db_index=True, verbose_name="Длительность, мс")
+    plan = models.TextField(blank=True, verbose_name="План EXPLAIN")
+
+    class Meta:
+        verbose_name = "Медленный запрос"
+        verbose_name_plural = "Медленные запросы"
+        ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.email} ({self.role})"
\ No newline at end of file
+        return f"{self.duration_ms:.0f} ms {self.view or self.caller}"
@@ -0,0 +1,38 @@
+"""
+JSON request bodies parsed with orjson (core/renderers.py for responses).
+
+orjson parses the UTF-8 bytes directly, without decoding the body into a
+str first, which matters for large bulk bodies. It turns integers outside
+64 bits into floats, so bodies with such long numbers (coauthor ids are
+UUIDs as numbers) go to DRF's parser instead.
+"""
+import io
+import re
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from .renderers import JSONRenderer, orjson
+
+# 19+ digits may be beyond the 64-bit range of orjson
+LONG_NUMBER = re.compile(rb"\d{19}")
+
+
+class JSONParser(parsers.JSONParser):
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        # orjson rejects NaN and Infinity, as the strict mode does
+        if orjson is None or not self.strict or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_NUMBER.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
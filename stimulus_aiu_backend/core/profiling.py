@@ -0,0 +1,65 @@
+"""
+Statistical profiler for single requests.
+
+A background thread samples the stack of the request thread every
+PROFILING_INTERVAL_MS and counts identical stacks. The result is written in
+the folded-stack format ("frame;frame;frame count") that flamegraph.pl,
+inferno and https://www.speedscope.app read directly.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+_APP_ROOT = str(settings.BASE_DIR)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = os.path.relpath(filename, _APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def write_profile(sampler, label, duration_ms):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    safe_label = "".join(c if c.isalnum() or c in "._-" else "_" for c in label)
+    filename = f"{datetime.now():%Y%m%dT%H%M%S_%f}_{safe_label}_{int(duration_ms)}ms.folded"
+    with open(os.path.join(settings.PROFILING_DIR, filename), "w", encoding="utf-8") as fh:
+        fh.write(sampler.folded())
+    return filename
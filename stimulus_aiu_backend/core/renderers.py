@@ -0,0 +1,135 @@
+"""
+JSON rendering with orjson, and streamed list responses.
+
+``JSONRenderer`` writes the same bytes as DRF's JSONRenderer (compact,
+UTF-8, U+2028/U+2029 escaped, datetimes through DRF's encoder) with orjson
+when it is installed. orjson does not support integers outside 64 bits
+(CoauthorSerializer.id is a UUID as a number): serializers return them as
+WideInt, which is written as a pre-encoded fragment. Other wide integers
+are found by walking the data again, which is much slower.
+
+Views with ``StreamingListMixin`` send GET lists longer than
+JSON_STREAM_CHUNK_ITEMS as a StreamingHttpResponse, encoded chunk by
+chunk: the first bytes leave before the whole list is encoded, and the
+complete JSON document is never held in memory.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import renderers, status
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder of DRF is used instead
+    orjson = None
+
+INT_MIN, INT_MAX = -(2 ** 63), 2 ** 64 - 1
+
+
+class WideInt(int):
+    """An integer that may not fit in 64 bits; the stdlib encoder writes it as any int."""
+
+
+# values _wide_ints leaves as they are without a call
+PLAIN = {str, float, bool, type(None)}
+
+
+def _wide_ints(value):
+    """``value`` with the integers orjson cannot encode replaced by fragments."""
+    if isinstance(value, dict):
+        return {key: item if type(item) in PLAIN else _wide_ints(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [item if type(item) in PLAIN else _wide_ints(item) for item in value]
+    if type(value) is int and not INT_MIN <= value <= INT_MAX:
+        return orjson.Fragment(str(value).encode())
+    return value
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    @property
+    def fast(self):
+        # the output orjson can reproduce; anything else goes to DRF
+        return orjson is not None and api_settings.COMPACT_JSON and api_settings.UNICODE_JSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not self.fast or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return self._encode(data, renderer_context)[0]
+
+    def iter_render(self, data, chunk_items, renderer_context=None):
+        """The rendered list ``data`` in pieces of ``chunk_items`` elements."""
+        wide = False
+        yield b"["
+        for start in range(0, len(data), chunk_items):
+            chunk = data[start:start + chunk_items]
+            if self.fast:
+                content, wide = self._encode(chunk, renderer_context, wide)
+            else:
+                content = super().render(chunk, renderer_context=renderer_context)
+            yield (b"," if start else b"") + content[1:-1]
+        yield b"]"
+
+    def _encode(self, data, renderer_context, wide=False):
+        """(bytes, whether ``data`` had wide integers) by orjson; DRF's own errors for what it cannot encode."""
+        default = self.encoder_class().default
+
+        def subclasses(value):
+            # what the stdlib encoder does with subclasses of the JSON types
+            if isinstance(value, int):
+                return orjson.Fragment(int.__repr__(value).encode())
+            if isinstance(value, str):
+                return str.__str__(value)
+            if isinstance(value, float):
+                return float(value)
+            if isinstance(value, dict):
+                return dict(value)
+            if isinstance(value, (list, tuple)):
+                return list(value)
+            return default(value)
+
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_SUBCLASS | orjson.OPT_NON_STR_KEYS
+        try:
+            content = orjson.dumps(_wide_ints(data) if wide else data, default=subclasses, option=options)
+        except orjson.JSONEncodeError:
+            if wide:
+                return super().render(data, renderer_context=renderer_context), wide
+            return self._encode(data, renderer_context, wide=True)
+        return content.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029"), wide
+
+
+async def _aiter(chunks):
+    step = sync_to_async(next, thread_sensitive=False)
+    while (chunk := await step(chunks, None)) is not None:
+        yield chunk
+
+
+class StreamingListMixin:
+    """Stream long GET list responses of a viewset (JSON_STREAMING)."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not (
+            settings.JSON_STREAMING
+            and request.method == "GET"
+            and isinstance(response, Response)
+            and response.status_code == status.HTTP_200_OK
+            and isinstance(response.data, list)
+            and len(response.data) > settings.JSON_STREAM_CHUNK_ITEMS
+            and isinstance(response.accepted_renderer, JSONRenderer)
+        ):
+            return response
+
+        renderer = response.accepted_renderer
+        chunks = renderer.iter_render(response.data, settings.JSON_STREAM_CHUNK_ITEMS, response.renderer_context)
+        # under ASGI a sync iterator would be read to the end before sending anything
+        streaming = StreamingHttpResponse(
+            _aiter(chunks) if settings.ASGI_MODE else chunks, content_type=renderer.media_type,
+        )
+        for header, value in response.items():
+            if header.lower() != "content-type":
+                streaming[header] = value
+        return streaming
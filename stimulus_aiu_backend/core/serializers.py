@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
+from .instrumentation import TimedSerializerMixin
+
 User = get_user_model()
 
 
-class MeSerializer(serializers.ModelSerializer):
+class MeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = (
@@ -0,0 +1,152 @@
+import logging
+import os
+import random
+import re
+import time
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .instrumentation import current_metrics
+
+logger = logging.getLogger("stimulus_aiu.slow_queries")
+
+# Запросы, которые выполняет сам перехватчик (EXPLAIN, INSERT записи), не перехватываются.
+_capturing = ContextVar("slow_query_capturing", default=False)
+
+MAX_PARAMS_LENGTH = 2000
+# записи старше SLOW_QUERY_RETENTION_DAYS удаляются не чаще раза в PRUNE_INTERVAL_SECONDS на процесс
+PRUNE_INTERVAL_SECONDS = 3600
+_last_pruned = None
+# SELECT, которые нельзя выполнять повторно под EXPLAIN ANALYZE: блокировки строк и функции с побочными эффектами.
+_NOT_REPEATABLE = re.compile(
+    r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b"
+    r"|\b(?:nextval|setval|pg_advisory\w*|pg_try_advisory\w*|pg_notify|pg_sleep\w*|txid_current)\s*\(",
+    re.IGNORECASE,
+)
+_APP_ROOT = str(settings.BASE_DIR)
+_OWN_FILES = (
+    __file__,
+    os.path.join(_APP_ROOT, "core", "instrumentation.py"),
+    os.path.join(_APP_ROOT, "core", "middleware.py"),
+)
+
+
+def _caller(metrics):
+    """
+    Innermost frame of project code that issued the query, prefixed with the
+    open request sections (e.g. ``[serialize]`` for queries run by serializers).
+    """
+    location = ""
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(_APP_ROOT) and filename not in _OWN_FILES and "site-packages" not in filename:
+            location = f"{os.path.relpath(filename, _APP_ROOT)}:{frame.lineno} in {frame.name}"
+            break
+    if metrics is not None and metrics._open:
+        location = f"[{','.join(sorted(metrics._open))}] {location}".strip()
+    return location
+
+
+def _explain(connection, sql, params):
+    if connection.vendor != "postgresql" or not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        return ""
+    # a locking or volatile statement is only planned: running it again would lock rows twice
+    options = "" if _NOT_REPEATABLE.search(sql) else "(ANALYZE, BUFFERS) "
+    try:
+        # Savepoint: a failed EXPLAIN must not abort the caller's transaction.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {options}{sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+    except Exception as exc:
+        return f"EXPLAIN failed: {exc}"
+
+
+def _store(alias, **fields):
+    """
+    Insert a SlowQuery row outside the caller's transaction, so that the
+    record stays when that transaction rolls back.
+    """
+    from .models import SlowQuery
+
+    current = connections[alias]
+    if not current.in_atomic_block:
+        SlowQuery.objects.using(alias).create(**fields)
+        _prune(alias)
+        return
+    own = connections.create_connection(alias)
+    connections[alias] = own
+    try:
+        SlowQuery.objects.using(alias).create(**fields)
+        _prune(alias)
+    finally:
+        connections[alias] = current
+        own.close()
+
+
+def _prune(alias):
+    """Delete the records older than SLOW_QUERY_RETENTION_DAYS (0 keeps them all)."""
+    global _last_pruned
+    from .models import SlowQuery
+
+    days = settings.SLOW_QUERY_RETENTION_DAYS
+    now = time.monotonic()
+    if not days or (_last_pruned is not None and now - _last_pruned < PRUNE_INTERVAL_SECONDS):
+        return
+    _last_pruned = now
+    SlowQuery.objects.using(alias).filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+
+
+def _record(connection, sql, params, duration_ms):
+    from .models import SlowQuery
+
+    metrics = current_metrics()
+    view_name = metrics.view_name if metrics is not None else ""
+    caller = _caller(metrics)
+    plan = _explain(connection, sql, params)
+
+    logger.warning("slow query %.1f ms view=%s caller=%s sql=%s", duration_ms, view_name or "-", caller, sql[:500])
+    # a query on the read replica is still recorded in the primary
+    alias = router.db_for_write(SlowQuery)
+    try:
+        _store(
+            alias,
+            view=view_name,
+            caller=caller,
+            sql=sql,
+            params=repr(params)[:MAX_PARAMS_LENGTH],
+            duration_ms=duration_ms,
+            plan=plan,
+        )
+    except Exception:
+        logger.exception("Could not store slow query")
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or _capturing.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    if duration_ms >= threshold and not many:
+        token = _capturing.set(True)
+        try:
+            _record(context["connection"], sql, params, duration_ms)
+        finally:
+            _capturing.reset(token)
+    return result
+
+
+def install_slow_query_capture(sender, connection, **kwargs):
+    """``connection_created`` receiver."""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
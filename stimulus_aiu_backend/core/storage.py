@@ -0,0 +1,46 @@
+"""
+S3-protocol storage (AWS S3, MinIO) used when STORAGE_BACKEND=s3.
+
+Files are written with boto3 managed transfers, which switch to multipart
+upload above ``transfer_config.multipart_threshold``. ``url()`` returns a
+short-lived presigned GET URL; with ``public_endpoint_url`` it is signed
+for the address browsers use (e.g. MinIO published on the host) instead of
+the one the backend talks to inside the docker network.
+"""
+import boto3
+from botocore.client import Config
+from django.utils.functional import cached_property
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+
+class PresignedS3Storage(S3Storage):
+    # the download endpoint redirects to url() instead of sending the file
+    supports_presigned_urls = True
+
+    def get_default_settings(self):
+        return {**super().get_default_settings(), "public_endpoint_url": None}
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if not self.public_endpoint_url:
+            return super().url(name, parameters=parameters, expire=expire, http_method=http_method)
+
+        return self.public_client.generate_presigned_url(
+            "get_object",
+            Params={**(parameters or {}), "Bucket": self.bucket_name, "Key": self._normalize_name(clean_name(name))},
+            ExpiresIn=expire or self.querystring_expire,
+            HttpMethod=http_method,
+        )
+
+    @cached_property
+    def public_client(self):
+        """Client signing for ``public_endpoint_url``; built once, url() runs for every paper of a list."""
+        return boto3.session.Session().client(
+            "s3",
+            endpoint_url=self.public_endpoint_url,
+            region_name=self.region_name,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            aws_session_token=self.security_token,
+            config=Config(signature_version=self.signature_version or "s3v4", s3={"addressing_style": "path"}),
+        )
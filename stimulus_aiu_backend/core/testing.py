@@ -0,0 +1,73 @@
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Множитель временных бюджетов для медленных CI-машин (PERF_BUDGET_SCALE=3).
+BUDGET_SCALE = float(os.getenv("PERF_BUDGET_SCALE", "1"))
+
+# Кэши ответов и пользователей, включённые, как в продакшене с общим CACHE_BACKEND; тесты идут
+# в одном процессе, поэтому locmem здесь ведёт себя как общий кэш.
+SHARED_CACHE_SETTINGS = {"RESPONSE_CACHE_TIMEOUT": 300, "AUTH_USER_CACHE_TIMEOUT": 60}
+
+
+def _slowest_queries(captured, limit):
+    queries = sorted(captured, key=lambda q: float(q.get("time") or 0), reverse=True)
+    lines = []
+    for q in queries[:limit]:
+        lines.append(f"  {float(q.get('time') or 0) * 1000:8.2f} ms  {q['sql']}")
+    return "\n".join(lines)
+
+
+class QueryBudgetMixin:
+    """
+    Assertions for query-count and latency budgets in TestCase classes.
+    On failure the message lists the slowest captured queries.
+    """
+
+    slow_query_report_size = 10
+
+    @contextmanager
+    def assertBudget(self, max_queries, max_seconds, label=""):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            yield captured
+            elapsed = time.perf_counter() - started
+
+        limit_seconds = max_seconds * BUDGET_SCALE
+        problems = []
+        if len(captured) > max_queries:
+            problems.append(f"{len(captured)} queries > budget {max_queries}")
+        if elapsed > limit_seconds:
+            problems.append(f"{elapsed * 1000:.0f} ms > budget {limit_seconds * 1000:.0f} ms")
+        if problems:
+            self.fail(
+                f"{label}: {'; '.join(problems)}\n"
+                f"Slowest queries:\n{_slowest_queries(captured, self.slow_query_report_size)}"
+            )
+
+    def assertConstantQueries(self, call, grow, label=""):
+        """
+        Run ``call`` before and after ``grow`` adds more rows; the number
+        of queries must not depend on the number of rows (no N+1).
+        """
+        # both runs take the uncached path (response and user caches)
+        cache.clear()
+        with CaptureQueriesContext(connection) as before:
+            call()
+        grow()
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            call()
+
+        if len(after) != len(before):
+            extra = Counter(q["sql"] for q in after) - Counter(q["sql"] for q in before)
+            self.fail(
+                f"{label}: query count grows with rows ({len(before)} -> {len(after)}).\n"
+                "Extra queries:\n"
+                + "\n".join(f"  x{n}  {sql}" for sql, n in extra.most_common(self.slow_query_report_size))
+            )
@@ -1,3 +1,571 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+from django.test import (
+    AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.utils.translation import gettext_lazy
+from rest_framework import renderers
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from compensations.meta import MetaFacultiesView
+from compensations.models import Application
+
+from . import concurrency, slow_queries
+from .concurrency import pooled_view
+from .authentication import UserClaimsRefreshToken, user_cache_key
+from .db import ReplicaRouter
+from .instrumentation import collect_metrics
+from .middleware import ReadReplicaMiddleware
+from .models import User, SlowQuery, uuid7
+from .parsers import JSONParser
+from .renderers import JSONRenderer, WideInt
+from .testing import SHARED_CACHE_SETTINGS, QueryBudgetMixin
+
+
+class AuthAndMetaBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="user@example.com", password="password123", full_name="Иванов")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def authorize(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_login(self):
+        with self.assertBudget(1, 1.0, label="POST /api/auth/login/"):
+            response = self.client.post(
+                "/api/auth/login/", {"email": "user@example.com", "password": "password123"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh(self):
+        refresh = RefreshToken.for_user(self.user)
+        with self.assertBudget(1, 0.5, label="POST /api/auth/refresh/"):
+            response = self.client.post("/api/auth/refresh/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        data = {
+            "email": "new@example.com",
+            "password": "password123",
+            "full_name": "Новый",
+            "position": "Доцент",
+            "subdivision": "ВШИТИ",
+            "telephone": "+7",
+        }
+        with self.assertBudget(2, 1.0, label="POST /api/auth/register/"):
+            response = self.client.post("/api/auth/register/", data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_me(self):
+        self.authorize()
+        with self.assertBudget(1, 0.5, label="GET /api/auth/me/"):
+            self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        with self.assertBudget(2, 0.5, label="PATCH /api/auth/me/"):
+            response = self.client.patch("/api/auth/me/", {"position": "Профессор"}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_meta(self):
+        self.authorize()
+        for url in ("/api/meta/faculties/", "/api/meta/indexation/", "/api/meta/report_years/"):
+            with self.subTest(url=url), self.assertBudget(1, 0.5, label=f"GET {url}"):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(REQUEST_INSTRUMENTATION=True)
+class RequestInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin)}")
+
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs("stimulus_aiu.requests", level="INFO") as logs:
+            response = self.client.get("/api/applications/export_xlsx/")
+
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "serialize;dur=", "render;dur=", "total;dur="):
+            self.assertIn(metric, timing)
+        record = logs.records[0]
+        self.assertEqual(record.view, "ApplicationViewSet.export_xlsx")
+        self.assertGreater(record.queries, 0)
+        self.assertGreater(record.render_ms, 0)
+
+    def test_serializer_time_is_reported(self):
+        with self.assertLogs("stimulus_aiu.requests", level="INFO") as logs:
+            self.client.get("/api/auth/me/")
+        self.assertIn("view=MeView.get", logs.output[0])
+        self.assertGreater(logs.records[0].serialize_ms, 0)
+
+
+class SlowQueryCaptureTests(TransactionTestCase):
+    capture = override_settings(SLOW_QUERY_THRESHOLD_MS=0.001, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1.0)
+
+    def test_slow_select_is_stored_with_plan(self):
+        admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+        # a row to read, so that the plan reports buffers even on a freshly truncated table
+        Application.objects.create(owner=admin)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}")
+
+        with self.capture, self.assertLogs("stimulus_aiu.slow_queries", level="WARNING"):
+            self.assertEqual(client.get("/api/applications/?search=admin").status_code, 200)
+
+        captured = SlowQuery.objects.filter(view="ApplicationViewSet.list", sql__contains="compensations_application")
+        self.assertTrue(captured.exists())
+        query = captured.first()
+        self.assertIn("Buffers", query.plan)
+        self.assertIn("%admin%", query.params)
+        self.assertNotIn("core/middleware.py", query.caller)
+        # the capture's own INSERT/EXPLAIN statements are not captured again
+        self.assertFalse(SlowQuery.objects.filter(sql__startswith='INSERT INTO "core_slowquery"').exists())
+        self.assertFalse(SlowQuery.objects.filter(sql__startswith="EXPLAIN").exists())
+
+    def test_locking_select_is_planned_without_analyze(self):
+        admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+        Application.objects.create(owner=admin)
+
+        with self.capture, self.assertLogs("stimulus_aiu.slow_queries", level="WARNING"), transaction.atomic():
+            list(Application.objects.select_for_update(skip_locked=True))
+
+        query = SlowQuery.objects.get(sql__contains="SKIP LOCKED")
+        self.assertIn("LockRows", query.plan)
+        self.assertNotIn("actual time", query.plan)
+
+    def test_record_outlives_rolled_back_transaction(self):
+        class Rollback(Exception):
+            pass
+
+        with self.capture, self.assertLogs("stimulus_aiu.slow_queries", level="WARNING"):
+            with self.assertRaises(Rollback), transaction.atomic():
+                list(Application.objects.filter(faculty="rolled-back"))
+                raise Rollback
+
+        self.assertTrue(SlowQuery.objects.filter(params__contains="rolled-back").exists())
+
+    def test_old_records_are_pruned(self):
+        old = SlowQuery.objects.create(sql="SELECT 1", duration_ms=500)
+        SlowQuery.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=31))
+        recent = SlowQuery.objects.create(sql="SELECT 2", duration_ms=500)
+
+        with mock.patch.object(slow_queries, "_last_pruned", None), self.capture:
+            with self.assertLogs("stimulus_aiu.slow_queries", level="WARNING"):
+                list(Application.objects.filter(faculty="pruned"))
+            self.assertFalse(SlowQuery.objects.filter(pk=old.pk).exists())
+            self.assertTrue(SlowQuery.objects.filter(pk=recent.pk).exists())
+
+            # at most once per PRUNE_INTERVAL_SECONDS
+            SlowQuery.objects.filter(pk=recent.pk).update(created_at=timezone.now() - timedelta(days=31))
+            with self.assertLogs("stimulus_aiu.slow_queries", level="WARNING"):
+                list(Application.objects.filter(faculty="pruned"))
+            self.assertTrue(SlowQuery.objects.filter(pk=recent.pk).exists())
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="scrape-token")
+class MetricsEndpointTests(TestCase):
+    def test_metrics_in_prometheus_format(self):
+        admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(admin)}")
+        self.assertEqual(client.get("/api/applications/export_xlsx/").status_code, 200)
+
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'stimulus_request_duration_seconds_count{method="GET",status="200",view="ApplicationViewSet.export_xlsx"}',
+            body,
+        )
+        self.assertIn('stimulus_document_size_bytes_count{kind="xlsx"}', body)
+        self.assertIn('stimulus_request_db_queries_bucket{le="1.0",view="ApplicationViewSet.export_xlsx"}', body)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_no_token_is_not_public_by_default(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        with override_settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class TracingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from compensations.tests import seed_applications
+
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+        cls.app = seed_applications(cls.admin, count=2)[0]
+
+    def setUp(self):
+        self.trace_dir = tempfile.mkdtemp(prefix="stimulus_traces_")
+        self.addCleanup(shutil.rmtree, self.trace_dir, ignore_errors=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin)}")
+
+    def load(self, url):
+        with override_settings(TRACING_ENABLED=True, TRACING_DIR=self.trace_dir):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        [filename] = os.listdir(self.trace_dir)
+        path = os.path.join(self.trace_dir, filename)
+        with open(path, encoding="utf-8") as fh:
+            trace = json.load(fh)
+        os.remove(path)
+        return filename, {event["name"] for event in trace["traceEvents"]}
+
+    def test_list_spans(self):
+        filename, names = self.load("/api/applications/")
+        self.assertIn("ApplicationViewSet.list", filename)
+        for name in ("authenticate", "ApplicationViewSet.get_queryset", "values Application",
+                     "represent Application", "represent Coauthor", "sql", "render"):
+            self.assertIn(name, names)
+
+        with override_settings(VALUES_READ_PATH=False, RESPONSE_CACHE_TIMEOUT=0):
+            _, names = self.load("/api/applications/")
+        for name in ("prefetch Application", "ApplicationSerializer.to_representation",
+                     "CoauthorSerializer.to_representation"):
+            self.assertIn(name, names)
+
+    def test_document_spans(self):
+        _, names = self.load(f"/api/applications/{self.app.id}/docx/")
+        for name in ("docx.load_papers", "docx.render_paper", "docx.template_render", "docx.merge", "docx.save"):
+            self.assertIn(name, names)
+
+        _, names = self.load("/api/applications/export_xlsx/")
+        self.assertIn("xlsx.application", names)
+        self.assertIn("xlsx.save", names)
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(email="admin@example.com", password="password123")
+        cls.researcher = User.objects.create_user(email="user@example.com", password="password123")
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp(prefix="stimulus_profiles_")
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        self.settings_override = override_settings(
+            PROFILING_ENABLED=True, PROFILING_TOKEN="secret", PROFILING_DIR=self.profile_dir, PROFILING_INTERVAL_MS=1,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def test_admin_query_flag_writes_folded_stacks(self):
+        response = self.client_for(self.admin).get("/api/applications/export_xlsx/?_profile=1")
+        filename = response["X-Profile-File"]
+        self.assertIn("ApplicationViewSet.export_xlsx", filename)
+        self.assertTrue(filename.endswith("ms.folded"))
+        with open(os.path.join(self.profile_dir, filename), encoding="utf-8") as fh:
+            first_line = fh.readline()
+        stack, count = first_line.rsplit(" ", 1)
+        self.assertIn(";", stack)
+        self.assertGreater(int(count), 0)
+
+    def test_query_flag_is_ignored_for_researchers(self):
+        with mock.patch("core.middleware.StackSampler") as sampler:
+            response = self.client_for(self.researcher).get("/api/applications/?_profile=1")
+            APIClient().get("/api/applications/?_profile=1")
+        # nothing is sampled for researchers and anonymous callers
+        sampler.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-File", response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_header_with_token(self):
+        response = self.client_for(self.researcher).get("/api/meta/faculties/", HTTP_X_PROFILE="secret")
+        self.assertIn("MetaFacultiesView.get", response["X-Profile-File"])
+        response = self.client_for(self.researcher).get("/api/meta/faculties/", HTTP_X_PROFILE="wrong")
+        self.assertNotIn("X-Profile-File", response)
+
+
+class PooledViewTests(SimpleTestCase):
+    """core.concurrency: sync views served from the ASGI thread pools."""
+
+    def request(self, path="/api/meta/faculties/"):
+        request = AsyncRequestFactory().get(path)
+        force_authenticate(request, user=User(email="user@example.com"))
+        return request
+
+    def test_view_runs_rendered_in_pool_thread(self):
+        threads = []
+
+        @api_view(["GET"])
+        @permission_classes([AllowAny])
+        def view(request):
+            threads.append(threading.current_thread().name)
+            return Response({"ok": True})
+
+        response = async_to_sync(pooled_view(view))(self.request())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_rendered)
+        self.assertEqual(json.loads(response.content), {"ok": True})
+        self.assertTrue(threads[0].startswith("read-pool"))
+
+    def test_render_is_timed_in_pool_thread(self):
+        class SlowRenderer(renderers.JSONRenderer):
+            def render(self, *args, **kwargs):
+                time.sleep(0.02)
+                return super().render(*args, **kwargs)
+
+        @api_view(["GET"])
+        @permission_classes([AllowAny])
+        @renderer_classes([SlowRenderer])
+        def view(request):
+            return Response({"ok": True})
+
+        with collect_metrics() as metrics:
+            async_to_sync(pooled_view(view))(self.request())
+        self.assertGreaterEqual(metrics.sections["render"], 0.02)
+
+    def test_cancelled_request_stays_counted_until_its_thread_ends(self):
+        pool = concurrency.Pool("render", 1, queue_limit=5)
+        running, finish = threading.Event(), threading.Event()
+
+        def work():
+            running.set()
+            finish.wait(5)
+
+        async def cancel_while_running():
+            task = asyncio.ensure_future(pool.run(work))
+            await asyncio.get_running_loop().run_in_executor(None, running.wait, 5)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            return pool.depth
+
+        self.assertEqual(async_to_sync(cancel_while_running)(), 1)
+        finish.set()
+        pool._executor.shutdown(wait=True)
+        self.assertEqual(pool.depth, 0)
+
+    def test_full_render_queue_answers_503(self):
+        view = pooled_view(MetaFacultiesView.as_view(), "render")
+        with mock.patch.dict(concurrency._pools, {"render": concurrency.Pool("render", 1, queue_limit=0)}):
+            response = async_to_sync(view)(self.request())
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+
+    def test_files_are_streamed_asynchronously(self):
+        path = os.path.join(tempfile.mkdtemp(prefix="stimulus_stream_"), "paper.pdf")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        content = b"%PDF-1.4\n" + os.urandom(3 * concurrency.STREAM_CHUNK_SIZE)
+        with open(path, "wb") as fh:
+            fh.write(content)
+
+        response = async_to_sync(pooled_view(lambda request: FileResponse(open(path, "rb"))))(self.request())
+
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(response["Content-Length"], str(len(content)))
+        self.assertEqual(async_to_sync(consume)(), content)
+
+
+@override_settings(REQUEST_INSTRUMENTATION=True)
+class AsyncMiddlewareTests(TestCase):
+    def test_instrumentation_under_asgi(self):
+        user = User.objects.create_user(email="user@example.com", password="password123")
+        with self.assertLogs("stimulus_aiu.requests", level="INFO") as logs:
+            response = async_to_sync(AsyncClient().get)(
+                "/api/meta/faculties/", headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+            )
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertEqual(logs.records[0].view, "MetaFacultiesView.get")
+        self.assertEqual(logs.records[0].queries, 1)
+
+
+class ReadReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        replica = mock.patch.dict(settings.DATABASES, {"replica": {}})
+        replica.start()
+        self.addCleanup(replica.stop)
+        self.routed = []
+        self.middleware = ReadReplicaMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.routed.append(ReplicaRouter().db_for_read(User) or "default")
+        return HttpResponse(status=201 if request.method == "POST" else 200)
+
+    def test_read_only_actions_use_replica(self):
+        factory = RequestFactory()
+        for path in ("/api/applications/", "/api/papers/", "/api/applications/export_xlsx/"):
+            self.middleware(factory.get(path))
+        self.middleware(factory.get("/api/auth/me/"))
+        self.assertEqual(self.routed, ["replica", "replica", "replica", "default"])
+        # outside a request reads go to the primary
+        self.assertIsNone(ReplicaRouter().db_for_read(User))
+
+    def test_write_pins_user_to_primary(self):
+        factory = RequestFactory()
+        response = self.middleware(factory.post("/api/applications/"))
+        self.assertEqual(response.cookies[settings.DB_PRIMARY_PIN_COOKIE]["max-age"], settings.DB_PRIMARY_PIN_SECONDS)
+
+        request = factory.get("/api/applications/")
+        request.COOKIES[settings.DB_PRIMARY_PIN_COOKIE] = "1"
+        self.middleware(request)
+        self.assertEqual(self.routed, ["default", "default"])
+
+    def test_replica_is_never_migrated(self):
+        self.assertIs(ReplicaRouter().allow_migrate("replica", "compensations"), False)
+        self.assertIsNone(ReplicaRouter().allow_migrate("default", "compensations"))
+
+
+@override_settings(**SHARED_CACHE_SETTINGS)
+class UserResolutionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@example.com", password="password123", full_name="Иванов", position="Доцент"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_cached_user_costs_no_query(self):
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.json()["position"], "Доцент")
+
+    def test_save_and_deactivation_drop_cached_user(self):
+        self.client.get("/api/auth/me/")
+        self.user.position = "Профессор"
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get("/api/auth/me/").json()["position"], "Профессор")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/me/").status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_disabled_cache_loads_user_every_time(self):
+        self.client.get("/api/auth/me/")
+        with self.assertNumQueries(1):
+            self.client.get("/api/auth/me/")
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    @override_settings(AUTH_STATELESS_USER=True)
+    def test_stateless_user_from_token_claims(self):
+        access = UserClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.client.get("/api/meta/faculties/")
+        # meta is cached, so the request reads nothing at all
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/meta/faculties/").status_code, 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        # profile fields outside the token are loaded by the view itself
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.json()["position"], "Доцент")
+
+    @override_settings(AUTH_STATELESS_USER=True)
+    def test_refresh_stamps_current_claims(self):
+        self.user.is_staff = True
+        self.user.save()
+        refresh = str(UserClaimsRefreshToken.for_user(self.user))
+        self.user.is_staff = False
+        self.user.save()
+
+        response = APIClient().post("/api/auth/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, 200)
+        tokens = response.json()
+        for token in (AccessToken(tokens["access"]), UserClaimsRefreshToken(tokens["refresh"])):
+            self.assertFalse(token["is_staff"])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get("/api/applications/review_queue/").status_code, 403)
+
+        self.user.is_active = False
+        self.user.save()
+        response = APIClient().post("/api/auth/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class UUID7Tests(SimpleTestCase):
+    def test_keys_are_version_7_and_time_ordered(self):
+        keys = [uuid7() for _ in range(1000)]
+        self.assertEqual({key.version for key in keys}, {7})
+        self.assertEqual({key.variant for key in keys}, {uuid.RFC_4122})
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_models_use_uuid7(self):
+        self.assertEqual(User().id.version, 7)
+
+
+class JSONRenderingTests(SimpleTestCase):
+    rows = [
+        {
+            "id": uuid7().int,
+            "key": uuid7(),
+            "at": datetime(2025, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "title": "Статья «журнал»",
+            "label": gettext_lazy("Черновик"),
+            "counts": {1: 2, "n/a": None},
+            "flags": (True, False),
+            "wide": [WideInt(uuid7().int), WideInt(3)],
+            "ordered": OrderedDict(status="draft", html=mark_safe("<b>Да</b>")),
+        },
+        {"id": -5, "key": None, "at": None, "title": "", "label": "", "counts": {}, "flags": ()},
+        {"id": 2 ** 64, "key": None, "at": None, "title": "x", "label": "", "counts": {}, "flags": ()},
+    ]
+
+    def test_same_bytes_as_drf(self):
+        expected = renderers.JSONRenderer().render(self.rows)
+        self.assertEqual(JSONRenderer().render(self.rows), expected)
+        self.assertEqual(JSONRenderer().render(self.rows[1]), renderers.JSONRenderer().render(self.rows[1]))
+        for chunk_items in (1, 2, 3, 5):
+            with self.subTest(chunk_items=chunk_items):
+                self.assertEqual(b"".join(JSONRenderer().iter_render(self.rows, chunk_items)), expected)
+
+    def test_parser_keeps_wide_integers(self):
+        body = JSONRenderer().render(self.rows[2:] + [{"id": uuid7().int, "n": 1.5}])
+        self.assertEqual(JSONParser().parse(io.BytesIO(body)), json.loads(body))
+        self.assertEqual(JSONParser().parse(io.BytesIO(b'{"ids": [1, 2], "t": "\xd0\xb0"}')), {"ids": [1, 2], "t": "а"})
+        for body in (b"", b"{", b'{"n": NaN}'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                JSONParser().parse(io.BytesIO(body))
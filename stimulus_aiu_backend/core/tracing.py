@@ -0,0 +1,119 @@
+"""
+Nested spans of a request in Chrome Trace Event format.
+
+Traces open offline in https://ui.perfetto.dev, chrome://tracing or
+speedscope. ``span()`` is a no-op outside a traced request, so it can stay
+in hot code paths.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.conf import settings
+
+_current_trace = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    def __init__(self, name, max_spans):
+        self.name = name
+        self.max_spans = max_spans
+        self.events = []
+        self.dropped = 0
+        self.view_name = ""
+        self.pid = os.getpid()
+        self.base_ns = time.perf_counter_ns()
+
+    def add(self, name, category, start_ns, end_ns, args):
+        if len(self.events) >= self.max_spans:
+            self.dropped += 1
+            return
+        self.events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_ns - self.base_ns) / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": self.pid,
+            "tid": threading.get_native_id(),
+            "args": args,
+        })
+
+    def as_json(self, **metadata):
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"name": self.name, "dropped_spans": self.dropped, **metadata},
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, category="app", **args):
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, category, started, time.perf_counter_ns(), args)
+
+
+@contextmanager
+def start_trace(name):
+    """Trace the block if tracing is enabled and the request is sampled; yields the trace or None."""
+    if not settings.TRACING_ENABLED or random.random() >= settings.TRACING_SAMPLE_RATE:
+        yield None
+        return
+
+    trace = Trace(name, settings.TRACING_MAX_SPANS)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def export_trace(trace, label, duration_ms, **metadata):
+    payload = trace.as_json(label=label, duration_ms=round(duration_ms, 1), **metadata)
+
+    if settings.TRACING_EXPORTER == "stdout":
+        sys.stdout.write(json.dumps(payload, default=str) + "\n")
+        sys.stdout.flush()
+        return None
+
+    os.makedirs(settings.TRACING_DIR, exist_ok=True)
+    safe_label = "".join(c if c.isalnum() or c in "._-" else "_" for c in label)
+    filename = (
+        f"{datetime.now():%Y%m%dT%H%M%S}_{safe_label}_{int(duration_ms)}ms_{uuid.uuid4().hex[:8]}.trace.json"
+    )
+    path = os.path.join(settings.TRACING_DIR, filename)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, default=str)
+    return path
+
+
+def tracing_execute_wrapper(execute, sql, params, many, context):
+    if _current_trace.get() is None:
+        return execute(sql, params, many, context)
+    with span("sql", "db", sql=sql[:1000], many=many):
+        return execute(sql, params, many, context)
+
+
+def install_tracing(sender, connection, **kwargs):
+    """``connection_created`` receiver."""
+    if tracing_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(tracing_execute_wrapper)
@@ -1,17 +1,21 @@
+import hmac
+
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.middleware.csrf import get_token
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, Http404
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
 from rest_framework import serializers
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from .authentication import UserClaimsRefreshToken
+from .metrics import render_metrics
 from .serializers import MeSerializer, UserSerializer
 
 User = get_user_model()
@@ -22,7 +26,11 @@ class MeView(generics.RetrieveUpdateAPIView):
     serializer_class = MeSerializer
 
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        # AUTH_STATELESS_USER: only the token claims are loaded
+        if user.get_deferred_fields() & set(MeSerializer.Meta.fields):
+            user = User.objects.get(pk=user.pk)
+        return user
 
 
 class RegistrationView(generics.CreateAPIView):
@@ -46,7 +54,7 @@ class CustomTokenObtainPairView(APIView):
 
         user = authenticate(request, email=email, password=password)
         if user and user.is_active:
-            refresh = RefreshToken.for_user(user)
+            refresh = UserClaimsRefreshToken.for_user(user)
             return Response({
                 "refresh": str(refresh),
                 "access": str(refresh.access_token),
@@ -56,4 +64,18 @@ class CustomTokenObtainPairView(APIView):
         return Response(
             {"detail": "Неверные учетные данные."},
             status=status.HTTP_401_UNAUTHORIZED
-        )
\ No newline at end of file
+        )
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN; without a token only with METRICS_PUBLIC=True."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.METRICS_PUBLIC:
+            raise Http404
+    elif not hmac.compare_digest(request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()):
+        return HttpResponse(status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
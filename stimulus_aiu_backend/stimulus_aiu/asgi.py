@@ -2,6 +2,7 @@
 ASGI config for stimulus_aiu project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by hypercorn: ``hypercorn --config config/hypercorn.toml stimulus_aiu.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +13,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stimulus_aiu.settings')
+# read endpoints and document rendering run in bounded thread pools (core/concurrency.py)
+os.environ.setdefault('ASGI_MODE', 'True')
 
 application = get_asgi_application()
@@ -33,6 +33,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestInstrumentationMiddleware",
+    "core.middleware.TracingMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.ReadReplicaMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -62,6 +66,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "stimulus_aiu.wsgi.application"
+ASGI_APPLICATION = "stimulus_aiu.asgi.application"
 
 DATABASES = {
     "default": {
@@ -74,6 +79,37 @@ DATABASES = {
     }
 }
 
+# Пул соединений psycopg (DB_POOL=True, по умолчанию): соединения переиспользуются между запросами.
+# Без пула — постоянные соединения на DB_CONN_MAX_AGE секунд. В обоих случаях соединение проверяется
+# перед использованием (CONN_HEALTH_CHECKS). Пул создаётся на процесс: workers × DB_POOL_MAX_SIZE ≤ max_connections.
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+DB_POOL = os.getenv("DB_POOL", "True") == "True"
+if DB_POOL:
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "12")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+
+# Необязательная реплика для чтения: списки, карточки и выгрузка XLSX читаются с неё
+# (core/db.py), записи и запросы сразу после записи (cookie DB_PRIMARY_PIN_COOKIE) — с основной БД.
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.db.ReplicaRouter"]
+# сколько секунд после записи запросы пользователя идут в основную БД (задержка репликации)
+DB_PRIMARY_PIN_SECONDS = int(os.getenv("DB_PRIMARY_PIN_SECONDS", "10"))
+DB_PRIMARY_PIN_COOKIE = "db_primary"
+
 AUTH_PASSWORD_VALIDATORS = [
     { "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator" },
     { "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator" },
@@ -92,6 +128,45 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/stimulus_media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    # файлы публикаций хранятся один раз под SHA-256 содержимого (compensations/storage.py)
+    "papers": {"BACKEND": "compensations.storage.ContentAddressedStorage"},
+}
+
+# Хранилище файлов: filesystem (MEDIA_ROOT) или s3 (S3 / MinIO). С s3 узлы бэкенда не хранят
+# файлы локально, а скачивание идёт по presigned-ссылке прямо из хранилища.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "filesystem")
+if STORAGE_BACKEND == "s3":
+    from boto3.s3.transfer import TransferConfig
+
+    S3_STORAGE_OPTIONS = {
+        "bucket_name": os.getenv("S3_BUCKET", "stimulus-media"),
+        "endpoint_url": os.getenv("S3_ENDPOINT_URL") or None,
+        # адрес хранилища, доступный браузеру (для подписи presigned-ссылок)
+        "public_endpoint_url": os.getenv("S3_PUBLIC_ENDPOINT_URL") or None,
+        "access_key": os.getenv("S3_ACCESS_KEY"),
+        "secret_key": os.getenv("S3_SECRET_KEY"),
+        "region_name": os.getenv("S3_REGION", "us-east-1"),
+        "addressing_style": "path",
+        "signature_version": "s3v4",
+        "file_overwrite": False,
+        "querystring_expire": int(os.getenv("S3_PRESIGNED_EXPIRE", "300")),
+        # файлы больше порога загружаются multipart-частями
+        "transfer_config": TransferConfig(
+            multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) * 1024 * 1024,
+            multipart_chunksize=int(os.getenv("S3_MULTIPART_CHUNK_MB", "8")) * 1024 * 1024,
+        ),
+    }
+    STORAGES["default"] = {"BACKEND": "core.storage.PresignedS3Storage", "OPTIONS": S3_STORAGE_OPTIONS}
+    STORAGES["papers"] = {"BACKEND": "compensations.storage.S3ContentAddressedStorage", "OPTIONS": S3_STORAGE_OPTIONS}
+
+FILE_UPLOAD_HANDLERS = [
+    "compensations.upload_handlers.HashingMemoryFileUploadHandler",
+    "compensations.upload_handlers.HashingTemporaryFileUploadHandler",
+]
+
 AUTH_USER_MODEL = "core.User"
 AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
 
@@ -115,7 +190,7 @@ CSRF_COOKIE_SECURE = False
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.TracedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -125,6 +200,15 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
         "rest_framework.filters.SearchFilter",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
@@ -133,6 +217,8 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # заново читает пользователя и его поля в токене (core/authentication.py)
+    "TOKEN_REFRESH_SERIALIZER": "core.authentication.UserClaimsTokenRefreshSerializer",
 }
 
 SWAGGER_SETTINGS = {
@@ -141,5 +227,127 @@ SWAGGER_SETTINGS = {
     "LOGOUT_URL": "/admin/logout/",
 }
 
+# Кэш: locmem (по умолчанию, только для одного процесса), file (общий для процессов одного хоста,
+# CACHE_LOCATION — каталог) или redis (общий, CACHE_LOCATION — redis://host:6379/0).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": {
+            "locmem": "django.core.cache.backends.locmem.LocMemCache",
+            "file": "django.core.cache.backends.filebased.FileBasedCache",
+            "redis": "django.core.cache.backends.redis.RedisCache",
+        }[CACHE_BACKEND],
+        "LOCATION": os.getenv("CACHE_LOCATION", os.path.join(BASE_DIR, "cache") if CACHE_BACKEND == "file" else ""),
+        "KEY_PREFIX": "stimulus",
+    }
+}
+# Сброс версий и удаление записей видны всем процессам только в общем кэше (file, redis). С locmem
+# каждый воркер gunicorn/hypercorn держал бы свои устаревшие копии, поэтому там кэши ниже по умолчанию выключены.
+SHARED_CACHE = CACHE_BACKEND in ("file", "redis")
+
+# Время жизни закэшированных ответов списков и карточек заявок и публикаций (compensations/cache.py);
+# 0 — кэш ответов выключен.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300" if SHARED_CACHE else "0"))
+
+# Пользователь JWT-запроса берётся из кэша (AUTH_USER_CACHE_TIMEOUT секунд, 0 — каждый раз из БД)
+# или, при AUTH_STATELESS_USER=True, собирается из claims токена без обращения к БД (core/authentication.py).
+# Как и кэш ответов, по умолчанию включён только с общим CACHE_BACKEND: иначе изменённый или отключённый
+# пользователь оставался бы в кэше других воркеров.
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "60" if SHARED_CACHE else "0"))
+AUTH_STATELESS_USER = os.getenv("AUTH_STATELESS_USER", "False") == "True"
+
+# Заголовок Server-Timing и строка лога на каждый запрос (запросы, время БД/сериализации/рендера)
+REQUEST_INSTRUMENTATION = os.getenv("REQUEST_INSTRUMENTATION", "False") == "True"
+
+# Запросы дольше порога сохраняются в core.SlowQuery (админка); 0 — выключено.
+# EXPLAIN (ANALYZE, BUFFERS) повторно выполняет SELECT, поэтому снимается выборочно.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "0"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+# Сколько дней хранятся записи о медленных запросах (0 — без ограничения).
+SLOW_QUERY_RETENTION_DAYS = int(os.getenv("SLOW_QUERY_RETENTION_DAYS", "30"))
+
+# Эндпоинт /metrics в формате Prometheus; METRICS_TOKEN — Bearer-токен для сборщика.
+# Без токена эндпоинт отвечает 404, если не задано METRICS_PUBLIC=True (например, он доступен только во внутренней сети).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "False") == "True"
+
+# Трассировка запросов (Chrome Trace Event JSON): TRACING_EXPORTER = file | stdout
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "False") == "True"
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")
+TRACING_DIR = os.getenv("TRACING_DIR", os.path.join(BASE_DIR, "traces"))
+TRACING_MAX_SPANS = int(os.getenv("TRACING_MAX_SPANS", "20000"))
+
+# Сэмплирующий профайлер запросов (folded stacks для flame graph) в PROFILING_DIR.
+# Запуск: заголовок X-Profile: <PROFILING_TOKEN>, ?_profile=1 для администратора или доля PROFILING_SAMPLE_RATE.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False") == "True"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(BASE_DIR, "profiles"))
+
+# Скачивание файлов публикаций через /api/papers/<id>/file/: если задано, Django только проверяет
+# права и возвращает X-Accel-Redirect на этот внутренний location nginx (см. nginx.conf).
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
+
+# Возобновляемая загрузка файлов публикаций частями (compensations/uploads.py).
+# Каталог не должен раздаваться nginx как /stimulus_media/.
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR", os.path.join(BASE_DIR, "upload_tmp"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Очередь проверки заявок (compensations/review.py): на сколько секунд заявка закрепляется за проверяющим.
+REVIEW_LEASE_SECONDS = int(os.getenv("REVIEW_LEASE_SECONDS", "900"))
+
+# Лента изменений (compensations/changes.py): записи моложе CHANGES_SETTLE_SECONDS откладываются
+# до следующего запроса, чтобы не пропустить ещё не закоммиченные транзакции.
+CHANGES_SETTLE_SECONDS = int(os.getenv("CHANGES_SETTLE_SECONDS", "5"))
+
+# Списки и карточки заявок, публикаций и соавторов собираются из строк .values() без сериализаторов
+# DRF (compensations/representations.py); ответ тот же. False — обычные сериализаторы.
+VALUES_READ_PATH = os.getenv("VALUES_READ_PATH", "True") == "True"
+
+# JSON кодируется orjson (core/renderers.py, core/parsers.py). Списки длиннее JSON_STREAM_CHUNK_ITEMS
+# отдаются потоком, частями по столько элементов. False — ответ целиком, как раньше.
+JSON_STREAMING = os.getenv("JSON_STREAMING", "True") == "True"
+JSON_STREAM_CHUNK_ITEMS = int(os.getenv("JSON_STREAM_CHUNK_ITEMS", "500"))
+
+# Админка (core/admin.py): число строк таблицы без фильтров берётся из статистики планировщика
+# (pg_class.reltuples) вместо COUNT(*), если оценка не меньше этого порога.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", "10000"))
+
+# Поток событий о смене статусов заявок (compensations/events.py, только в режиме ASGI).
+# EVENTS_BACKEND: postgres — LISTEN/NOTIFY, события видны всем процессам; local — шина в памяти
+# одного процесса. EVENTS_REPLAY_LIMIT — сколько пропущенных событий отдаётся по Last-Event-ID.
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "postgres")
+EVENTS_KEEPALIVE_SECONDS = int(os.getenv("EVENTS_KEEPALIVE_SECONDS", "25"))
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "100"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "5000"))
+# Время жизни одноразового билета потока (POST /api/events/ticket/), секунд.
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", "30"))
+
+# Режим ASGI (stimulus_aiu/asgi.py, config/hypercorn.toml): чтение и рендер документов выполняются
+# в ограниченных пулах потоков (core/concurrency.py). RENDER_QUEUE_LIMIT — сколько DOCX/XLSX может ждать
+# в очереди, сверх этого ответ 503. Каждый поток пула держит своё соединение с БД.
+ASGI_MODE = os.getenv("ASGI_MODE", "False") == "True"
+ASYNC_READ_THREADS = int(os.getenv("ASYNC_READ_THREADS", "8"))
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "2"))
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "10"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "stimulus_aiu": {
+            "handlers": ["console"],
+            "level": os.getenv("APP_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 if DEBUG:
     logging.getLogger('django.security.csrf').setLevel(logging.DEBUG)
\ No newline at end of file
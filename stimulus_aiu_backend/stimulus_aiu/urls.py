@@ -5,8 +5,10 @@ from rest_framework.routers import DefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
 
-from core.views import MeView, RegistrationView, CustomTokenObtainPairView
-from compensations.views import ApplicationViewSet, PaperViewSet, CoauthorViewSet
+from core.concurrency import pooled_urls
+from core.views import MeView, RegistrationView, CustomTokenObtainPairView, metrics_view
+from compensations.views import ApplicationViewSet, PaperViewSet, CoauthorViewSet, UploadSessionViewSet
+from compensations.events import application_events, stream_ticket
 from compensations.meta import MetaFacultiesView, MetaIndexationView, MetaReportYearsView
 from rest_framework_simplejwt.views import TokenRefreshView
 
@@ -19,6 +21,34 @@ router = DefaultRouter()
 router.register(r"applications", ApplicationViewSet, basename="applications")
 router.register(r"papers", PaperViewSet, basename="papers")
 router.register(r"coauthors", CoauthorViewSet, basename="coauthors")
+router.register(r"uploads", UploadSessionViewSet, basename="uploads")
+
+# ASGI: эндпоинты чтения и рендера документов выполняются в ограниченных пулах потоков
+ASYNC_POOLS = {
+    "applications-list": "read",
+    "applications-detail": "read",
+    "applications-docx": "render",
+    "applications-export-xlsx": "render",
+    "applications-changes": "read",
+    "applications-archive": "read",
+    "papers-list": "read",
+    "papers-detail": "read",
+    "papers-file": "read",
+    "papers-changes": "read",
+    "meta-faculties": "read",
+    "meta-indexation": "read",
+    "meta-report-years": "read",
+}
+
+meta_urls = [
+    path("api/meta/faculties/", MetaFacultiesView.as_view(), name="meta-faculties"),
+    path("api/meta/indexation/", MetaIndexationView.as_view(), name="meta-indexation"),
+    path("api/meta/report_years/", MetaReportYearsView.as_view(), name="meta-report-years"),
+]
+api_urls = router.urls
+if settings.ASGI_MODE:
+    meta_urls = pooled_urls(meta_urls, ASYNC_POOLS)
+    api_urls = pooled_urls(api_urls, ASYNC_POOLS)
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -43,12 +73,15 @@ urlpatterns = [
     path("api/auth/register/", RegistrationView.as_view(), name="auth_register"),
 
     # === МЕТАДАННЫЕ ===
-    path("api/meta/faculties/", MetaFacultiesView.as_view()),
-    path("api/meta/indexation/", MetaIndexationView.as_view()),
-    path("api/meta/report_years/", MetaReportYearsView.as_view()),
+    *meta_urls,
 
     # === ОСНОВНЫЕ ЭНДПОИНТЫ ===
-    path("api/", include(router.urls)),
+    path("api/events/", application_events, name="events"),
+    path("api/events/ticket/", stream_ticket, name="events_ticket"),
+    path("api/", include(api_urls)),
+
+    # === МЕТРИКИ (Prometheus) ===
+    path("metrics", metrics_view, name="metrics"),
 
     # === SWAGGER / REDOC ===
     path("swagger.json", schema_view.without_ui(cache_timeout=0), name="schema-json"),
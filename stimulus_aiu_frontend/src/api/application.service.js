@@ -118,6 +118,64 @@ export async function rejectApplication(id, comment = "") {
   return axiosClient.post(`/api/applications/${id}/reject/`, { comment });
 }
 
+export async function listReviewQueue({ signal } = {}) {
+  return axiosClient.get("/api/applications/review_queue/", { signal });
+}
+
+export async function claimReviewQueue({ count = 10, faculty, report_year } = {}) {
+  return axiosClient.post("/api/applications/review_queue/", { count, faculty, report_year });
+}
+
+export async function releaseReview(id) {
+  return axiosClient.post(`/api/applications/${id}/release/`);
+}
+
+const EVENTS_RETRY_MS = 5000;
+
+// Status changes pushed by the server (ASGI mode). EventSource cannot send the Authorization
+// header, so every connection opens with a single-use ticket; after an error the stream is
+// reopened with a new ticket and the last event id, so missed events are replayed.
+// Returns a function that closes the stream.
+export function subscribeApplicationEvents(onEvent) {
+  let source = null;
+  let lastEventId = "";
+  let closed = false;
+
+  const reconnect = () => {
+    if (!closed) setTimeout(connect, EVENTS_RETRY_MS);
+  };
+
+  async function connect() {
+    let ticket;
+    try {
+      ({ data: { ticket } } = await axiosClient.post("/api/events/ticket/"));
+    } catch {
+      reconnect();
+      return;
+    }
+    if (closed) return;
+    const url = new URL("/api/events/", axiosClient.defaults.baseURL || window.location.origin);
+    url.searchParams.set("ticket", ticket);
+    if (lastEventId) url.searchParams.set("last_event_id", lastEventId);
+    source = new EventSource(url);
+    source.addEventListener("application", (event) => {
+      lastEventId = event.lastEventId;
+      onEvent(JSON.parse(event.data));
+    });
+    // the ticket is spent: instead of EventSource's own retry, open a new stream
+    source.onerror = () => {
+      source.close();
+      reconnect();
+    };
+  }
+
+  connect();
+  return () => {
+    closed = true;
+    source?.close();
+  };
+}
+
 export async function downloadApplicationDocx({ id, signal } = {}) {
   return axiosClient.get(`/api/applications/${id}/docx/`, {
     responseType: "blob",
@@ -125,6 +183,15 @@ export async function downloadApplicationDocx({ id, signal } = {}) {
   });
 }
 
+export async function downloadPaperFile({ id, signal } = {}) {
+  // with S3 storage the backend answers with {"url": <presigned url>} instead of the file
+  return axiosClient.get(`/api/papers/${id}/file/`, {
+    params: { redirect: false },
+    responseType: "blob",
+    signal,
+  });
+}
+
 export async function exportApplicationsXlsx({ params = {}, signal } = {}) {
   return axiosClient.get("/api/applications/export_xlsx/", {
     params,
@@ -6,6 +6,7 @@ import {
   approveApplication,
   rejectApplication,
   downloadApplicationDocx,
+  downloadPaperFile,
 } from "../../api/application.service";
 import { Dialog, Transition } from "@headlessui/react";
 
@@ -109,6 +110,23 @@ export default function ApplicationDetailPage() {
     }
   };
 
+  const handlePaperDownload = async (paper) => {
+    try {
+      const res = await downloadPaperFile({ id: paper.id });
+      if (res.data.type === "application/json") {
+        const { url } = JSON.parse(await res.data.text());
+        window.open(url, "_blank", "noopener,noreferrer");
+        return;
+      }
+      const blob = new Blob([res.data], { type: "application/pdf" });
+      const url = URL.createObjectURL(blob);
+      window.open(url, "_blank", "noopener,noreferrer");
+      setTimeout(() => URL.revokeObjectURL(url), 60000);
+    } catch (err) {
+      alert("Ошибка при скачивании PDF");
+    }
+  };
+
   const handleAction = async () => {
     try {
       if (modal.type === "approve") {
@@ -291,9 +309,9 @@ export default function ApplicationDetailPage() {
                   <div>
                     <span className="text-gray-500">Файл:</span>{" "}
                     {paper.file_upload ? (
-                      <a href={paper.file_upload} target="_blank" rel="noopener noreferrer" className="text-blue-600 hover:underline">
+                      <button type="button" onClick={() => handlePaperDownload(paper)} className="text-blue-600 hover:underline">
                         Скачать PDF
-                      </a>
+                      </button>
                     ) : (
                       "—"
                     )}